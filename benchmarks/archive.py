@@ -0,0 +1,148 @@
+"""Date-range tools before and after moving closed years to archive partitions.
+
+Builds a datagen.py database of --rows expenses (2021 to 2025), then times
+list_expenses (first page and a cursor page), summarize,
+get_expense_statistics, export_expenses_csv, the trend and budget tools and
+search_expenses over ranges inside the archived years, across the boundary,
+over everything and inside the live year (get_monthly_summary reads the month
+the range starts in). It archives 2021 to 2023 with archive_year, reports the time and file
+size of each partition and the size of the live database, and runs the same
+calls again: every result must be identical. Last, it adds an expense dated
+in an archived year and checks that list_expenses returns it along with the
+archived rows. The result cache and the slow query log are disabled.
+
+    python benchmarks/archive.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+ARCHIVED_YEARS = (2021, 2022, 2023)
+
+RANGES = {
+    "archived month": ("2022-03-01", "2022-03-31"),
+    "archived quarter+": ("2021-11-15", "2022-02-20"),
+    "across boundary": ("2023-07-01", "2024-06-30"),
+    "everything": ("2021-01-01", "2025-12-31"),
+    "live quarter": ("2025-01-01", "2025-03-31"),
+}
+
+
+async def list_second_page(start_date, end_date):
+    first = await main.list_expenses.fn(start_date, end_date, limit=100)
+    return await main.list_expenses.fn(start_date, end_date, limit=100, cursor=first["next_cursor"])
+
+
+# Label -> function of (start_date, end_date) returning the call's coroutine
+CALLS = {
+    "list_expenses": lambda start, end: main.list_expenses.fn(start, end, limit=100),
+    "list_expenses page 2": list_second_page,
+    "summarize": lambda start, end: main.summarize.fn(start, end),
+    "statistics (exact)": lambda start, end: main.get_expense_statistics.fn(start, end, percentile_method="exact"),
+    "statistics (none)": lambda start, end: main.get_expense_statistics.fn(start, end, percentile_method="none"),
+    "export_expenses_csv": lambda start, end: main.export_expenses_csv.fn(start, end),
+    "get_monthly_summary": lambda start, end: main.get_monthly_summary.fn(int(start[:4]), int(start[5:7])),
+    "get_top_expenses": lambda start, end: main.get_top_expenses.fn(start, end, limit=20),
+    "category_trends (week)": lambda start, end: main.get_category_trends.fn("food", start, end, group_by="week"),
+    "category_trends (month)": lambda start, end: main.get_category_trends.fn("food", start, end),
+    "multi_category_trends": lambda start, end: main.get_multi_category_trends.fn(start, end),
+    "check_budget_status": lambda start, end: main.check_budget_status.fn(start, end),
+    # By date: relevance scores are computed by each partition's own full-text index
+    "search_expenses": lambda start, end: main.search_expenses.fn(datagen.WORDS[3], start, end, limit=100,
+                                                                 order_by="date"),
+}
+
+
+async def measure(repeat):
+    '''Median milliseconds and result of every call over every range.'''
+    measured = {}
+    for label, call in CALLS.items():
+        for name, (start_date, end_date) in RANGES.items():
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = await call(start_date, end_date)
+                samples.append((time.perf_counter() - started) * 1000)
+            if isinstance(result, dict) and result.get("status") == "error":
+                raise RuntimeError(f"{label} over {name}: {result['message']}")
+            measured[label, name] = (statistics.median(samples), result)
+    return measured
+
+
+def live_bytes(path):
+    '''Bytes of the live database in use, excluding free pages.'''
+    with sqlite3.connect(path) as c:
+        page_size, = c.execute("PRAGMA page_size").fetchone()
+        pages, = c.execute("PRAGMA page_count").fetchone()
+        free, = c.execute("PRAGMA freelist_count").fetchone()
+    return (pages - free) * page_size
+
+
+async def compare(path, repeat):
+    before = await measure(repeat)
+    size_before = live_bytes(path)
+
+    print(f"{'year':<6} {'rows':>10} {'seconds':>8} {'bytes':>14}")
+    for year in ARCHIVED_YEARS:
+        result = await main.archive_year.fn(year)
+        if result["status"] != "success":
+            raise RuntimeError(result["message"])
+        print(f"{year:<6} {result['row_count']:>10,} {result['elapsed_seconds']:>8.2f} {result['bytes']:>14,}")
+    print(f"live database in use: {size_before:,} -> {live_bytes(path):,} bytes\n")
+
+    after = await measure(repeat)
+    print(f"{'call':<22} {'range':<18} {'before ms':>10} {'after ms':>10} {'same':>5}")
+    ok = True
+    for (label, name), (before_ms, before_result) in before.items():
+        after_ms, after_result = after[label, name]
+        same = before_result == after_result
+        ok &= same
+        print(f"{label:<22} {name:<18} {before_ms:>10.2f} {after_ms:>10.2f} {str(same):>5}")
+
+    day = ("2022-03-15", "2022-03-15")
+    archived = await main.list_expenses.fn(*day, limit=main.PAGE_SIZE_MAX)
+    added = await main.add_expense.fn(day[0], 12.34, "food", note="archive benchmark")
+    listed = await main.list_expenses.fn(*day, limit=main.PAGE_SIZE_MAX)
+    late = listed["expenses"] == [e for e in listed["expenses"] if e["id"] == added["id"]] + archived["expenses"]
+    print(f"\nexpense added to archived 2022 is listed with its {archived['count']} archived rows: {late}")
+    return ok and late
+
+
+async def run(path, repeat):
+    try:
+        return await compare(path, repeat)
+    finally:
+        await main.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main._result_cache.max_entries = 0
+    main._metrics.slow_seconds = float("inf")
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "archive.db")
+        # The full-range inline export is compared too, past the server's size cap
+        main.EXPORT_INLINE_MAX_BYTES = float("inf")
+        datagen.build(main.DB_PATH, args.rows)
+        try:
+            ok = asyncio.run(run(main.DB_PATH, args.repeat))
+        finally:
+            # Archive partitions are read-only; make them removable with the scratch directory
+            for root, _, files in os.walk(tmp):
+                for name in files:
+                    os.chmod(os.path.join(root, name), 0o644)
+        if not ok:
+            sys.exit(1)
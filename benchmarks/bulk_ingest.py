@@ -0,0 +1,90 @@
+"""Compare the old per-row bulk_add_expenses loop with the chunked ingestion pipeline.
+
+Writes --rows synthetic expenses to a scratch CSV file, then loads them three
+ways into fresh scratch databases: the previous implementation (one execute per
+row, one commit at the end), bulk_add_expenses with an in-memory list, and
+bulk_add_expenses streaming the CSV through file_path.
+
+    python benchmarks/bulk_ingest.py --rows 200000
+"""
+import argparse
+import asyncio
+import csv
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+CATEGORIES = ["food", "transport", "housing", "utilities", "health", "shopping", "entertainment"]
+NOTES = ["coffee", "lunch", "uber", "rent", "netflix", "groceries", "pharmacy", "books", "taxi"]
+
+
+def generate(rows, seed=42):
+    rng = random.Random(seed)
+    start = datetime.date(2023, 1, 1)
+    for _ in range(rows):
+        yield {
+            "date": (start + datetime.timedelta(days=rng.randrange(730))).isoformat(),
+            "amount": round(rng.lognormvariate(3, 1), 2),
+            "category": rng.choice(CATEGORIES),
+            "subcategory": "other",
+            "note": " ".join(rng.choices(NOTES, k=rng.randint(1, 3))),
+        }
+
+
+async def legacy_bulk_add(expenses):
+    '''The bulk_add_expenses implementation before the ingestion pipeline.'''
+    success_count = 0
+    errors = []
+    scale = await main._amount_scale()
+    async with main.write_connection() as c:
+        for i, expense in enumerate(expenses):
+            try:
+                await c.execute(
+                    "INSERT INTO expenses(date, amount, category, subcategory, note) VALUES (?,?,?,?,?)",
+                    (expense.get('date'), main._to_minor(expense.get('amount'), scale), expense.get('category'),
+                     expense.get('subcategory', ''), expense.get('note', ''))
+                )
+                success_count += 1
+            except Exception as e:
+                errors.append(f"Row {i+1}: {str(e)}")
+        await c.commit()
+    return {"added_count": success_count}
+
+
+async def load(tmp, name, call):
+    main.DB_PATH = os.path.join(tmp, f"{name}.db")
+    main.init_db()
+    started = time.perf_counter()
+    result = await call()
+    elapsed = time.perf_counter() - started
+    await main.close_pool()
+    print(f"{name:<10} {result['added_count']:>10,} rows {elapsed:>8.2f}s {result['added_count'] / elapsed:>12,.0f} rows/s")
+
+
+async def compare(tmp, rows, chunk_size):
+    expenses = list(generate(rows))
+    csv_path = os.path.join(tmp, "expenses.csv")
+    with open(csv_path, "w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(expenses[0]))
+        writer.writeheader()
+        writer.writerows(expenses)
+    await load(tmp, "legacy", lambda: legacy_bulk_add(expenses))
+    await load(tmp, "list", lambda: main.bulk_add_expenses.fn(expenses, chunk_size=chunk_size))
+    main.IMPORT_DIR = tmp
+    await load(tmp, "csv", lambda: main.bulk_add_expenses.fn(file_path="expenses.csv", chunk_size=chunk_size))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=main.BULK_CHUNK_SIZE)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(compare(tmp, args.rows, args.chunk_size))
@@ -0,0 +1,76 @@
+"""One get_multi_category_trends call against a get_category_trends call per category.
+
+Builds a datagen.py database of --rows expenses, then, for each group_by,
+times --repeat rounds of (a) one get_category_trends call per category, as a
+dashboard does today, and (b) one get_multi_category_trends call for the
+same range. It also checks that every non-empty cell of the matrix equals the
+per-category result (weeks spanning New Year excepted: SQLite's %W splits
+them, the matrix does not). The result cache is disabled throughout.
+
+    python benchmarks/category_trends.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+RANGES = {
+    "month": ("2021-01-01", "2025-12-31"),
+    "week": ("2024-01-01", "2024-12-31"),
+    "day": ("2024-10-01", "2024-12-31"),
+}
+
+
+async def timed(coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    return (time.perf_counter() - started) * 1000, result
+
+
+async def compare(group_by, repeat):
+    start_date, end_date = RANGES[group_by]
+    multi_ms, single_ms = [], []
+    for _ in range(repeat):
+        elapsed, matrix = await timed(main.get_multi_category_trends.fn(start_date, end_date, group_by=group_by))
+        multi_ms.append(elapsed)
+        started = time.perf_counter()
+        per_category = [await main.get_category_trends.fn(category, start_date, end_date, group_by=group_by)
+                        for category in matrix["categories"]]
+        single_ms.append((time.perf_counter() - started) * 1000)
+
+    mismatches = 0
+    for k, trends in enumerate(per_category):
+        expected = {row["period"]: round(row["total_amount"], 2) for row in trends["trends"]}
+        for period, amounts in zip(matrix["periods"], matrix["amounts"]):
+            if amounts[k] and expected.get(period) != amounts[k] and not period.endswith(("W00", "W52", "W53")):
+                mismatches += 1
+    single, multi = statistics.median(single_ms), statistics.median(multi_ms)
+    print(f"{group_by:<6} {len(matrix['periods']):>5} x {len(matrix['categories']):<3}"
+          f" {single:>12.1f} ms {multi:>12.1f} ms {single / multi:>8.1f}x  mismatches {mismatches}")
+
+
+async def run(repeat):
+    print(f"{'group':<6} {'periods x cats':>14} {'N single calls':>15} {'one matrix call':>15} {'speedup':>8}")
+    for group_by in RANGES:
+        await compare(group_by, repeat)
+    await main.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main._result_cache.max_entries = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "trends.db")
+        datagen.build(main.DB_PATH, args.rows)
+        asyncio.run(run(args.repeat))
@@ -0,0 +1,144 @@
+"""Incremental sync through get_changes_since against re-listing every expense.
+
+Builds a datagen.py database of --rows expenses and mirrors it the way a
+client starts: get_changes_since(0) answers resync_required with the
+latest_seq, and list_expenses is paged over the whole range. It then applies
+--edits random adds, updates and deletes through the tools and brings the
+mirror up to date twice: by re-listing everything, and by applying
+get_changes_since from the saved seq. Both mirrors must equal the live table.
+Last, it times bulk_add_expenses and update_expense with the change log
+triggers and without them, to show what logging costs the writes.
+
+    python benchmarks/change_feed.py --rows 1000000 --edits 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+FULL_RANGE = (datagen.START.isoformat(), "2099-12-31")
+
+
+async def full_read():
+    '''Every expense as {id: record}, paged through list_expenses, and the pages it took.'''
+    mirror, cursor, pages = {}, None, 0
+    while True:
+        page = await main.list_expenses.fn(*FULL_RANGE, limit=main.PAGE_SIZE_MAX, cursor=cursor)
+        pages += 1
+        mirror.update((expense["id"], expense) for expense in page["expenses"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return mirror, pages
+
+
+async def apply_changes(mirror, seq):
+    '''Bring mirror up to date from seq; return the new seq, entries applied and calls made.'''
+    entries = calls = 0
+    while True:
+        result = await main.get_changes_since.fn(seq, limit=main.PAGE_SIZE_MAX)
+        calls += 1
+        assert not result["resync_required"], result
+        for change in result["changes"]:
+            if change["table"] != "expenses":
+                continue
+            if change["op"] == "delete":
+                mirror.pop(change["id"], None)
+            else:
+                record = change["record"]
+                mirror[change["id"]] = {key: record[key] for key in main.SEARCH_COLUMNS}
+        entries += result["count"]
+        seq = result["next_seq"]
+        if not result["has_more"]:
+            return seq, entries, calls
+
+
+async def edit(edits, max_id, seed):
+    rng = random.Random(seed)
+    for i in range(edits):
+        roll = rng.random()
+        if roll < 0.6:
+            result = await main.update_expense.fn(rng.randint(1, max_id), amount=round(rng.uniform(1, 200), 2))
+        elif roll < 0.8:
+            result = await main.delete_expense.fn(rng.randint(1, max_id))
+        else:
+            result = await main.add_expense.fn(f"2025-06-{i % 28 + 1:02d}", 4.2, "food", note="sync")
+        # Deleting or updating an id that is already gone is part of the workload
+        assert result["status"] == "success" or "not found" in result["message"], result
+
+
+async def timed(coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    return (time.perf_counter() - started) * 1000, result
+
+
+async def write_cost(rows, updates, max_id):
+    batch = [{"date": "2025-07-01", "amount": 1.5, "category": "food", "note": "cost"} for _ in range(rows)]
+    rng = random.Random(1)
+    print(f"\n{'change log triggers':<22} {'bulk_add ms':>12} {'rows/s':>10} {'update_expense ms':>18}")
+    for label in ("on", "off"):
+        bulk_ms, _ = await timed(main.bulk_add_expenses.fn(expenses=batch))
+        started = time.perf_counter()
+        for _ in range(updates):
+            await main.update_expense.fn(rng.randint(1, max_id), amount=round(rng.uniform(1, 200), 2))
+        update_ms = (time.perf_counter() - started) * 1000 / updates
+        print(f"{label:<22} {bulk_ms:>12.1f} {rows / bulk_ms * 1000:>10.0f} {update_ms:>18.3f}")
+        if label == "on":
+            async with main.write_connection() as c:
+                for name in main.CHANGE_TRIGGERS:
+                    if name.startswith("expenses_"):
+                        await c.execute(f"DROP TRIGGER {name}")
+                await c.commit()
+
+
+async def run(rows, edits, seed, bulk_rows, updates):
+    try:
+        marker = await main.get_changes_since.fn(0)
+        assert marker["resync_required"], marker
+        initial_ms, (mirror, pages) = await timed(full_read())
+        print(f"initial full read        {initial_ms:>10.1f} ms  {pages:>5} list_expenses calls  {len(mirror):>10,} rows")
+        seq = marker["latest_seq"]
+
+        await edit(edits, rows, seed)
+        relist_ms, (relisted, pages) = await timed(full_read())
+        print(f"re-list after {edits} edits {relist_ms:>10.1f} ms  {pages:>5} list_expenses calls  {len(relisted):>10,} rows")
+        feed_ms, (seq, entries, calls) = await timed(apply_changes(mirror, seq))
+        print(f"get_changes_since        {feed_ms:>10.1f} ms  {calls:>5} calls               {entries:>10,} entries")
+        print(f"speedup {relist_ms / feed_ms:.0f}x")
+
+        with sqlite3.connect(main.DB_PATH) as c:
+            live = c.execute("SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM expenses").fetchone()
+        scale = await main._amount_scale()
+        same = mirror == relisted and (len(mirror), round(sum(e["amount"] for e in mirror.values()) * scale)) == live
+        print(f"mirror matches the live table: {same}")
+
+        await write_cost(bulk_rows, updates, rows)
+        return same
+    finally:
+        await main.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--edits", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bulk-rows", type=int, default=50_000, help="rows per bulk_add_expenses run")
+    parser.add_argument("--updates", type=int, default=1000, help="update_expense calls per run")
+    args = parser.parse_args()
+    main._result_cache.max_entries = 0
+    main._metrics.slow_seconds = float("inf")
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "feed.db")
+        datagen.build(main.DB_PATH, args.rows, args.seed)
+        if not asyncio.run(run(args.rows, args.edits, args.seed, args.bulk_rows, args.updates)):
+            sys.exit(1)
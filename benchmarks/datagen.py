@@ -0,0 +1,217 @@
+"""Deterministic synthetic expense data for benchmarks.
+
+Generates --rows expenses (or a named --size: 100k, 1m, 10m) over the
+categories.json taxonomy into a migrated database, plus budgets and recurring
+expenses. The same seed always produces the same database:
+
+- transaction counts per day follow a weekly rhythm (busier weekends) and a
+  yearly one (a December peak), and rows are written in date order;
+- categories are drawn with fixed weights (food and transport dominate) and
+  amounts are log-normal with per-category parameters;
+- notes mix a merchant-like word per subcategory with Zipf-distributed words,
+  so keyword searches range from very common to rare.
+
+    python benchmarks/datagen.py --size 1m --out /tmp/expenses-1m.db
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+START = datetime.date(2021, 1, 1)
+DAYS = 5 * 365
+
+# Category weight and log-normal amount parameters (mu, sigma of ln(amount))
+PROFILES = {
+    "food": (30, 2.8, 0.8),
+    "transport": (14, 2.9, 0.7),
+    "shopping": (9, 3.6, 1.0),
+    "entertainment": (6, 3.3, 0.8),
+    "utilities": (5, 4.0, 0.5),
+    "health": (4, 3.8, 1.0),
+    "personal_care": (4, 3.2, 0.7),
+    "subscriptions": (3, 2.6, 0.5),
+    "home": (3, 4.0, 1.1),
+    "family_kids": (3, 3.5, 0.9),
+    "housing": (2, 6.0, 1.0),
+    "travel": (2, 5.2, 1.0),
+    "education": (1.5, 4.5, 1.0),
+    "gifts_donations": (1.5, 3.8, 0.9),
+    "pet": (1.5, 3.4, 0.8),
+    "finance_fees": (1.5, 2.3, 1.0),
+    "business": (1, 4.3, 1.1),
+    "taxes": (0.5, 6.5, 1.0),
+    "investments": (0.5, 6.8, 0.9),
+}
+DEFAULT_PROFILE = (1, 3.5, 1.0)
+
+# Zipf-like note words, shared with the search benchmark
+WORDS = [
+    "coffee", "latte", "lunch", "dinner", "uber", "metro", "petrol", "rent", "netflix",
+    "groceries", "pharmacy", "gym", "books", "flight", "hotel", "insurance", "gift",
+    "starbucks", "amazon", "electricity", "internet", "parking", "snacks", "taxi",
+]
+WORD_WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+
+# Recurring items: (name, amount, category, subcategory, frequency)
+RECURRING = [
+    ("Rent", 1450.0, "housing", "rent", "monthly"),
+    ("Netflix", 15.49, "subscriptions", "other", "monthly"),
+    ("Music streaming", 10.99, "subscriptions", "other", "monthly"),
+    ("Gym membership", 39.0, "health", "other", "monthly"),
+    ("Mobile plan", 25.0, "utilities", "mobile_phone", "monthly"),
+    ("Broadband", 49.99, "utilities", "internet_broadband", "monthly"),
+    ("Car insurance", 640.0, "transport", "other", "yearly"),
+    ("Cleaner", 60.0, "housing", "cleaning", "weekly"),
+]
+
+
+def load_taxonomy(path=None):
+    with open(path or main.CATEGORIES_PATH) as f:
+        return {category: list(subcategories) or ["other"] for category, subcategories in json.load(f).items()}
+
+
+def daily_counts(rows, days=DAYS, start=START):
+    '''Split rows over the days with weekly and yearly seasonality (largest remainder).'''
+    weights = []
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        weight = 1.35 if day.weekday() >= 5 else 1.0
+        weight *= 1.0 + 0.25 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 355) / 365)
+        weights.append(weight)
+    total = sum(weights)
+    shares = [rows * w / total for w in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(days), key=lambda i: counts[i] - shares[i])
+    for i in by_remainder[:rows - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def expenses(rows, seed=42, taxonomy=None):
+    '''Yield (date, amount, category, subcategory, note) tuples in date order.'''
+    rng = random.Random(seed)
+    taxonomy = taxonomy or load_taxonomy()
+    categories = sorted(taxonomy)
+    profiles = [PROFILES.get(category, DEFAULT_PROFILE) for category in categories]
+    category_weights = [profile[0] for profile in profiles]
+    for offset, count in enumerate(daily_counts(rows)):
+        day = (START + datetime.timedelta(days=offset)).isoformat()
+        for index in rng.choices(range(len(categories)), weights=category_weights, k=count):
+            category = categories[index]
+            _, mu, sigma = profiles[index]
+            subcategory = rng.choice(taxonomy[category])
+            note = " ".join([subcategory.split("_")[0]] + rng.choices(WORDS, weights=WORD_WEIGHTS, k=rng.randint(0, 3)))
+            yield day, round(rng.lognormvariate(mu, sigma), 2), category, subcategory, note
+
+
+def budgets(taxonomy=None):
+    '''Monthly budgets for the busiest categories plus a weekly and a yearly one.'''
+    taxonomy = taxonomy or load_taxonomy()
+    start = START.isoformat()
+    rows = [(category, 500.0, "monthly", start) for category in ("food", "transport", "shopping", "entertainment")
+            if category in taxonomy]
+    rows.append(("food", 120.0, "weekly", start))
+    if "travel" in taxonomy:
+        rows.append(("travel", 3000.0, "yearly", start))
+    return rows
+
+
+def recurring(seed=42, taxonomy=None):
+    '''Recurring expenses whose next due dates fall around the end of the generated range.'''
+    rng = random.Random(seed)
+    taxonomy = taxonomy or load_taxonomy()
+    end = START + datetime.timedelta(days=DAYS)
+    items = []
+    for name, amount, category, subcategory, frequency in RECURRING:
+        if category not in taxonomy:
+            continue
+        if subcategory not in taxonomy[category]:
+            subcategory = "other" if "other" in taxonomy[category] else ""
+        due = (end + datetime.timedelta(days=rng.randint(-10, 20))).isoformat()
+        items.append((name, amount, category, subcategory, frequency, due, int(due[8:10])))
+    return items
+
+
+def populate(path, rows, seed=42, with_budgets=True, with_recurring=True, chunk=50_000):
+    '''Fill a migrated database at path with the synthetic data set.'''
+    taxonomy = load_taxonomy()
+    created = datetime.datetime(2021, 1, 1).isoformat()
+    with sqlite3.connect(path) as c:
+        # Amounts are stored as integer minor units at the database's scale
+        scale = int(c.execute("SELECT value FROM settings WHERE key = 'amount_scale'").fetchone()[0])
+        # A large page cache keeps FTS5 segment merges in memory during the load
+        c.execute("PRAGMA cache_size = -262144")
+        # Per-row insert triggers (FTS, rollups) dominate the load time; drop them for
+        # the load and rebuild the derived tables once at the end instead
+        triggers = c.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'expenses' AND name LIKE '%insert'"
+        ).fetchall()
+        for name, _ in triggers:
+            c.execute(f"DROP TRIGGER {name}")
+        batch = []
+        for date, amount, *rest in expenses(rows, seed, taxonomy):
+            batch.append((date, main._to_minor(amount, scale), *rest))
+            if len(batch) == chunk:
+                c.executemany(main.EXPENSE_INSERT, batch)
+                batch = []
+        if batch:
+            c.executemany(main.EXPENSE_INSERT, batch)
+        for _, sql in triggers:
+            c.execute(sql)
+        for statement in main.ROLLUP_REBUILD:
+            c.execute(statement)
+        c.execute("INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')")
+        if with_budgets:
+            c.executemany(
+                "INSERT INTO budgets(category, amount, period, start_date, created_date) VALUES (?,?,?,?,?)",
+                [(category, main._to_minor(amount, scale), period, start, created)
+                 for category, amount, period, start in budgets(taxonomy)],
+            )
+        if with_recurring:
+            c.executemany(
+                """INSERT INTO recurring_expenses(name, amount, category, subcategory, frequency, next_due_date,
+                                                  anchor_day, created_date) VALUES (?,?,?,?,?,?,?,?)""",
+                [(name, main._to_minor(amount, scale), *rest, created)
+                 for name, amount, *rest in recurring(seed, taxonomy)],
+            )
+        # The expenses went in without the change log trigger; clients start from a full read
+        main._restart_change_log(c)
+        c.execute("ANALYZE")
+
+
+def build(path, rows, seed=42):
+    '''Create and migrate a database at path, then populate it.'''
+    db_path = main.DB_PATH
+    main.DB_PATH = path
+    try:
+        main.init_db()
+    finally:
+        main.DB_PATH = db_path
+    populate(path, rows, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES), default="100k")
+    parser.add_argument("--rows", type=int, help="overrides --size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    if os.path.exists(args.out):
+        parser.error(f"{args.out} already exists")
+    rows = args.rows or SIZES[args.size]
+    started = time.perf_counter()
+    build(args.out, rows, args.seed)
+    print(f"Wrote {rows:,} expenses to {args.out} in {time.perf_counter() - started:.1f}s")
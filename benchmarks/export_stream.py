@@ -0,0 +1,54 @@
+"""Peak memory and time of inline vs streamed export_expenses_csv.
+
+Loads --rows expenses into a scratch database, then exports the full range
+inline (the whole CSV in the response, as before) and streamed to a file,
+plain and gzip-compressed. Peak Python heap is measured with tracemalloc; the
+streamed modes should stay flat however many rows are exported.
+
+    python benchmarks/export_stream.py --rows 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from bulk_ingest import generate  # noqa: E402
+
+
+async def measure(label, call):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = await call()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = result.get("bytes") or len(result.get("csv_content", ""))
+    print(f"{label:<12} {result['record_count']:>10,} rows {elapsed:>8.2f}s {peak / 2**20:>9.1f} MiB peak {size / 2**20:>9.1f} MiB out")
+
+
+async def compare(rows):
+    await main.bulk_add_expenses.fn(list(generate(rows)))
+    export = main.export_expenses_csv.fn
+    await measure("inline", lambda: export("2000-01-01", "2099-12-31"))
+    await measure("file", lambda: export("2000-01-01", "2099-12-31", to_file=True))
+    await measure("file+gzip", lambda: export("2000-01-01", "2099-12-31", to_file=True, compress=True))
+    await main.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "export.db")
+        main.EXPORT_DIR = os.path.join(tmp, "exports")
+        # Measure inline mode over the whole range, past the size cap it has in the server
+        main.EXPORT_INLINE_MAX_BYTES = float("inf")
+        main.init_db()
+        asyncio.run(compare(args.rows))
@@ -0,0 +1,172 @@
+"""WAL size, free pages and latency around the background maintenance pass.
+
+Builds a datagen.py database of --rows expenses, then simulates a burst: while
+a reader keeps an old snapshot open (as a long export does), it imports
+--burst expenses with bulk_add_expenses and archives 2021, which deletes a
+year of rows. The -wal file and the free page count grow; SQLite's own
+auto-checkpoint cannot shrink either. It then times point and range reads,
+runs maintenance passes until no free pages are left (reporting how long each
+pass held the writer), and times the reads again. Last, it runs one pass while
+--concurrency clients keep calling list_expenses, which must only checkpoint
+passively, and compares add_expense latency with and without the maintenance
+loop running every 10 ms.
+
+    python benchmarks/maintenance.py --rows 1000000 --burst 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+
+def sizes(path):
+    wal = path + "-wal"
+    with sqlite3.connect(path) as c:
+        free, = c.execute("PRAGMA freelist_count").fetchone()
+    return os.path.getsize(path), os.path.getsize(wal) if os.path.exists(wal) else 0, free
+
+
+def show(label, path):
+    db_bytes, wal_bytes, free = sizes(path)
+    print(f"{label:<28} db {db_bytes:>14,}  wal {wal_bytes:>14,}  free pages {free:>8,}")
+
+
+async def read_latency(max_id, repeat):
+    '''Median ms of get_expense_by_id and a one-month list_expenses.'''
+    rng = random.Random(7)
+    samples = {"get_expense_by_id": [], "list_expenses": []}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await main.get_expense_by_id.fn(rng.randint(1, max_id))
+        samples["get_expense_by_id"].append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        await main.list_expenses.fn("2024-03-01", "2024-03-31", limit=100)
+        samples["list_expenses"].append((time.perf_counter() - started) * 1000)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+async def burst(rows):
+    batch = [{"date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "amount": i % 500 + 0.5, "category": "food",
+              "note": "burst"} for i in range(rows)]
+    # An open snapshot pins the WAL: checkpoints cannot get past it, so the file keeps growing
+    async with main.read_connection(snapshot=True) as reader:
+        await reader.execute("SELECT COUNT(*) FROM expenses")
+        result = await main.bulk_add_expenses.fn(expenses=batch)
+        assert result["status"] == "success", result
+        result = await main.archive_year.fn(2021)
+        assert result["status"] == "success", result
+
+
+async def add_latency(calls, concurrency):
+    samples = []
+    pending = iter(range(calls))
+
+    async def client():
+        for i in pending:
+            started = time.perf_counter()
+            result = await main.add_expense.fn(f"2024-05-{i % 28 + 1:02d}", 9.99, "food", note="latency")
+            samples.append((time.perf_counter() - started) * 1000)
+            assert result["status"] == "success", result
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+async def under_load(concurrency):
+    '''One maintenance pass while concurrency clients keep the readers busy.'''
+    stop = asyncio.Event()
+
+    async def client():
+        while not stop.is_set():
+            await main.list_expenses.fn("2024-01-01", "2024-12-31", limit=500)
+
+    clients = [asyncio.create_task(client()) for _ in range(concurrency)]
+    await asyncio.sleep(0.2)
+    deferred = await main._maintenance.run()
+    stop.set()
+    await asyncio.gather(*clients)
+    return deferred, main._maintenance.databases[main.DB_PATH]
+
+
+async def run(path, rows, burst_rows, repeat, calls, concurrency):
+    try:
+        show("after build", path)
+        await main.get_pool()
+        await burst(burst_rows)
+        show("after burst", path)
+        max_id = rows + burst_rows
+        before = await read_latency(max_id, repeat)
+
+        print(f"\n{'pass':>4} {'held ms':>9} {'free before':>12} {'free after':>11} {'checkpoint':>11} {'wal after':>12}")
+        n = 0
+        while True:
+            n += 1
+            await main._maintenance.run()
+            result = main._maintenance.databases[path]
+            checkpoint = result["checkpoint"]["mode"] + (" busy" if result["checkpoint"]["busy"] else "")
+            print(f"{n:>4} {result['elapsed_ms']:>9.1f} {result['freelist_pages_before']:>12,}"
+                  f" {result['freelist_pages_after']:>11,} {checkpoint:>11} {result['wal_bytes_after']:>12,}")
+            if not result["freelist_pages_after"]:
+                break
+        show("\nafter maintenance", path)
+        after = await read_latency(max_id, repeat)
+        for name in before:
+            print(f"{name:<28} {before[name]:>8.3f} ms -> {after[name]:.3f} ms")
+
+        deferred, result = await under_load(concurrency)
+        print(f"\npass with {concurrency} busy clients: load {result['load']}, deferred {deferred},"
+              f" checkpoint {result['checkpoint']['mode']}, statistics {result['statistics']}")
+
+        quiet = await add_latency(calls, concurrency)
+        main.MAINTENANCE_WAL_BYTES = 0
+        loop = asyncio.create_task(main._maintenance_loop(0.01))
+        try:
+            busy = await add_latency(calls, concurrency)
+        finally:
+            loop.cancel()
+            try:
+                await loop
+            except asyncio.CancelledError:
+                pass
+        print(f"add_expense p50/p99 without maintenance   {quiet[0]:>8.3f} / {quiet[1]:.3f} ms")
+        print(f"add_expense p50/p99 with a pass every 10ms {busy[0]:>7.3f} / {busy[1]:.3f} ms"
+              f" ({main._maintenance.passes} passes, {main._maintenance.deferred} deferred)")
+        return deferred
+    finally:
+        await main.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--burst", type=int, default=100_000, help="expenses imported while a snapshot is open")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=2000, help="add_expense calls per latency run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    main._result_cache.max_entries = 0
+    main._metrics.slow_seconds = float("inf")
+    main.MAINTENANCE_WAL_BYTES = 16 * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "maintenance.db")
+        datagen.build(main.DB_PATH, args.rows)
+        try:
+            ok = asyncio.run(run(main.DB_PATH, args.rows, args.burst, args.repeat, args.calls, args.concurrency))
+        finally:
+            # The archive partition is read-only; make it removable with the scratch directory
+            for root, _, files in os.walk(tmp):
+                for name in files:
+                    os.chmod(os.path.join(root, name), 0o644)
+        if not ok:
+            sys.exit(1)
@@ -0,0 +1,124 @@
+"""Exactness and aggregate speed of integer minor-unit amounts against REAL.
+
+Builds a datagen.py database of --rows expenses (amounts are stored as integer
+minor units) and checks three things:
+
+- round trip: every generated amount read back from the table, and a sample
+  read through get_expense_by_id, equals the amount that was written;
+- sum exactness: summarize and the SQL sums over the whole table equal the
+  exact sum of the generated amounts, and the same sums over a REAL copy of
+  the column show how far floating point drifts;
+- speed: median time of a GROUP BY category SUM and of a daily rollup
+  rebuild (GROUP BY day, category) over unindexed INTEGER and REAL copies.
+
+The exit status is 1 if any exactness check fails.
+
+    python benchmarks/money.py --rows 10000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+AGGREGATES = {
+    "SUM by category": "SELECT category, SUM(amount) FROM {table} GROUP BY category",
+    "daily rollup rebuild": """
+        SELECT date, category, COUNT(*), SUM(amount), MIN(amount), MAX(amount)
+        FROM {table} GROUP BY date, category
+    """,
+}
+
+
+def timed(c, sql, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = c.execute(sql).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), rows
+
+
+def check(label, ok, detail=""):
+    print(f"{label:<44} {'ok' if ok else 'FAILED'}  {detail}")
+    return ok
+
+
+async def through_tools(rows, exact_total, samples, seed):
+    scale = await main._amount_scale()
+    generated = {}
+    wanted = set(random.Random(seed).sample(range(1, rows + 1), min(samples, rows)))
+    for expense_id, (_, amount, *_) in enumerate(datagen.expenses(rows, seed), start=1):
+        if expense_id in wanted:
+            generated[expense_id] = amount
+    mismatches = 0
+    for expense_id, amount in generated.items():
+        result = await main.get_expense_by_id.fn(expense_id)
+        mismatches += result["expense"]["amount"] != amount
+    summary = await main.summarize.fn(datagen.START.isoformat(), "2099-12-31")
+    total = sum(row["total_amount"] for row in summary)
+    await main.close_pool()
+    ok = check("round trip through get_expense_by_id", not mismatches,
+               f"{len(generated):,} sampled, {mismatches} mismatches")
+    return check("summarize total", round(total * scale) == exact_total,
+                 f"{total:.2f} vs exact {exact_total / scale:.2f}") and ok
+
+
+def run(path, rows, seed, repeat, samples):
+    with sqlite3.connect(path) as c:
+        scale = int(c.execute("SELECT value FROM settings WHERE key = 'amount_scale'").fetchone()[0])
+        stored = c.execute("SELECT amount FROM expenses ORDER BY id")
+        exact_total, mismatches = 0, 0
+        for (minor,), (_, amount, *_) in zip(stored, datagen.expenses(rows, seed)):
+            exact_total += minor
+            mismatches += main._from_minor(minor, scale) != amount
+        ok = check("round trip of every stored amount", not mismatches, f"{rows:,} rows, {mismatches} mismatches")
+
+        # The same values as the REAL column held before the migration, and an INTEGER copy
+        # with the same layout, so the timings compare column types rather than indexes
+        c.execute(f"CREATE TEMP TABLE real_expenses AS SELECT date, category, amount * 1.0 / {scale} AS amount FROM expenses")
+        c.execute("CREATE TEMP TABLE integer_expenses AS SELECT date, category, amount FROM expenses")
+        integer_sum = c.execute("SELECT SUM(amount) FROM expenses").fetchone()[0]
+        real_sum = c.execute("SELECT SUM(amount) FROM real_expenses").fetchone()[0]
+        ok &= check("SUM(amount) over INTEGER", integer_sum == exact_total, f"{integer_sum} minor units")
+        print(f"{'SUM(amount) over REAL (before)':<44} drift {real_sum * scale - exact_total:+.6f} minor units")
+        real_daily = c.execute("SELECT SUM(total) FROM (SELECT ROUND(SUM(amount) * ?) AS total FROM real_expenses "
+                               "GROUP BY date, category)", (scale,)).fetchone()[0]
+        rollup_total = c.execute("SELECT SUM(total_amount) FROM expense_daily_rollup").fetchone()[0]
+        ok &= check("daily rollup total", rollup_total == exact_total, f"REAL rollup cells rounded: {real_daily:.0f}")
+
+        print(f"\n{'aggregate':<24} {'REAL ms':>10} {'INTEGER ms':>12} {'speedup':>8}")
+        for label, sql in AGGREGATES.items():
+            real_ms, _ = timed(c, sql.format(table="real_expenses"), repeat)
+            integer_ms, _ = timed(c, sql.format(table="integer_expenses"), repeat)
+            print(f"{label:<24} {real_ms:>10.1f} {integer_ms:>12.1f} {real_ms / integer_ms:>7.2f}x")
+    print()
+    main.DB_PATH = path
+    ok &= asyncio.run(through_tools(rows, exact_total, samples, seed))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--samples", type=int, default=2000, help="expenses read back through the tools")
+    args = parser.parse_args()
+    main._result_cache.max_entries = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "money.db")
+        started = time.perf_counter()
+        datagen.build(path, args.rows, args.seed)
+        print(f"Generated {args.rows:,} expenses in {time.perf_counter() - started:.1f}s\n")
+        if not run(path, args.rows, args.seed, args.repeat, args.samples):
+            sys.exit(1)
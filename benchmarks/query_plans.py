@@ -0,0 +1,140 @@
+"""Check that the read tools are answered through indexes, not table scans.
+
+Runs every read tool against a scratch database, records each statement it
+sends to SQLite and asserts that EXPLAIN QUERY PLAN for it never falls back to
+a full scan of the expenses table or its rollups, under their own name or an
+alias, nor walks the full-text index without a MATCH (budgets and recurring
+expenses are small enough that the planner is free to scan them). Exits
+non-zero if any plan does.
+
+    python benchmarks/query_plans.py
+"""
+import asyncio
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+GUARDED_TABLES = {"expenses", "expense_daily_rollup", "expense_monthly_rollup"}
+FTS_TABLE = "expenses_fts"
+# A guarded or full-text table in the SQL, with the alias that follows it, if any
+TABLE_REF = re.compile(r"\b(?:\w+\.)?(expenses_fts|expenses|expense_daily_rollup|expense_monthly_rollup)\b"
+                       r"(?:\s+AS)?(?:\s+(\w+))?", re.IGNORECASE)
+NOT_ALIASES = {"on", "where", "join", "left", "inner", "cross", "group", "order", "limit", "union", "match",
+               "indexed", "not", "using", "window", "having"}
+# FTS5 lists its constraints after the colon; "M" is a MATCH
+SCAN = re.compile(r"^SCAN (?:\w+\.)?(\w+)(?: VIRTUAL TABLE INDEX \d+:(\S*))?")
+
+# (tool name, kwargs) pairs exercising every read access path
+READ_CALLS = [
+    ("list_expenses", {"start_date": "2024-03-01", "end_date": "2024-03-31"}),
+    ("list_expenses", {"start_date": "2024-03-01", "end_date": "2024-03-31",
+                       "cursor": main._encode_cursor("date", "2024-03-15", 2500)}),
+    ("summarize", {"start_date": "2024-01-01", "end_date": "2024-06-30"}),
+    ("summarize", {"start_date": "2024-01-01", "end_date": "2024-06-30", "category": "food"}),
+    ("get_top_expenses", {"start_date": "2024-01-01", "end_date": "2024-01-31", "limit": 5}),
+    ("get_category_trends", {"category": "food", "start_date": "2024-01-01", "end_date": "2024-12-31", "group_by": "day"}),
+    ("get_category_trends", {"category": "food", "start_date": "2024-01-01", "end_date": "2024-12-31", "group_by": "week"}),
+    ("get_category_trends", {"category": "food", "start_date": "2024-01-01", "end_date": "2024-12-31", "group_by": "month"}),
+    ("check_budget_status", {"start_date": "2024-05-01", "end_date": "2024-05-31"}),
+    ("check_budget_status", {"as_of": "2024-05-15", "history_periods": 12}),
+    ("get_expense_statistics", {"start_date": "2024-01-01", "end_date": "2024-03-31"}),
+    ("get_expense_statistics", {"start_date": "2024-01-01", "end_date": "2024-03-31", "percentile_method": "none"}),
+    ("get_monthly_summary", {"year": 2024, "month": 2}),
+    ("get_monthly_summary", {"year": 2024}),
+    ("get_due_recurring_expenses", {"days_ahead": 30}),
+    ("get_changes_since", {"seq": 0, "limit": 50}),
+    ("search_expenses", {"keyword": "coffee"}),
+    ("search_expenses", {"keyword": "coffee", "cursor": main._encode_cursor("relevance", -1.0, "2024-06-01", 2500)}),
+    ("search_expenses", {"keyword": "coffee", "start_date": "2024-03-01", "end_date": "2024-03-31"}),
+    ("search_expenses", {"keyword": "coffee", "order_by": "date"}),
+    ("search_expenses", {"keyword": "coffee", "order_by": "date", "start_date": "2024-03-01",
+                         "cursor": main._encode_cursor("date", "2024-06-01", 2500)}),
+]
+
+
+def seed(path, rows=5000):
+    rng = random.Random(7)
+    categories = ["food", "transport", "housing", "utilities", "health", "shopping"]
+    with sqlite3.connect(path) as c:
+        c.executemany(
+            "INSERT INTO expenses(date, amount, category, subcategory, note) VALUES (?,?,?,?,?)",
+            [
+                (
+                    f"{rng.choice([2023, 2024])}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    rng.randint(100, 20000),
+                    rng.choice(categories),
+                    "other",
+                    rng.choice(["seed row", "coffee beans", "bus ticket"]),
+                )
+                for _ in range(rows)
+            ],
+        )
+        c.execute(
+            "INSERT INTO budgets(category, amount, period, start_date, created_date) "
+            "VALUES ('food', 50000, 'monthly', '2024-01-01', '2024-01-01')"
+        )
+        c.execute("ANALYZE")
+
+
+def full_scans(sql, plan):
+    '''The lines of plan that scan a guarded table, or the full-text index without a MATCH.'''
+    tables = {}
+    for table, alias in TABLE_REF.findall(sql):
+        tables[table.lower()] = table.lower()
+        if alias and alias.lower() not in NOT_ALIASES:
+            tables[alias] = table.lower()
+    scans = []
+    for line in plan:
+        match = SCAN.match(line)
+        if not match:
+            continue
+        table = tables.get(match.group(1), match.group(1))
+        if table in GUARDED_TABLES or (table == FTS_TABLE and "M" not in (match.group(2) or "")):
+            scans.append(line)
+    return scans
+
+
+async def capture_statements():
+    pool = await main.get_pool()
+    statements = []
+    for conn in pool._all_readers:
+        await conn.set_trace_callback(statements.append)
+    captured = []
+    for name, kwargs in READ_CALLS:
+        del statements[:]
+        result = await getattr(main, name).fn(**kwargs)
+        if isinstance(result, dict) and result.get("status") == "error":
+            raise SystemExit(f"{name} failed: {result['message']}")
+        captured.extend((name, sql) for sql in statements if sql.lstrip().upper().startswith(("SELECT", "WITH")))
+    await main.close_pool()
+    return captured
+
+
+def main_check():
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "plans.db")
+        main.init_db()
+        seed(main.DB_PATH)
+        captured = asyncio.run(capture_statements())
+        failures = 0
+        with sqlite3.connect(main.DB_PATH) as c:
+            for name, sql in captured:
+                plan = [row[3] for row in c.execute("EXPLAIN QUERY PLAN " + sql)]
+                scans = full_scans(sql, plan)
+                marker = "FAIL" if scans else "ok"
+                print(f"[{marker}] {name}: {' | '.join(plan)}")
+                failures += bool(scans)
+    if failures:
+        raise SystemExit(f"{failures} statement(s) fall back to a full table scan")
+    print(f"All {len(captured)} read statements use an index")
+
+
+if __name__ == "__main__":
+    main_check()
@@ -0,0 +1,97 @@
+"""Payload size and serialization time of records against columnar responses.
+
+Builds a datagen.py database of --rows expenses, then calls list_expenses,
+search_expenses and get_top_expenses with --page rows per call in both
+formats. Each call goes through the tool's run(), which is what the server
+does per request: it executes the query, builds the result and serializes it
+to the JSON text content and the structured content. The tool function alone
+and the serialization step are also timed separately. The result cache is
+disabled, as is the slow query log. It checks that both formats carry the
+same values.
+
+    python benchmarks/response_format.py --rows 200000 --page 1000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pydantic_core
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+# Tool name -> (arguments, key of the result list)
+CALLS = {
+    "list_expenses": ({"start_date": "2024-01-01", "end_date": "2024-12-31"}, "expenses"),
+    "search_expenses": ({"keyword": "netflix", "start_date": "2024-01-01", "end_date": "2024-12-31"}, "results"),
+    "get_top_expenses": ({"start_date": "2024-01-01", "end_date": "2024-12-31"}, "top_expenses"),
+}
+
+
+async def median_ms(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def as_records(result):
+    return [dict(zip(result["columns"], row)) for row in result["rows"]]
+
+
+async def compare(tool, page, repeat):
+    arguments, key = CALLS[tool]
+    arguments = {**arguments, "limit": page}
+    fn = getattr(main, tool)
+    measured = {}
+    for format in main.RESPONSE_FORMATS:
+        args = {**arguments, "format": format}
+        build_ms, result = await median_ms(lambda: fn.fn(**args), repeat)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            text = pydantic_core.to_json(result)
+        serialize_ms = (time.perf_counter() - started) * 1000 / repeat
+        run_ms, _ = await median_ms(lambda: fn.run(args), repeat)
+        measured[format] = (result, len(text), build_ms, serialize_ms, run_ms)
+        print(f"{tool:<18} {format:<9} {result['count']:>6} {len(text):>10,} {build_ms:>9.2f} {serialize_ms:>11.2f}"
+              f" {run_ms:>9.2f}")
+    records, columnar = measured["records"][0][key], measured["columnar"][0][key]
+    same = records == as_records(columnar)
+    size = measured["columnar"][1] / measured["records"][1]
+    speedup = measured["records"][4] / measured["columnar"][4]
+    print(f"{'':<18} columnar is {size:.0%} of the bytes, {speedup:.2f}x faster end to end;"
+          f" same values: {same}\n")
+    return same
+
+
+async def run(page, repeat):
+    print(f"{'tool':<18} {'format':<9} {'rows':>6} {'bytes':>10} {'tool ms':>9} {'to_json ms':>11} {'run() ms':>9}")
+    ok = True
+    for tool in CALLS:
+        ok &= await compare(tool, page, repeat)
+    await main.close_pool()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--page", type=int, default=1000, help="rows per call (raises EXPENSE_PAGE_SIZE_MAX if needed)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main._result_cache.max_entries = 0
+    main._metrics.slow_seconds = float("inf")
+    main.PAGE_SIZE_MAX = max(main.PAGE_SIZE_MAX, args.page)
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "format.db")
+        datagen.build(main.DB_PATH, args.rows)
+        if not asyncio.run(run(args.page, args.repeat)):
+            sys.exit(1)
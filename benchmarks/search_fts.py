@@ -0,0 +1,85 @@
+"""Compare the old LIKE-based search with the FTS5 index behind search_expenses.
+
+Builds a scratch database with --rows expenses (1M by default), then times the
+previous leading-wildcard LIKE implementation against the current
+search_expenses tool for a handful of keywords, with and without a date
+filter. Both sides run through the same connection pool and build the same
+result dicts, so the difference is the query itself.
+
+    python benchmarks/search_fts.py --rows 1000000 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+
+async def like_search(keyword, start_date=None, end_date=None):
+    '''The search_expenses implementation before the FTS5 index.'''
+    async with main.read_connection() as c:
+        query = """
+            SELECT id, date, amount, category, subcategory, note
+            FROM expenses
+            WHERE (category LIKE ? OR subcategory LIKE ? OR note LIKE ?)
+        """
+        params = [f"%{keyword}%"] * 3
+        if start_date and end_date:
+            query += " AND date BETWEEN ? AND ?"
+            params.extend([start_date, end_date])
+        query += " ORDER BY date DESC, id DESC"
+        cur = await c.execute(query, params)
+        cols = [d[0] for d in cur.description]
+        results = [dict(zip(cols, r)) for r in await cur.fetchall()]
+        return {"status": "success", "results": results, "count": len(results)}
+
+
+async def timed(call, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result["count"]
+
+
+async def compare(keywords, repeat, date_range):
+    print(f"{'keyword':<12} {'filter':<8} {'LIKE ms':>10} {'FTS ms':>10} {'speedup':>8} {'matches':>9}")
+    for keyword in keywords:
+        for dates in ((None, None), date_range):
+            like_ms, like_count = await timed(lambda: like_search(keyword, *dates), repeat)
+            fts_ms, fts_count = await timed(lambda: main.search_expenses.fn(
+                keyword, *dates, limit=main.PAGE_SIZE_MAX, order_by="date"), repeat)
+            label = "range" if dates[0] else "all"
+            print(f"{keyword:<12} {label:<8} {like_ms:>10.2f} {fts_ms:>10.2f} {like_ms / fts_ms:>7.1f}x {fts_count:>9}"
+                  + ("" if like_count == fts_count else f"  (LIKE substring matches: {like_count})"))
+    await main.close_pool()
+
+
+def run(rows, repeat, keywords):
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "search.db")
+        # One page holding every match, so both sides return the same rows
+        main.PAGE_SIZE_MAX = rows
+        main.init_db()
+        started = time.perf_counter()
+        datagen.populate(main.DB_PATH, rows, with_budgets=False, with_recurring=False)
+        print(f"Loaded {rows:,} rows in {time.perf_counter() - started:.1f}s\n")
+        asyncio.run(compare(keywords, repeat, ("2024-10-01", "2024-12-31")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keywords", nargs="+", default=["coffee", "netflix", "pharm", "taxi"])
+    args = parser.parse_args()
+    run(args.rows, args.repeat, args.keywords)
@@ -0,0 +1,83 @@
+"""Import time and time to first response of the server.
+
+Import: runs `import main` in --runs fresh interpreters and reports the
+median wall time. It also checks that the import neither creates the database
+nor writes to stdout.
+
+First response: starts the server over the stdio transport and measures the
+time from process spawn to the first tool result. That covers the import, the
+lifespan (migrations and pool) and the round trip. The first run uses a new
+database, so migrations run; later runs reuse it, so the schema is current.
+
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import main
+sys.stderr.write("import_seconds=%f\\n" % (time.perf_counter() - started))
+"""
+
+STDIO_SERVER = """
+import sys
+sys.path.insert(0, {root!r})
+import main
+main.mcp.run(transport="stdio", show_banner=False)
+"""
+
+
+def measure_import(db_path, runs):
+    samples = []
+    env = dict(os.environ, EXPENSE_DB_PATH=db_path)
+    for _ in range(runs):
+        done = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(root=ROOT)],
+                              env=env, capture_output=True, text=True, check=True)
+        if done.stdout:
+            print(f"Warning: importing main wrote to stdout: {done.stdout[:200]!r}")
+        line = [l for l in done.stderr.splitlines() if l.startswith("import_seconds=")][-1]
+        samples.append(float(line.split("=")[1]) * 1000)
+    touched = os.path.exists(db_path)
+    print(f"import main          median {statistics.median(samples):8.1f} ms  min {min(samples):8.1f} ms"
+          f"  (database created by import: {'yes' if touched else 'no'})")
+
+
+async def first_response(db_path):
+    from fastmcp import Client
+    from fastmcp.client.transports import StdioTransport
+    transport = StdioTransport(sys.executable, ["-c", STDIO_SERVER.format(root=ROOT)],
+                               env=dict(os.environ, EXPENSE_DB_PATH=db_path), keep_alive=False,
+                               log_file=Path(os.devnull))
+    started = time.perf_counter()
+    async with Client(transport) as client:
+        await client.call_tool("list_expenses", {"start_date": "2024-01-01", "end_date": "2024-01-31"})
+        return (time.perf_counter() - started) * 1000
+
+
+def measure_first_response(db_path, runs):
+    cold = asyncio.run(first_response(db_path))
+    warm = [asyncio.run(first_response(db_path)) for _ in range(runs)]
+    print(f"first response, new database       {cold:8.1f} ms")
+    print(f"first response, current schema     median {statistics.median(warm):8.1f} ms  min {min(warm):8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        measure_import(db_path, args.runs)
+        measure_first_response(db_path, args.runs)
@@ -0,0 +1,97 @@
+"""Count the passes get_expense_statistics makes over a date range.
+
+Loads --rows expenses into a scratch database, then runs the previous
+three-query implementation and the current tool (with exact, sketch and no
+percentiles) against the same range. Every statement sent to SQLite is
+captured with a trace callback; the "passes" column counts the SCAN/SEARCH
+steps over expenses or its rollups in their query plans.
+
+    python benchmarks/statistics_scans.py --rows 200000
+"""
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from bulk_ingest import generate  # noqa: E402
+
+TABLE_PASS = re.compile(r"^(SCAN|SEARCH) (?:\w+\.)?(expenses|expense_daily_rollup|expense_monthly_rollup)\b")
+
+
+async def legacy_statistics(start_date, end_date):
+    '''The get_expense_statistics implementation before the one-pass rewrite.'''
+    async with main.read_connection() as c:
+        cur = await c.execute("""
+            SELECT COUNT(*), SUM(amount), AVG(amount), MIN(amount), MAX(amount)
+            FROM expenses
+            WHERE date BETWEEN ? AND ?
+        """, (start_date, end_date))
+        basic_stats = await cur.fetchone()
+        cur = await c.execute("""
+            SELECT category, COUNT(*) as count, SUM(amount) as total, AVG(amount) as average
+            FROM expenses
+            WHERE date BETWEEN ? AND ?
+            GROUP BY category
+            ORDER BY total DESC
+        """, (start_date, end_date))
+        await cur.fetchall()
+        cur = await c.execute("""
+            SELECT COUNT(DISTINCT date)
+            FROM expenses
+            WHERE date BETWEEN ? AND ?
+        """, (start_date, end_date))
+        await cur.fetchone()
+    return {"status": "success", "basic_statistics": {"total_transactions": basic_stats[0]}}
+
+
+async def measure(label, call, repeat):
+    pool = await main.get_pool()
+    statements = []
+    for conn in pool._all_readers:
+        await conn.set_trace_callback(statements.append)
+    result = await call()
+    for conn in pool._all_readers:
+        await conn.set_trace_callback(None)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    passes = 0
+    with sqlite3.connect(main.DB_PATH) as c:
+        for sql in statements:
+            if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                passes += sum(bool(TABLE_PASS.match(row[3])) for row in c.execute("EXPLAIN QUERY PLAN " + sql))
+    print(f"{label:<16} {len(statements):>10} {passes:>7} {statistics.median(samples):>10.2f} "
+          f"{result['basic_statistics']['total_transactions']:>10,}")
+
+
+async def compare(rows, repeat, start_date, end_date):
+    await main.bulk_add_expenses.fn(list(generate(rows)))
+    print(f"{'implementation':<16} {'statements':>10} {'passes':>7} {'median ms':>10} {'rows':>10}")
+    await measure("legacy", lambda: legacy_statistics(start_date, end_date), repeat)
+    for method in ("exact", "sketch", "none"):
+        await measure(f"one-pass {method}", lambda: main.get_expense_statistics.fn(
+            start_date, end_date, percentile_method=method), repeat)
+    await main.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--start-date", default="2023-03-01")
+    parser.add_argument("--end-date", default="2024-08-31")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        main.DB_PATH = os.path.join(tmp, "statistics.db")
+        main.init_db()
+        asyncio.run(compare(args.rows, args.repeat, args.start_date, args.end_date))
@@ -0,0 +1,206 @@
+"""Latency and throughput of every tool against a generated data set.
+
+Builds (once, cached under --data-dir) a datagen.py database of --size or
+--rows expenses and copies it to a scratch file so write tools never change
+the cached copy. It then calls each tool function directly, --requests times
+per tool at each --concurrency level, with deterministic arguments. It
+reports p50/p95/p99 latency and throughput and writes the results as JSON. With
+--baseline, each p50/p95/p99 is compared against an earlier results file and
+the exit status is 1 if any of them regressed by more than --tolerance percent.
+
+The analytics result cache is disabled unless --cache is given, so repeated
+arguments measure the queries rather than cache hits.
+
+    python benchmarks/suite.py --size 1m --concurrency 1 8 --output results.json
+    python benchmarks/suite.py --size 1m --concurrency 1 8 --baseline results.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import datagen  # noqa: E402
+
+
+def _day(rng, span=datagen.DAYS):
+    return datagen.START + datetime.timedelta(days=rng.randrange(span))
+
+
+def _range(rng, days):
+    start = _day(rng, datagen.DAYS - days)
+    return start.isoformat(), (start + datetime.timedelta(days=days - 1)).isoformat()
+
+
+def _category(rng):
+    return rng.choice(["food", "transport", "shopping", "entertainment", "utilities"])
+
+
+# Tool name -> function of (rng, max_id) returning keyword arguments for one call
+WORKLOAD = {
+    "list_expenses": lambda rng, n: dict(zip(("start_date", "end_date"), _range(rng, 31))),
+    "search_expenses": lambda rng, n: {"keyword": rng.choice(["coffee", "netflix", "taxi", "pharmacy"]),
+                                       "limit": 50},
+    "get_expense_by_id": lambda rng, n: {"expense_id": rng.randint(1, n)},
+    "summarize": lambda rng, n: dict(zip(("start_date", "end_date"), _range(rng, 90))),
+    "get_monthly_summary": lambda rng, n: {"year": rng.randint(2021, 2025), "month": rng.randint(1, 12)},
+    "get_top_expenses": lambda rng, n: dict(zip(("start_date", "end_date"), _range(rng, 90))),
+    "get_expense_statistics": lambda rng, n: dict(zip(("start_date", "end_date"), _range(rng, 90))),
+    "get_category_trends": lambda rng, n: {"category": _category(rng),
+                                           **dict(zip(("start_date", "end_date"), _range(rng, 365)))},
+    "get_multi_category_trends": lambda rng, n: dict(zip(("start_date", "end_date"), _range(rng, 365))),
+    "check_budget_status": lambda rng, n: {"as_of": _day(rng).isoformat()},
+    "get_due_recurring_expenses": lambda rng, n: {"days_ahead": 30},
+    "export_expenses_csv": lambda rng, n: dict(zip(("start_date", "end_date"), _range(rng, 7))),
+    "add_expense": lambda rng, n: {"date": _day(rng).isoformat(), "amount": round(rng.lognormvariate(3, 1), 2),
+                                   "category": "food", "subcategory": "groceries", "note": "benchmark"},
+    "update_expense": lambda rng, n: {"expense_id": rng.randint(1, n), "amount": round(rng.lognormvariate(3, 1), 2)},
+}
+
+
+def percentile(samples, q):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def measure(tool, requests, concurrency, seed, max_id):
+    rng = random.Random(f"{seed}:{tool}")
+    calls = iter([WORKLOAD[tool](rng, max_id) for _ in range(requests)])
+    fn = getattr(main, tool).fn
+    samples = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for kwargs in calls:
+            started = time.perf_counter()
+            result = await fn(**kwargs)
+            samples.append((time.perf_counter() - started) * 1000)
+            errors += isinstance(result, dict) and result.get("status") == "error"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "tool": tool,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+
+
+async def run(tools, requests, concurrency_levels, seed, max_id):
+    results = {}
+    print(f"{'tool':<28} {'conc':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>6}")
+    for tool in tools:
+        for concurrency in concurrency_levels:
+            r = await measure(tool, requests, concurrency, seed, max_id)
+            results[f"{tool}@{concurrency}"] = r
+            print(f"{tool:<28} {concurrency:>4} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+                  f" {r['throughput_rps']:>9.1f} {r['errors']:>6}")
+    await main.close_pool()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''Print latency changes against a baseline run; return the keys that regressed.'''
+    regressed = []
+    print(f"\n{'vs baseline':<33} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for key, r in results.items():
+        old = baseline.get("results", {}).get(key)
+        if old is None:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            change = (r[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            changes.append(change)
+            if change > tolerance:
+                regressed.append(f"{key} {metric}")
+        print(f"{key:<33} " + " ".join(f"{c:>+8.1f}%" for c in changes))
+    return regressed
+
+
+def dataset(data_dir, rows, seed):
+    '''Path of the cached generated database, building it on first use.'''
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"expenses-{rows}-{seed}.db")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        datagen.build(path + ".tmp", rows, seed)
+        os.replace(path + ".tmp", path)
+        print(f"Generated {rows:,} expenses in {time.perf_counter() - started:.1f}s -> {path}")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=sorted(datagen.SIZES), default="100k")
+    parser.add_argument("--rows", type=int, help="overrides --size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=200, help="calls per tool and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--tools", nargs="+", choices=sorted(WORKLOAD), default=list(WORKLOAD))
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "expense_bench"))
+    parser.add_argument("--cache", action="store_true", help="keep the analytics result cache enabled")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed latency increase in percent")
+    args = parser.parse_args()
+
+    rows = args.rows or datagen.SIZES[args.size]
+    source = dataset(args.data_dir, rows, args.seed)
+    if not args.cache:
+        main._result_cache.max_entries = 0
+    with tempfile.TemporaryDirectory(dir=args.data_dir) as tmp:
+        main.DB_PATH = os.path.join(tmp, "work.db")
+        shutil.copyfile(source, main.DB_PATH)
+        main.EXPORT_DIR = os.path.join(tmp, "exports")
+        with sqlite3.connect(main.DB_PATH) as c:
+            max_id = c.execute("SELECT MAX(id) FROM expenses").fetchone()[0] or 1
+        results = asyncio.run(run(args.tools, args.requests, args.concurrency, args.seed, max_id))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "rows": rows,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": args.cache,
+            "pool_readers": main.POOL_READERS,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("rows") != rows:
+            print(f"Warning: baseline was run with {baseline.get('meta', {}).get('rows')} rows, not {rows}")
+        regressed = compare(results, baseline, args.tolerance)
+        if regressed:
+            print(f"\nRegressed by more than {args.tolerance}%: " + ", ".join(regressed))
+            sys.exit(1)
@@ -0,0 +1,68 @@
+"""Throughput of concurrent add_expense calls with and without group commit.
+
+Fires --calls add_expense calls from --concurrency concurrent clients, first
+with the previous behaviour (each call takes the writer and commits on its
+own), then through the write queue with a few batching windows. The queue
+statistics show how many calls each commit carried.
+
+    python benchmarks/write_batching.py --calls 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+async def direct_add(date, amount, category, subcategory="", note=""):
+    amount = main._to_minor(amount, await main._amount_scale())
+    async with main.write_connection() as c:
+        cur = await c.execute(
+            "INSERT INTO expenses(date, amount, category, subcategory, note) VALUES (?,?,?,?,?)",
+            (date, amount, category, subcategory, note)
+        )
+        await c.commit()
+        return {"status": "success", "id": cur.lastrowid}
+
+
+async def drive(label, add, calls, concurrency):
+    pending = iter(range(calls))
+
+    async def client():
+        for i in pending:
+            result = await add(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", i % 500 + 0.5, "food", "groceries", "bench")
+            assert result["status"] == "success", result
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    line = f"{label:<22} {calls:>8,} calls {elapsed:>8.2f}s {calls / elapsed:>10,.0f} calls/s"
+    if main._write_queue is not None:
+        stats = main._write_queue.stats()
+        line += f"  avg batch {stats['avg_batch_size']:>6}  max depth {stats['max_queue_depth']}"
+    print(line)
+    await main.close_pool()
+
+
+def scratch_db(tmp, name):
+    main.DB_PATH = os.path.join(tmp, name)
+    main.init_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch_db(tmp, "direct.db")
+        asyncio.run(drive("commit per call", direct_add, args.calls, args.concurrency))
+        for window in (0, 2, 10):
+            main.WRITE_BATCH_WINDOW_MS = window
+            scratch_db(tmp, f"queue_{window}.db")
+            asyncio.run(drive(f"queue window {window}ms", main.add_expense.fn, args.calls, args.concurrency))
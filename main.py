@@ -1,200 +1,2208 @@
 from fastmcp import FastMCP
+from fastmcp.server.middleware import Middleware
 import os
-import aiosqlite  # Changed: sqlite3 → aiosqlite
+import asyncio
+import time
+import sys
 import tempfile
 import json
+import contextvars
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
-# Use temporary directory which should be writable
+# Use temporary directory which should be writable, unless EXPENSE_DB_PATH says otherwise
 TEMP_DIR = tempfile.gettempdir()
-DB_PATH = os.path.join(TEMP_DIR, "expenses.db")
+DB_PATH = os.environ.get("EXPENSE_DB_PATH") or os.path.join(TEMP_DIR, "expenses.db")
 CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), "categories.json")
 
-print(f"Database path: {DB_PATH}")
+# Connection pool settings (one writer + N readers, shared by every tool)
+POOL_READERS = int(os.environ.get("EXPENSE_POOL_READERS", "4"))
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get("EXPENSE_POOL_ACQUIRE_TIMEOUT", "10"))
+CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
 
-mcp = FastMCP("ExpenseTracker")
+# Group commit: single-row writes queued from concurrent tool calls share one transaction
+WRITE_BATCH_SIZE = int(os.environ.get("EXPENSE_WRITE_BATCH_SIZE", "64"))
+WRITE_BATCH_WINDOW_MS = float(os.environ.get("EXPENSE_WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_QUEUE_DEPTH = int(os.environ.get("EXPENSE_WRITE_QUEUE_DEPTH", "1024"))
 
-def init_db():  # Keep as sync for initialization
+# Tenants: each tenant id gets its own SQLite shard in TENANT_DIR, chosen per call by a
+# "tenant_id" tool argument or the TENANT_HEADER HTTP header (neither means DB_PATH). At
+# most TENANT_MAX_OPEN shards keep a pool open; pools idle for TENANT_IDLE_SECONDS close
+TENANT_DIR = os.environ.get("EXPENSE_TENANT_DIR", os.path.join(TEMP_DIR, "expense_tenants"))
+TENANT_HEADER = os.environ.get("EXPENSE_TENANT_HEADER", "x-tenant-id").lower()
+TENANT_MAX_OPEN = int(os.environ.get("EXPENSE_TENANT_MAX_OPEN", "16"))
+TENANT_IDLE_SECONDS = float(os.environ.get("EXPENSE_TENANT_IDLE_SECONDS", "300"))
+TENANT_POOL_READERS = int(os.environ.get("EXPENSE_TENANT_POOL_READERS", "2"))
+TENANT_FANOUT_CONCURRENCY = int(os.environ.get("EXPENSE_TENANT_FANOUT_CONCURRENCY", "8"))
+# Cross-tenant admin tools are only registered when an admin token is configured, and each
+# call must pass it as "admin_token"
+ADMIN_TOKEN = os.environ.get("EXPENSE_ADMIN_TOKEN", "")
+
+# Money is stored as integer minor units. A new database records its currency and scale
+# (minor units per major unit, 10 ** CURRENCY_DECIMALS) in its settings table; an existing
+# database keeps the ones it was created with
+CURRENCY = os.environ.get("EXPENSE_CURRENCY", "USD")
+CURRENCY_DECIMALS = int(os.environ.get("EXPENSE_CURRENCY_DECIMALS", "2"))
+
+# Result cache for read-only analytics tools (0 entries disables it)
+CACHE_MAX_ENTRIES = int(os.environ.get("EXPENSE_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.environ.get("EXPENSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+CACHE_DISABLED_TOOLS = {
+    name.strip() for name in os.environ.get("EXPENSE_CACHE_DISABLED_TOOLS", "").split(",") if name.strip()
+}
+
+# Category/subcategory checks on writes: "canonicalize" fixes the spelling of values known to
+# categories.json and keeps others (such as legacy names), "strict" rejects values missing
+# from it, "off" skips both
+CATEGORY_VALIDATION = os.environ.get("EXPENSE_CATEGORY_VALIDATION", "canonicalize")
+
+# Background processing of due recurring expenses: seconds between runs (0 disables it)
+# and the most occurrences one recurring expense may catch up on per run
+RECURRING_INTERVAL = float(os.environ.get("EXPENSE_RECURRING_INTERVAL", "0"))
+RECURRING_MAX_OCCURRENCES = int(os.environ.get("EXPENSE_RECURRING_MAX_OCCURRENCES", "366"))
+
+# Bulk ingestion: rows validated and written per transaction, and the directory
+# file_path imports are read from
+BULK_CHUNK_SIZE = int(os.environ.get("EXPENSE_BULK_CHUNK_SIZE", "5000"))
+IMPORT_DIR = os.environ.get("EXPENSE_IMPORT_DIR", os.path.join(TEMP_DIR, "expense_imports"))
+
+# Paged list/search responses: rows per page when no limit is given, and the upper bound
+PAGE_SIZE_DEFAULT = int(os.environ.get("EXPENSE_PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.environ.get("EXPENSE_PAGE_SIZE_MAX", "1000"))
+
+# Percentiles in get_expense_statistics: "exact", "sketch" (bounded memory) or "none"
+STATS_PERCENTILE_METHOD = os.environ.get("EXPENSE_PERCENTILE_METHOD", "exact")
+STATS_SKETCH_ACCURACY = float(os.environ.get("EXPENSE_SKETCH_ACCURACY", "0.01"))
+
+# Streaming exports: server-side output directory and rows fetched per cursor round trip.
+# Inline exports are built in memory, so they stop at EXPORT_INLINE_MAX_BYTES
+EXPORT_DIR = os.environ.get("EXPENSE_EXPORT_DIR", os.path.join(TEMP_DIR, "expense_exports"))
+EXPORT_FETCH_SIZE = int(os.environ.get("EXPENSE_EXPORT_FETCH_SIZE", "2000"))
+EXPORT_INLINE_MAX_BYTES = int(os.environ.get("EXPENSE_EXPORT_INLINE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Archived years live in one read-only SQLite file each, in <database name>_archive/
+# next to the database. A query attaches at most this many of them (SQLite's default
+# SQLITE_MAX_ATTACHED)
+ARCHIVE_MAX_ATTACHED = 10
+
+# Background maintenance of every open database, once per MAINTENANCE_INTERVAL seconds (0
+# disables it): free pages released by incremental vacuum (at most MAINTENANCE_VACUUM_PAGES
+# per pass), PRAGMA optimize, a full ANALYZE every MAINTENANCE_ANALYZE_INTERVAL seconds, and a
+# WAL checkpoint that also truncates the -wal file once it exceeds MAINTENANCE_WAL_BYTES. With
+# more than MAINTENANCE_BUSY_CONNECTIONS connections of a database checked out or waited for,
+# only a passive checkpoint runs and the rest is retried after a growing delay
+MAINTENANCE_INTERVAL = float(os.environ.get("EXPENSE_MAINTENANCE_INTERVAL", "300"))
+MAINTENANCE_WAL_BYTES = int(os.environ.get("EXPENSE_MAINTENANCE_WAL_BYTES", str(64 * 1024 * 1024)))
+MAINTENANCE_VACUUM_PAGES = int(os.environ.get("EXPENSE_MAINTENANCE_VACUUM_PAGES", "2048"))
+MAINTENANCE_ANALYZE_INTERVAL = float(os.environ.get("EXPENSE_MAINTENANCE_ANALYZE_INTERVAL", "86400"))
+MAINTENANCE_BUSY_CONNECTIONS = int(os.environ.get("EXPENSE_MAINTENANCE_BUSY_CONNECTIONS", "1"))
+
+# Change feed: get_changes_since entries older than CHANGE_LOG_RETENTION_DAYS are removed by
+# the maintenance task, at most CHANGE_LOG_COMPACT_ROWS per pass; clients further behind resync
+CHANGE_LOG_RETENTION_DAYS = float(os.environ.get("EXPENSE_CHANGE_LOG_RETENTION_DAYS", "30"))
+CHANGE_LOG_COMPACT_ROWS = int(os.environ.get("EXPENSE_CHANGE_LOG_COMPACT_ROWS", "10000"))
+
+# Instrumentation: statements slower than this are logged with their query plan
+SLOW_QUERY_MS = float(os.environ.get("EXPENSE_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_SIZE = int(os.environ.get("EXPENSE_SLOW_QUERY_LOG_SIZE", "50"))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _log(message):
+    '''Diagnostics go to stderr: stdout carries the protocol on the stdio transport.'''
+    print(message, file=sys.stderr, flush=True)
+
+
+# Instrumentation
+class LatencyHistogram:
+    '''Cumulative-bucket latency histogram (seconds), Prometheus style.'''
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        import bisect
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        '''Estimate a quantile by interpolating inside the bucket that holds it.'''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, n in zip(self.buckets + (self.max,), self.counts):
+            if n and seen + n >= rank:
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+            lower = upper
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50) * 1000, 3),
+            "p95_ms": round(self.quantile(0.95) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class Metrics:
+    '''Per-tool call/error/latency/row counters, per-statement SQL time and a slow-query log.'''
+
+    max_statements = 500
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log_size=SLOW_QUERY_LOG_SIZE):
+        from collections import deque
+        self.slow_seconds = slow_ms / 1000
+        self.tools = {}
+        self.statements = {}
+        self.slow_queries = deque(maxlen=max(1, slow_log_size))
+        self.started = time.time()
+
+    def record_tool(self, name, seconds, error, call):
+        entry = self.tools.get(name)
+        if entry is None:
+            entry = self.tools[name] = {
+                "calls": 0, "errors": 0, "rows": 0, "statements": 0,
+                "sql_seconds": 0.0, "latency": LatencyHistogram(),
+            }
+        entry["calls"] += 1
+        entry["errors"] += bool(error)
+        entry["rows"] += call["rows"]
+        entry["statements"] += call["statements"]
+        entry["sql_seconds"] += call["sql_seconds"]
+        entry["latency"].observe(seconds)
+
+    def record_sql(self, sql, seconds, rows):
+        key = " ".join(sql.split())[:300]
+        entry = self.statements.get(key)
+        if entry is None:
+            if len(self.statements) >= self.max_statements:
+                key = "(other)"
+                entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = {"calls": 0, "rows": 0, "seconds": 0.0, "max_seconds": 0.0}
+        entry["calls"] += 1
+        entry["rows"] += rows
+        entry["seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        call = _current_call.get()
+        if call is not None:
+            call["statements"] += 1
+            call["rows"] += rows
+            call["sql_seconds"] += seconds
+
+    def record_slow(self, tool, sql, params, seconds, phase, plan):
+        self.slow_queries.append({
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "tool": tool,
+            "phase": phase,
+            "ms": round(seconds * 1000, 3),
+            "sql": " ".join(sql.split()),
+            "params": [repr(p) for p in params][:20] if params else [],
+            "plan": plan,
+        })
+        _log(f"Slow query ({seconds * 1000:.1f} ms, {tool or 'no tool'}): {' '.join(sql.split())[:200]}")
+
+    def snapshot(self):
+        tools = {}
+        for name, entry in sorted(self.tools.items()):
+            tools[name] = {
+                "calls": entry["calls"],
+                "errors": entry["errors"],
+                "rows": entry["rows"],
+                "statements": entry["statements"],
+                "sql_ms": round(entry["sql_seconds"] * 1000, 3),
+                "latency": entry["latency"].summary(),
+            }
+        statements = sorted(self.statements.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        return {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "slow_query_ms": self.slow_seconds * 1000,
+            "tools": tools,
+            "statements": [
+                {
+                    "sql": sql,
+                    "calls": entry["calls"],
+                    "rows": entry["rows"],
+                    "total_ms": round(entry["seconds"] * 1000, 3),
+                    "avg_ms": round(entry["seconds"] / entry["calls"] * 1000, 3),
+                    "max_ms": round(entry["max_seconds"] * 1000, 3),
+                }
+                for sql, entry in statements
+            ],
+            "slow_queries": list(self.slow_queries),
+        }
+
+    def prometheus(self):
+        '''Render the counters in the Prometheus text exposition format.'''
+        def label(value):
+            return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", " ")
+
+        lines = [
+            "# HELP expense_tool_calls_total Tool calls.",
+            "# TYPE expense_tool_calls_total counter",
+        ]
+        tools = sorted(self.tools.items())
+        lines += [f'expense_tool_calls_total{{tool="{name}"}} {e["calls"]}' for name, e in tools]
+        lines += ["# HELP expense_tool_errors_total Tool calls that raised or returned status=error.",
+                  "# TYPE expense_tool_errors_total counter"]
+        lines += [f'expense_tool_errors_total{{tool="{name}"}} {e["errors"]}' for name, e in tools]
+        lines += ["# HELP expense_tool_rows_total Rows fetched from SQLite by tool calls.",
+                  "# TYPE expense_tool_rows_total counter"]
+        lines += [f'expense_tool_rows_total{{tool="{name}"}} {e["rows"]}' for name, e in tools]
+        lines += ["# HELP expense_tool_sql_seconds_total Time spent in SQL statements by tool calls.",
+                  "# TYPE expense_tool_sql_seconds_total counter"]
+        lines += [f'expense_tool_sql_seconds_total{{tool="{name}"}} {e["sql_seconds"]:.6f}' for name, e in tools]
+        lines += ["# HELP expense_tool_duration_seconds Tool call latency.",
+                  "# TYPE expense_tool_duration_seconds histogram"]
+        for name, e in tools:
+            hist = e["latency"]
+            cumulative = 0
+            for upper, n in zip(hist.buckets, hist.counts):
+                cumulative += n
+                lines.append(f'expense_tool_duration_seconds_bucket{{tool="{name}",le="{upper}"}} {cumulative}')
+            lines.append(f'expense_tool_duration_seconds_bucket{{tool="{name}",le="+Inf"}} {hist.count}')
+            lines.append(f'expense_tool_duration_seconds_sum{{tool="{name}"}} {hist.total:.6f}')
+            lines.append(f'expense_tool_duration_seconds_count{{tool="{name}"}} {hist.count}')
+        lines += ["# HELP expense_sql_seconds_total Time spent executing and fetching each statement.",
+                  "# TYPE expense_sql_seconds_total counter"]
+        statements = sorted(self.statements.items())
+        lines += [f'expense_sql_seconds_total{{sql="{label(sql)}"}} {e["seconds"]:.6f}' for sql, e in statements]
+        lines += ["# HELP expense_sql_calls_total Statement executions.",
+                  "# TYPE expense_sql_calls_total counter"]
+        lines += [f'expense_sql_calls_total{{sql="{label(sql)}"}} {e["calls"]}' for sql, e in statements]
+        lines += ["# HELP expense_slow_queries Slow statements currently held in the slow-query log.",
+                  "# TYPE expense_slow_queries gauge",
+                  f"expense_slow_queries {len(self.slow_queries)}"]
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+# Per tool call counters ({"rows", "statements", "sql_seconds"}), None outside a tool call
+_current_call = contextvars.ContextVar("expense_current_call", default=None)
+_current_tool = contextvars.ContextVar("expense_current_tool", default=None)
+
+
+class _TimedCursor:
+    '''aiosqlite cursor wrapper that adds fetch time and row counts to the statement metrics.'''
+
+    def __init__(self, cursor, connection, sql, params):
+        self._cursor = cursor
+        self._connection = connection
+        self._sql = sql
+        self._params = params
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def _timed(self, fetch, *args):
+        started = time.perf_counter()
+        rows = await fetch(*args)
+        elapsed = time.perf_counter() - started
+        count = len(rows) if isinstance(rows, list) else int(rows is not None)
+        _metrics.record_sql(self._sql, elapsed, count)
+        if elapsed >= _metrics.slow_seconds:
+            await self._connection._log_slow(self._sql, self._params, elapsed, "fetch")
+        return rows
+
+    async def fetchone(self):
+        return await self._timed(self._cursor.fetchone)
+
+    async def fetchmany(self, size=None):
+        if size is None:
+            return await self._timed(self._cursor.fetchmany)
+        return await self._timed(self._cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await self._timed(self._cursor.fetchall)
+
+    def __aiter__(self):
+        return self._cursor.__aiter__()
+
+
+class _TimedConnection:
+    '''aiosqlite connection wrapper that times every statement for the metrics resource.'''
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    async def _log_slow(self, sql, params, seconds, phase):
+        plan = []
+        try:
+            cur = await self._connection.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())
+            plan = [row[-1] for row in await cur.fetchall()]
+        except Exception as e:
+            plan = [f"EXPLAIN QUERY PLAN failed: {e}"]
+        _metrics.record_slow(_current_tool.get(), sql, params, seconds, phase, plan)
+
+    async def execute(self, sql, params=None):
+        started = time.perf_counter()
+        cursor = await self._connection.execute(sql, params)
+        elapsed = time.perf_counter() - started
+        _metrics.record_sql(sql, elapsed, 0)
+        if elapsed >= _metrics.slow_seconds:
+            await self._log_slow(sql, params, elapsed, "execute")
+        return _TimedCursor(cursor, self, sql, params)
+
+    async def commit(self):
+        started = time.perf_counter()
+        await self._connection.commit()
+        elapsed = time.perf_counter() - started
+        _metrics.record_sql("COMMIT", elapsed, 0)
+        if elapsed >= _metrics.slow_seconds:
+            _metrics.record_slow(_current_tool.get(), "COMMIT", None, elapsed, "commit", [])
+
+    async def executemany(self, sql, params):
+        started = time.perf_counter()
+        cursor = await self._connection.executemany(sql, params)
+        elapsed = time.perf_counter() - started
+        _metrics.record_sql(sql, elapsed, 0)
+        if elapsed >= _metrics.slow_seconds:
+            await self._log_slow(sql, None, elapsed, "executemany")
+        return cursor
+
+
+class PoolTimeout(Exception):
+    '''Raised when no pooled connection becomes free within the acquire timeout.'''
+
+
+class ConnectionPool:
+    '''A dedicated writer connection plus a fixed set of read-only reader connections.
+
+    Connections are opened once and PRAGMAs are applied once per connection,
+    so tool calls only pay for checkout instead of connect + schema parse.
+    '''
+
+    def __init__(self, path, readers=POOL_READERS, acquire_timeout=POOL_ACQUIRE_TIMEOUT,
+                 pragmas=CONNECTION_PRAGMAS):
+        self.path = path
+        self.size = max(1, int(readers))
+        self.acquire_timeout = acquire_timeout
+        self.pragmas = tuple(pragmas)
+        self._readers = asyncio.Queue()
+        self._all_readers = []
+        self._writer = None
+        self._writer_lock = asyncio.Lock()
+        # Minor units per major unit of this database's amounts (settings table)
+        self.scale = None
+        self._opened_at = None
+        self._closed = True
+        # Metrics
+        self._acquisitions = {"reader": 0, "writer": 0}
+        self._wait_total = {"reader": 0.0, "writer": 0.0}
+        self._wait_max = {"reader": 0.0, "writer": 0.0}
+        self._busy_total = {"reader": 0.0, "writer": 0.0}
+        self._timeouts = {"reader": 0, "writer": 0}
+        self._readers_in_use = 0
+        self._waiting = 0
+
+    async def _connect(self, readonly=False):
+        import aiosqlite
+        if readonly:
+            # mode=ro: readers can never take the write lock, and in WAL mode they read
+            # their own snapshot instead of waiting for (or blocking) the writer
+            from pathlib import Path
+            conn = await aiosqlite.connect(f"{Path(self.path).resolve().as_uri()}?mode=ro", uri=True)
+        else:
+            conn = await aiosqlite.connect(self.path)
+        for pragma in self.pragmas:
+            await conn.execute(pragma)
+        return conn
+
+    async def open(self):
+        '''Open the writer and all (read-only) reader connections.'''
+        # The writer goes first: it creates the -wal/-shm files read-only connections rely on
+        self._writer = await self._connect()
+        cur = await self._writer.execute("SELECT value FROM settings WHERE key = 'amount_scale'")
+        self.scale = int((await cur.fetchone())[0])
+        for _ in range(self.size):
+            conn = await self._connect(readonly=True)
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+        self._opened_at = time.perf_counter()
+        self._closed = False
+
+    async def close(self):
+        '''Close every pooled connection. Checked-out connections are closed too.'''
+        self._closed = True
+        async with self._writer_lock:
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers = []
+        self._readers = asyncio.Queue()
+
+    def _record_wait(self, kind, waited):
+        self._acquisitions[kind] += 1
+        self._wait_total[kind] += waited
+        self._wait_max[kind] = max(self._wait_max[kind], waited)
+
+    @asynccontextmanager
+    async def reader(self):
+        '''Check out a reader connection for the duration of the block.'''
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            conn = await asyncio.wait_for(self._readers.get(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._timeouts["reader"] += 1
+            raise PoolTimeout(f"No reader connection available after {self.acquire_timeout}s")
+        finally:
+            self._waiting -= 1
+        acquired = time.perf_counter()
+        self._record_wait("reader", acquired - started)
+        self._readers_in_use += 1
+        try:
+            yield _TimedConnection(conn)
+        finally:
+            self._readers_in_use -= 1
+            self._busy_total["reader"] += time.perf_counter() - acquired
+            if conn.in_transaction:
+                await conn.rollback()
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        '''Check out the single writer connection. Uncommitted work is rolled back on exit.'''
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._writer_lock.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._timeouts["writer"] += 1
+            raise PoolTimeout(f"Writer connection busy for more than {self.acquire_timeout}s")
+        finally:
+            self._waiting -= 1
+        acquired = time.perf_counter()
+        self._record_wait("writer", acquired - started)
+        try:
+            yield _TimedConnection(self._writer)
+        finally:
+            try:
+                if self._writer is not None and self._writer.in_transaction:
+                    await self._writer.rollback()
+            finally:
+                self._busy_total["writer"] += time.perf_counter() - acquired
+                self._writer_lock.release()
+
+    @property
+    def busy(self):
+        '''True while any connection is checked out or waited for.'''
+        return bool(self._readers_in_use or self._waiting or self._writer_lock.locked())
+
+    @property
+    def load(self):
+        '''Connections checked out or waited for right now.'''
+        return self._readers_in_use + self._waiting + self._writer_lock.locked()
+
+    def stats(self):
+        '''Wait-time and utilization counters for the pool.'''
+        uptime = (time.perf_counter() - self._opened_at) if self._opened_at else 0.0
+        result = {
+            "path": self.path,
+            "readers": self.size,
+            "readers_in_use": self._readers_in_use,
+            "writer_in_use": self._writer_lock.locked(),
+            "acquire_timeout": self.acquire_timeout,
+            "uptime_seconds": round(uptime, 3),
+        }
+        for kind, connections in (("reader", self.size), ("writer", 1)):
+            count = self._acquisitions[kind]
+            result[kind] = {
+                "acquisitions": count,
+                "timeouts": self._timeouts[kind],
+                "avg_wait_ms": round(self._wait_total[kind] / count * 1000, 3) if count else 0.0,
+                "max_wait_ms": round(self._wait_max[kind] * 1000, 3),
+                "utilization": round(self._busy_total[kind] / (uptime * connections), 4) if uptime else 0.0,
+            }
+        return result
+
+
+_pool = None
+_pool_opening = None
+
+
+async def _open_pool():
+    global _pool
+    if DB_PATH not in _initialized_paths:
+        # Schema work is blocking sqlite3 I/O; keep it off the event loop
+        await asyncio.to_thread(init_db)
+    pool = ConnectionPool(DB_PATH)
+    await pool.open()
+    _pool = pool
+
+
+async def get_pool():
+    '''Return the connection pool of the current tenant's shard, opening it on first use.'''
+    global _pool_opening
+    tenant = _current_tenant.get()
+    if tenant is not None:
+        return (await _tenant_shards.get(tenant)).pool
+    while _pool is None:
+        # Concurrent first calls share a single migration and pool open, as TenantShards.get
+        # does; a failed open is retried by the next call
+        if _pool_opening is None or _pool_opening.done():
+            _pool_opening = asyncio.ensure_future(_open_pool())
+        await asyncio.shield(_pool_opening)
+    return _pool
+
+
+async def close_pool():
+    '''Close the shared connection pool and every open tenant shard (get_pool() reopens them).'''
+    import anyio
+    global _pool, _write_queue
+    queue, _write_queue = _write_queue, None
+    pool, _pool = _pool, None
+    # Shielded: a shutdown cancelled halfway would leave pools open and their threads
+    # would keep the process alive
+    with anyio.CancelScope(shield=True):
+        try:
+            if queue is not None:
+                await queue.stop()
+        finally:
+            try:
+                if pool is not None:
+                    await pool.close()
+            finally:
+                await _tenant_shards.close()
+
+
+@asynccontextmanager
+async def read_connection(snapshot=False):
+    '''Check out a pooled read-only connection.
+
+    With snapshot=True the block runs inside one read transaction, so all of its
+    statements see the same WAL snapshot even if writes commit in between.
+    '''
+    pool = await get_pool()
+    async with pool.reader() as c:
+        if snapshot:
+            # Ended by the rollback pool.reader() does on release
+            await c.execute("BEGIN")
+        yield c
+
+
+# Archive partitions of the years a date range overlaps, newest first
+ARCHIVE_PARTITIONS_QUERY = """
+    SELECT year, file FROM archive_partitions
+    WHERE year BETWEEN CAST(substr(?, 1, 4) AS INTEGER) AND CAST(substr(?, 1, 4) AS INTEGER)
+    ORDER BY year DESC
+"""
+
+def _archive_dir(db_path):
+    '''Directory holding the archive partitions of the database at db_path.'''
+    return os.path.splitext(os.path.abspath(db_path))[0] + "_archive"
+
+async def _attach_partitions(c, db_path, start_date, end_date, attached):
+    '''Attach to c the archive partitions of db_path overlapping a date range.
+
+    Leaves c in a read transaction whose partition catalog matches what is attached,
+    so a year archived concurrently is read exactly once. attached is the set of years
+    attached so far and is kept up to date; returns the schemas to read, "main"
+    followed by one per partition, newest first.
+    '''
+    from pathlib import Path
+    while True:
+        await c.execute("BEGIN")
+        cur = await c.execute(ARCHIVE_PARTITIONS_QUERY, (start_date, end_date))
+        wanted = dict(await cur.fetchall())
+        if wanted.keys() == attached:
+            return ["main"] + [f"archive_{year}" for year in sorted(attached, reverse=True)]
+        # ATTACH is not allowed inside a transaction: attach what the snapshot
+        # lists, then check again in a new one
+        await c.rollback()
+        if len(wanted) > ARCHIVE_MAX_ATTACHED:
+            raise ValueError(f"The range spans {len(wanted)} archived years; at most "
+                             f"{ARCHIVE_MAX_ATTACHED} can be queried at once")
+        for year in attached - wanted.keys():
+            await c.execute(f"DETACH DATABASE archive_{year}")
+            attached.discard(year)
+        for year in wanted.keys() - attached:
+            uri = Path(_archive_dir(db_path), wanted[year]).resolve().as_uri() + "?mode=ro&immutable=1"
+            await c.execute(f"ATTACH DATABASE ? AS archive_{year}", (uri,))
+            attached.add(year)
+
+@asynccontextmanager
+async def federated_connection(start_date, end_date):
+    '''Check out a reader with the archive partitions overlapping a date range attached.
+
+    Yields (c, schemas), where schemas is "main" followed by one schema per attached
+    partition, newest first; partitions outside the range are never opened. The block
+    runs in one read transaction (see _attach_partitions).
+    '''
+    pool = await get_pool()
+    async with pool.reader() as c:
+        attached = set()
+        try:
+            yield c, await _attach_partitions(c, pool.path, start_date, end_date, attached)
+        finally:
+            if c.in_transaction:
+                await c.rollback()
+            for year in attached:
+                await c.execute(f"DETACH DATABASE archive_{year}")
+
+
+def _federate(select, params, schemas):
+    '''UNION ALL of select (tables written as {schema}.name) over schemas, with its parameters.'''
+    return " UNION ALL ".join(select.format(schema=schema) for schema in schemas), list(params) * len(schemas)
+
+
+# Bumped whenever a writer checkout changed any row; cached results from an older
+# generation are discarded
+_data_generation = 0
+
+
+@asynccontextmanager
+async def write_connection(pool=None):
+    '''Check out the writer connection of pool (the current tenant's pool by default).'''
+    global _data_generation
+    pool = pool or await get_pool()
+    async with pool.writer() as c:
+        changes = c.total_changes
+        try:
+            yield c
+        finally:
+            if c.total_changes != changes:
+                _data_generation += 1
+
+
+class ResultCache:
+    '''LRU cache of tool results, keyed by tool name and normalized arguments.
+
+    Every entry belongs to the data generation it was computed in; the first lookup
+    after a write drops them all. Results above max_bytes (JSON size) are not stored.
+    '''
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, disabled=CACHE_DISABLED_TOOLS):
+        from collections import OrderedDict
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disabled = set(disabled)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = _data_generation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._per_tool = {}
+
+    def enabled(self, tool):
+        return self.max_entries > 0 and tool not in self.disabled
+
+    def _sync_generation(self):
+        if self._generation != _data_generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = _data_generation
+
+    def _count(self, tool, outcome):
+        counters = self._per_tool.setdefault(tool, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, tool, key):
+        '''Return (True, result) on a hit, (False, None) on a miss.'''
+        self._sync_generation()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            self._count(tool, "misses")
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self._count(tool, "hits")
+        return True, entry[0]
+
+    def put(self, key, result, generation):
+        '''Store a result computed while the data was at the given generation.'''
+        self._sync_generation()
+        if generation != self._generation:
+            return  # a write landed while the result was being computed
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (result, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.max_entries > 0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "generation": _data_generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "disabled_tools": sorted(self.disabled),
+            "tools": self._per_tool,
+        }
+
+
+_result_cache = ResultCache()
+
+
+def cached_tool(fn):
+    '''Serve repeated calls of a read-only tool from the result cache.'''
+    import functools
+    import inspect
+    signature = inspect.signature(fn)
+    
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        tool = fn.__name__
+        if not _result_cache.enabled(tool):
+            return await fn(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (tool, _current_tenant.get(), json.dumps(bound.arguments, sort_keys=True, default=str))
+        hit, result = _result_cache.get(tool, key)
+        if hit:
+            return result
+        generation = _data_generation
+        result = await fn(*args, **kwargs)
+        if not (isinstance(result, dict) and result.get("status") == "error"):
+            _result_cache.put(key, result, generation)
+        return result
+    
+    return wrapper
+
+
+class WriteQueueFull(Exception):
+    '''Raised when the write queue stays full for longer than the acquire timeout.'''
+
+
+class WriteQueue:
+    '''Single writer task that group-commits queued write operations.
+
+    An operation is an async callable taking the writer connection. The writer task
+    takes whatever is queued (up to batch_size, waiting at most window_ms for more),
+    runs each operation under its own savepoint inside one transaction and commits
+    once. A failing operation is rolled back alone and its caller gets the exception;
+    everyone else gets their own return value once the commit is durable.
+    '''
+
+    def __init__(self, batch_size=WRITE_BATCH_SIZE, window_ms=WRITE_BATCH_WINDOW_MS,
+                 depth=WRITE_QUEUE_DEPTH, put_timeout=POOL_ACQUIRE_TIMEOUT, tenant=None, pool=None):
+        self.tenant = tenant
+        # A tenant queue writes through its own shard's pool, never through the shard
+        # lookup: that could reopen a shard that is being closed and waits on this queue
+        self.pool = pool
+        self.batch_size = max(1, int(batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000
+        self.depth = max(1, int(depth))
+        self.put_timeout = put_timeout
+        self._queue = asyncio.Queue(self.depth)
+        self._task = None
+        self._pending = 0
+        # Metrics
+        self._operations = 0
+        self._failed = 0
+        self._batches = 0
+        self._max_batch = 0
+        self._commit_total = 0.0
+        self._latency_total = 0.0
+        self._max_depth = 0
+        self._rejected = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        '''Finish queued operations, then stop the writer task.'''
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, operation):
+        '''Queue an operation and wait for its result (or exception) after the group commit.'''
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        item = (operation, future, time.perf_counter(), _current_tool.get(), _current_call.get())
+        self._pending += 1
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                self._pending -= 1
+                self._rejected += 1
+                raise WriteQueueFull(f"Write queue still full ({self.depth} pending) after {self.put_timeout}s")
+        self._max_depth = max(self._max_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        # Statements are attributed to the tool call that queued them, not whoever started this task
+        _current_tenant.set(self.tenant)
+        _current_tool.set(None)
+        _current_call.set(None)
+        while True:
+            batch = await self._collect()
+            outcomes = []
+            try:
+                async with write_connection(self.pool) as c:
+                    await c.execute("BEGIN IMMEDIATE")
+                    for operation, future, _, tool, call in batch:
+                        _current_tool.set(tool)
+                        _current_call.set(call)
+                        await c.execute("SAVEPOINT queued_write")
+                        try:
+                            outcomes.append((True, await operation(c)))
+                            await c.execute("RELEASE queued_write")
+                        except Exception as e:
+                            await c.execute("ROLLBACK TO queued_write")
+                            await c.execute("RELEASE queued_write")
+                            outcomes.append((False, e))
+                    _current_tool.set(None)
+                    _current_call.set(None)
+                    started = time.perf_counter()
+                    await c.commit()
+                    self._commit_total += time.perf_counter() - started
+            except Exception as e:
+                # The transaction itself failed: nothing in this batch was written
+                outcomes = [(False, e)] * len(batch)
+            finished = time.perf_counter()
+            self._batches += 1
+            self._max_batch = max(self._max_batch, len(batch))
+            for (operation, future, queued_at, _, _), (ok, value) in zip(batch, outcomes):
+                self._operations += 1
+                self._latency_total += finished - queued_at
+                if not ok:
+                    self._failed += 1
+                if not future.done():
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+                self._pending -= 1
+                self._queue.task_done()
+
+    @property
+    def pending(self):
+        '''Operations submitted whose result is not yet delivered.'''
+        return self._pending
+
+    def stats(self):
+        batches = self._batches
+        return {
+            "batch_size": self.batch_size,
+            "window_ms": self.window * 1000,
+            "queue_depth_limit": self.depth,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._max_depth,
+            "operations": self._operations,
+            "failed_operations": self._failed,
+            "rejected_full": self._rejected,
+            "batches": batches,
+            "avg_batch_size": round(self._operations / batches, 2) if batches else 0.0,
+            "max_batch_size": self._max_batch,
+            "avg_commit_ms": round(self._commit_total / batches * 1000, 3) if batches else 0.0,
+            "avg_latency_ms": round(self._latency_total / self._operations * 1000, 3) if self._operations else 0.0,
+        }
+
+
+_write_queue = None
+
+
+async def submit_write(operation):
+    '''Run operation(connection) through the current tenant's group-commit write queue.'''
+    global _write_queue
+    tenant = _current_tenant.get()
+    if tenant is not None:
+        return await (await _tenant_shards.get(tenant)).queue.submit(operation)
+    if _write_queue is None:
+        _write_queue = WriteQueue(WRITE_BATCH_SIZE, WRITE_BATCH_WINDOW_MS, WRITE_QUEUE_DEPTH, POOL_ACQUIRE_TIMEOUT)
+    return await _write_queue.submit(operation)
+
+
+# Tenant routing
+# Tenant of the current tool call; None routes to DB_PATH
+_current_tenant = contextvars.ContextVar("expense_current_tenant", default=None)
+
+
+def _validate_tenant(value):
+    '''Return value as a tenant id usable as a shard file name, or raise ValueError.'''
+    import re
+    text = str(value).strip()
+    if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", text):
+        raise ValueError(f"Invalid tenant_id {value!r}: use 1-64 letters, digits, '_' or '-'")
+    return text
+
+
+class TenantShard:
+    '''Connection pool and write queue of one tenant's database file.'''
+
+    def __init__(self, tenant, path, pool, queue):
+        self.tenant = tenant
+        self.path = path
+        self.pool = pool
+        self.queue = queue
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self):
+        return self.pool.busy or self.queue.pending > 0
+
+
+class TenantShards:
+    '''LRU of open tenant shards with idle eviction.
+
+    A shard is opened (and its schema migrated, once per process) on the first call
+    for its tenant. Opening one beyond max_open closes the least recently used idle
+    shard; a background sweep closes shards unused for idle_seconds.
+    '''
+
+    def __init__(self, directory=TENANT_DIR, max_open=TENANT_MAX_OPEN, idle_seconds=TENANT_IDLE_SECONDS):
+        from collections import OrderedDict
+        self.directory = directory
+        self.max_open = max(1, int(max_open))
+        self.idle_seconds = idle_seconds
+        self._shards = OrderedDict()
+        self._opening = {}
+        self._sweeper = None
+        # Metrics
+        self.hits = 0
+        self.opens = 0
+        self.evictions = 0
+        self.idle_closes = 0
+
+    def path(self, tenant):
+        return os.path.join(self.directory, f"{tenant}.db")
+
+    def tenants(self):
+        '''Tenant ids with a shard file on disk, open or not.'''
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-3] for name in os.listdir(self.directory) if name.endswith(".db"))
+
+    async def get(self, tenant):
+        '''Return the open shard for tenant, opening it on first use.
+
+        The shard is returned without awaiting after the lookup, so the caller checks out
+        a connection (which marks the shard busy) before any eviction can run.
+        '''
+        while True:
+            shard = self._shards.get(tenant)
+            if shard is not None:
+                self._shards.move_to_end(tenant)
+                shard.last_used = time.monotonic()
+                self.hits += 1
+                return shard
+            # Concurrent first calls for one tenant share a single open; loop afterwards in
+            # case another tenant's open evicted it again before this call resumed
+            opening = self._opening.get(tenant)
+            if opening is None or opening.done():
+                # A finished open is never awaited again: that would not yield, and the
+                # loop would spin if the shard was evicted before this call resumed
+                opening = self._opening[tenant] = asyncio.ensure_future(self._open(tenant))
+                opening.add_done_callback(
+                    lambda done: self._opening.pop(tenant) if self._opening.get(tenant) is done else None
+                )
+            await asyncio.shield(opening)
+
+    async def _open(self, tenant):
+        path = self.path(tenant)
+        if path not in _initialized_paths:
+            os.makedirs(self.directory, exist_ok=True)
+            await asyncio.to_thread(init_db, path)
+        pool = ConnectionPool(path, readers=TENANT_POOL_READERS)
+        await pool.open()
+        queue = WriteQueue(WRITE_BATCH_SIZE, WRITE_BATCH_WINDOW_MS, WRITE_QUEUE_DEPTH, POOL_ACQUIRE_TIMEOUT,
+                           tenant, pool)
+        shard = self._shards[tenant] = TenantShard(tenant, path, pool, queue)
+        self.opens += 1
+        await self._evict_over_capacity()
+        if self._sweeper is None and self.idle_seconds > 0:
+            self._sweeper = asyncio.create_task(self._sweep_idle())
+        return shard
+
+    async def _close_shard(self, shard):
+        try:
+            await shard.queue.stop()
+        finally:
+            await shard.pool.close()
+
+    async def _evict_over_capacity(self):
+        for tenant in list(self._shards):
+            if len(self._shards) <= self.max_open:
+                break
+            shard = self._shards.get(tenant)
+            if shard is None or shard.busy or tenant == next(reversed(self._shards)):
+                continue
+            del self._shards[tenant]
+            self.evictions += 1
+            await self._close_shard(shard)
+
+    async def _sweep_idle(self):
+        interval = max(1.0, self.idle_seconds / 4)
+        while True:
+            await asyncio.sleep(interval)
+            cutoff = time.monotonic() - self.idle_seconds
+            for tenant, shard in list(self._shards.items()):
+                if shard.last_used < cutoff and not shard.busy and self._shards.get(tenant) is shard:
+                    del self._shards[tenant]
+                    self.idle_closes += 1
+                    await self._close_shard(shard)
+
+    def open_pools(self):
+        '''(tenant, pool) of every open shard, without marking them used.'''
+        return [(tenant, shard.pool) for tenant, shard in self._shards.items()]
+
+    async def close(self):
+        '''Close every open shard and stop the idle sweep.'''
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        shards = list(self._shards.values())
+        self._shards.clear()
+        for shard in shards:
+            try:
+                await self._close_shard(shard)
+            except Exception as e:
+                _log(f"Error closing tenant shard {shard.tenant!r}: {e}")
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "directory": self.directory,
+            "max_open": self.max_open,
+            "idle_seconds": self.idle_seconds,
+            "open": [
+                {"tenant": shard.tenant, "idle_seconds": round(now - shard.last_used, 3), "busy": shard.busy}
+                for shard in reversed(self._shards.values())
+            ],
+            "hits": self.hits,
+            "opens": self.opens,
+            "evictions": self.evictions,
+            "idle_closes": self.idle_closes,
+        }
+
+
+_tenant_shards = TenantShards()
+
+
+@asynccontextmanager
+async def lifespan(server):
+    '''Migrate the database and open the connection pool with the server; close it on shutdown.'''
+    await get_pool()
+    _log(f"Database path: {DB_PATH}")
+    tasks = []
+    if RECURRING_INTERVAL > 0:
+        tasks.append(asyncio.create_task(_recurring_scheduler(RECURRING_INTERVAL)))
+    if MAINTENANCE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(_maintenance_loop(MAINTENANCE_INTERVAL)))
+    try:
+        yield {}
+    finally:
+        for task in tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await close_pool()
+
+
+mcp = FastMCP("ExpenseTracker", lifespan=lifespan)
+
+
+class TenantMiddleware(Middleware):
+    '''Routes each tool call to a tenant shard: the "tenant_id" argument wins over the tenant header.'''
+
+    async def on_call_tool(self, context, call_next):
+        from fastmcp.exceptions import ToolError
+        from fastmcp.server.dependencies import get_http_headers
+        arguments = context.message.arguments or {}
+        # Not a parameter of the tools themselves, so take it out before they are called
+        tenant = arguments.pop("tenant_id", None)
+        if tenant is None:
+            tenant = get_http_headers().get(TENANT_HEADER)
+        try:
+            tenant = _validate_tenant(tenant) if tenant not in (None, "") else None
+        except ValueError as e:
+            raise ToolError(str(e))
+        token = _current_tenant.set(tenant)
+        try:
+            return await call_next(context)
+        finally:
+            _current_tenant.reset(token)
+
+    async def on_list_tools(self, context, call_next):
+        tools = await call_next(context)
+        listed = []
+        for tool in tools:
+            parameters = dict(tool.parameters or {})
+            properties = dict(parameters.get("properties") or {})
+            properties.setdefault("tenant_id", {
+                "type": "string",
+                "description": "Tenant whose database to use (defaults to the tenant header, then the shared database)",
+            })
+            parameters["properties"] = properties
+            listed.append(tool.model_copy(update={"parameters": parameters}))
+        return listed
+
+
+class ToolMetricsMiddleware(Middleware):
+    '''Times every tool call and records its errors, rows fetched and SQL statements.'''
+
+    async def on_call_tool(self, context, call_next):
+        name = context.message.name
+        call = {"rows": 0, "statements": 0, "sql_seconds": 0.0}
+        tool_token = _current_tool.set(name)
+        call_token = _current_call.set(call)
+        started = time.perf_counter()
+        error = True
+        try:
+            result = await call_next(context)
+            # Tools report most failures as {"status": "error"} rather than raising
+            structured = getattr(result, "structured_content", None)
+            error = isinstance(structured, dict) and structured.get("status") == "error"
+            return result
+        finally:
+            _metrics.record_tool(name, time.perf_counter() - started, error, call)
+            _current_call.reset(call_token)
+            _current_tool.reset(tool_token)
+
+
+mcp.add_middleware(TenantMiddleware())
+mcp.add_middleware(ToolMetricsMiddleware())
+
+# Schema migrations. Each step runs once, in order, inside its own transaction and
+# bumps PRAGMA user_version, so existing databases are upgraded in place.
+def _migration_base_schema(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS expenses(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT NOT NULL,
+            subcategory TEXT DEFAULT '',
+            note TEXT DEFAULT ''
+        )
+    """)
+    
+    # Create budgets table
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS budgets(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            period TEXT NOT NULL,  -- 'monthly', 'weekly', 'yearly'
+            start_date TEXT NOT NULL,
+            end_date TEXT,
+            created_date TEXT NOT NULL,
+            is_active INTEGER DEFAULT 1
+        )
+    """)
+    
+    # Create recurring_expenses table for tracking subscriptions/recurring payments
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS recurring_expenses(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            amount REAL NOT NULL,
+            category TEXT NOT NULL,
+            subcategory TEXT DEFAULT '',
+            frequency TEXT NOT NULL,  -- 'weekly', 'monthly', 'yearly'
+            next_due_date TEXT NOT NULL,
+            is_active INTEGER DEFAULT 1,
+            created_date TEXT NOT NULL,
+            note TEXT DEFAULT ''
+        )
+    """)
+
+def _migration_access_path_indexes(c):
+    # Date-range listing/search/export, ordered by date DESC, id DESC
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date_id ON expenses(date, id)")
+    # Per-category lookups (trends, budgets, filtered summaries); covers amount
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses(category, date, amount)")
+    # Date-range aggregates grouped by category (summaries, statistics, top expenses)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date_category ON expenses(date, category, amount)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_budgets_active ON budgets(is_active, category)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_recurring_active_due ON recurring_expenses(is_active, next_due_date)")
+
+def _migration_full_text_search(c):
+    # External-content FTS5 index over the searchable text columns of expenses
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+            category, subcategory, note,
+            content='expenses', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+    # Keep the index in sync with every write to expenses
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_insert AFTER INSERT ON expenses BEGIN
+            INSERT INTO expenses_fts(rowid, category, subcategory, note)
+            VALUES (new.id, new.category, new.subcategory, new.note);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_delete AFTER DELETE ON expenses BEGIN
+            INSERT INTO expenses_fts(expenses_fts, rowid, category, subcategory, note)
+            VALUES ('delete', old.id, old.category, old.subcategory, old.note);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS expenses_fts_update AFTER UPDATE OF category, subcategory, note ON expenses BEGIN
+            INSERT INTO expenses_fts(expenses_fts, rowid, category, subcategory, note)
+            VALUES ('delete', old.id, old.category, old.subcategory, old.note);
+            INSERT INTO expenses_fts(rowid, category, subcategory, note)
+            VALUES (new.id, new.category, new.subcategory, new.note);
+        END
+    """)
+    # One-shot backfill of rows written before the index existed
+    c.execute("INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')")
+
+# Rollups: per (day, category, subcategory) and per (month, category) count/sum/min/max,
+# maintained by triggers so aggregate tools never re-aggregate raw rows.
+_ROLLUP_ADD = """
+    INSERT INTO expense_daily_rollup(day, category, subcategory, txn_count, total_amount, min_amount, max_amount)
+    VALUES (substr({row}.date, 1, 10), {row}.category, COALESCE({row}.subcategory, ''), 1, {row}.amount, {row}.amount, {row}.amount)
+    ON CONFLICT(day, category, subcategory) DO UPDATE SET
+        txn_count = txn_count + 1,
+        total_amount = total_amount + excluded.total_amount,
+        min_amount = MIN(min_amount, excluded.min_amount),
+        max_amount = MAX(max_amount, excluded.max_amount);
+    INSERT INTO expense_monthly_rollup(month, category, txn_count, total_amount, min_amount, max_amount)
+    VALUES (substr({row}.date, 1, 7), {row}.category, 1, {row}.amount, {row}.amount, {row}.amount)
+    ON CONFLICT(month, category) DO UPDATE SET
+        txn_count = txn_count + 1,
+        total_amount = total_amount + excluded.total_amount,
+        min_amount = MIN(min_amount, excluded.min_amount),
+        max_amount = MAX(max_amount, excluded.max_amount);
+"""
+
+# Removing the current min/max of a group means rescanning it: the day group through
+# idx_expenses_category_date, the month group through the (already updated) daily rollup.
+_ROLLUP_REMOVE = """
+    UPDATE expense_daily_rollup SET
+        txn_count = txn_count - 1,
+        total_amount = total_amount - {row}.amount,
+        min_amount = CASE WHEN {row}.amount <= min_amount THEN (
+            SELECT MIN(amount) FROM expenses
+            WHERE category = {row}.category AND date >= substr({row}.date, 1, 10) AND date < substr({row}.date, 1, 10) || '~'
+              AND COALESCE(subcategory, '') = COALESCE({row}.subcategory, '')
+        ) ELSE min_amount END,
+        max_amount = CASE WHEN {row}.amount >= max_amount THEN (
+            SELECT MAX(amount) FROM expenses
+            WHERE category = {row}.category AND date >= substr({row}.date, 1, 10) AND date < substr({row}.date, 1, 10) || '~'
+              AND COALESCE(subcategory, '') = COALESCE({row}.subcategory, '')
+        ) ELSE max_amount END
+    WHERE day = substr({row}.date, 1, 10) AND category = {row}.category AND subcategory = COALESCE({row}.subcategory, '');
+    DELETE FROM expense_daily_rollup
+    WHERE day = substr({row}.date, 1, 10) AND category = {row}.category AND subcategory = COALESCE({row}.subcategory, '')
+      AND txn_count <= 0;
+    UPDATE expense_monthly_rollup SET
+        txn_count = txn_count - 1,
+        total_amount = total_amount - {row}.amount,
+        min_amount = CASE WHEN {row}.amount <= min_amount THEN (
+            SELECT MIN(min_amount) FROM expense_daily_rollup
+            WHERE category = {row}.category AND day >= substr({row}.date, 1, 7) AND day < substr({row}.date, 1, 7) || '~'
+        ) ELSE min_amount END,
+        max_amount = CASE WHEN {row}.amount >= max_amount THEN (
+            SELECT MAX(max_amount) FROM expense_daily_rollup
+            WHERE category = {row}.category AND day >= substr({row}.date, 1, 7) AND day < substr({row}.date, 1, 7) || '~'
+        ) ELSE max_amount END
+    WHERE month = substr({row}.date, 1, 7) AND category = {row}.category;
+    DELETE FROM expense_monthly_rollup
+    WHERE month = substr({row}.date, 1, 7) AND category = {row}.category AND txn_count <= 0;
+"""
+
+ROLLUP_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS expenses_rollup_insert AFTER INSERT ON expenses BEGIN"
+    + _ROLLUP_ADD.format(row="new") + "END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_rollup_delete AFTER DELETE ON expenses BEGIN"
+    + _ROLLUP_REMOVE.format(row="old") + "END",
+    "CREATE TRIGGER IF NOT EXISTS expenses_rollup_update AFTER UPDATE OF date, amount, category, subcategory ON expenses BEGIN"
+    + _ROLLUP_REMOVE.format(row="old") + _ROLLUP_ADD.format(row="new") + "END",
+)
+
+# Recompute both rollups from the raw rows (backfill and repair)
+ROLLUP_REBUILD = (
+    "DELETE FROM expense_daily_rollup",
+    "DELETE FROM expense_monthly_rollup",
+    """
+    INSERT INTO expense_daily_rollup(day, category, subcategory, txn_count, total_amount, min_amount, max_amount)
+    SELECT substr(date, 1, 10), category, COALESCE(subcategory, ''), COUNT(*), SUM(amount), MIN(amount), MAX(amount)
+    FROM expenses
+    GROUP BY substr(date, 1, 10), category, COALESCE(subcategory, '')
+    """,
+    """
+    INSERT INTO expense_monthly_rollup(month, category, txn_count, total_amount, min_amount, max_amount)
+    SELECT substr(day, 1, 7), category, SUM(txn_count), SUM(total_amount), MIN(min_amount), MAX(max_amount)
+    FROM expense_daily_rollup
+    GROUP BY substr(day, 1, 7), category
+    """,
+)
+
+def _migration_rollups(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS expense_daily_rollup(
+            day TEXT NOT NULL,
+            category TEXT NOT NULL,
+            subcategory TEXT NOT NULL DEFAULT '',
+            txn_count INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            min_amount REAL,
+            max_amount REAL,
+            PRIMARY KEY (day, category, subcategory)
+        ) WITHOUT ROWID
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS expense_monthly_rollup(
+            month TEXT NOT NULL,
+            category TEXT NOT NULL,
+            txn_count INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            min_amount REAL,
+            max_amount REAL,
+            PRIMARY KEY (month, category)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_daily_rollup_category ON expense_daily_rollup(category, day)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_monthly_rollup_category ON expense_monthly_rollup(category, month)")
+    for trigger in ROLLUP_TRIGGERS:
+        c.execute(trigger)
+    for statement in ROLLUP_REBUILD:
+        c.execute(statement)
+
+def _canonical_date(value):
+    '''Return a stored date (unpadded, or with a time part) as YYYY-MM-DD, or None.'''
+    import re
+    match = re.fullmatch(r"(\d{4}-\d{1,2}-\d{1,2})(?:[ T].*)?", str(value).strip()) if value is not None else None
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+# Stored date columns canonicalised by migration 5, as (table, column)
+DATE_COLUMNS = (
+    ("expenses", "date"),
+    ("recurring_expenses", "next_due_date"),
+    ("budgets", "start_date"),
+    ("budgets", "end_date"),
+)
+
+def _migration_sargable_dates(c):
+    # Canonicalise stored dates so plain string ranges agree with calendar order.
+    # SQLite's date() gives NULL for unpadded values like 2024-1-7, so they are
+    # parsed here instead. The rollup triggers move updated expenses to their day.
+    for table, column in DATE_COLUMNS:
+        rows = c.execute(f"SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL").fetchall()
+        updates, unparseable = [], []
+        for row_id, value in rows:
+            canonical = _canonical_date(value)
+            if canonical is None:
+                unparseable.append(row_id)
+            elif canonical != value:
+                updates.append((canonical, row_id))
+        c.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+        if unparseable:
+            # Left as they are, but never silently: these rows fall outside every date range
+            shown = ", ".join(map(str, unparseable[:20])) + (", ..." if len(unparseable) > 20 else "")
+            _log(f"Migration 5: {len(unparseable)} {table} row(s) have an unparseable {column}"
+                 f" and are not in date order (ids {shown})")
+    # Week key computed once per rollup row and kept in an index, instead of
+    # strftime() per row at query time. SQLite can only add VIRTUAL generated
+    # columns to an existing table; the covering index stores the value.
+    c.execute("""
+        ALTER TABLE expense_daily_rollup
+        ADD COLUMN year_week TEXT GENERATED ALWAYS AS (strftime('%Y-W%W', day)) VIRTUAL
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_daily_rollup_category_week
+        ON expense_daily_rollup(category, year_week, total_amount, txn_count)
+    """)
+
+def _migration_recurring_occurrences(c):
+    # Expenses materialised from a recurring expense remember which occurrence they
+    # are, so catching up the same occurrence twice is a no-op
+    c.execute("ALTER TABLE expenses ADD COLUMN recurring_id INTEGER")
+    c.execute("ALTER TABLE expenses ADD COLUMN occurrence_date TEXT")
+    c.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_recurring_occurrence
+        ON expenses(recurring_id, occurrence_date) WHERE recurring_id IS NOT NULL
+    """)
+    # Day of month the schedule is anchored to, so 31st -> 28th/29th -> 31st round-trips
+    c.execute("ALTER TABLE recurring_expenses ADD COLUMN anchor_day INTEGER")
+    c.execute("UPDATE recurring_expenses SET anchor_day = CAST(substr(next_due_date, 9, 2) AS INTEGER)")
+
+# Money columns, REAL major units before migration 7 and INTEGER minor units after
+MONEY_COLUMNS = {
+    "expenses": ("amount",),
+    "budgets": ("amount",),
+    "recurring_expenses": ("amount",),
+    "expense_daily_rollup": ("total_amount", "min_amount", "max_amount"),
+    "expense_monthly_rollup": ("total_amount", "min_amount", "max_amount"),
+}
+
+def _migration_integer_amounts(c):
+    import re
+    scale = 10 ** CURRENCY_DECIMALS
+    c.execute("CREATE TABLE IF NOT EXISTS settings(key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    c.executemany("INSERT OR IGNORE INTO settings(key, value) VALUES (?, ?)",
+                  [("currency", CURRENCY), ("amount_scale", str(scale))])
+    # SQLite cannot change a column's type, so each table is rebuilt under its own name.
+    # Indexes and triggers are dropped first and recreated from their stored SQL at the
+    # end, so no trigger ever refers to a table that is being swapped out
+    tables = tuple(MONEY_COLUMNS)
+    dependents = c.execute(f"""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL AND tbl_name IN ({','.join('?' * len(tables))})
+    """, tables).fetchall()
+    for kind, name, _ in dependents:
+        c.execute(f"DROP {kind.upper()} {name}")
+    for table, columns in MONEY_COLUMNS.items():
+        create = c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        create = re.sub(rf"\b({'|'.join(columns)})\s+REAL\b", r"\1 INTEGER", create)
+        c.execute(create.replace(table, f"{table}_minor", 1))
+        # Stored columns only (table_xinfo flags generated ones as hidden)
+        stored = [row[1] for row in c.execute(f"PRAGMA table_xinfo({table})") if row[6] == 0]
+        if not table.endswith("_rollup"):
+            values = ", ".join(f"CAST(ROUND({name} * {scale}) AS INTEGER)" if name in columns else name
+                               for name in stored)
+            c.execute(f"INSERT INTO {table}_minor({', '.join(stored)}) SELECT {values} FROM {table}")
+        sequence = c.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        c.execute(f"DROP TABLE {table}")
+        c.execute(f"ALTER TABLE {table}_minor RENAME TO {table}")
+        if sequence:
+            # Ids of deleted rows above the current maximum are never handed out again
+            c.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (sequence[0], table))
+    for _, _, sql in dependents:
+        c.execute(sql)
+    # Rollups are re-aggregated from the converted rows rather than converted themselves
+    for statement in ROLLUP_REBUILD:
+        c.execute(statement)
+
+def _migration_archive_catalog(c):
+    # One row per closed year moved out to an archive partition by archive_year
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS archive_partitions(
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            total_amount INTEGER NOT NULL,
+            archived_date TEXT NOT NULL
+        )
+    """)
+
+def _migration_incremental_vacuum(c):
+    # Free pages are kept in the file until the maintenance task releases them with
+    # PRAGMA incremental_vacuum. An existing file only switches mode when rebuilt, hence the VACUUM
+    c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    return "VACUUM"
+
+# Change feed: every insert, update and delete on these tables appends to change_log,
+# with the row (these columns) as JSON for an upsert and only the id for a delete
+CHANGE_FEED_TABLES = {
+    "expenses": ("id", "date", "amount", "category", "subcategory", "note", "recurring_id", "occurrence_date"),
+    "budgets": ("id", "category", "amount", "period", "start_date", "end_date", "created_date", "is_active"),
+    "recurring_expenses": ("id", "name", "amount", "category", "subcategory", "frequency", "next_due_date",
+                           "is_active", "created_date", "note", "anchor_day"),
+}
+
+def _change_trigger(table, event):
+    if event == "DELETE":
+        values = f"'{table}', old.id, 'delete', NULL"
+    else:
+        record = ", ".join(f"'{column}', new.{column}" for column in CHANGE_FEED_TABLES[table])
+        values = f"'{table}', new.id, 'upsert', json_object({record})"
+    return (f"CREATE TRIGGER IF NOT EXISTS {table}_change_{event.lower()} AFTER {event} ON {table} BEGIN "
+            f"INSERT INTO change_log(table_name, row_id, op, record) VALUES ({values}); END")
+
+CHANGE_TRIGGERS = {
+    f"{table}_change_{event.lower()}": _change_trigger(table, event)
+    for table in CHANGE_FEED_TABLES for event in ("INSERT", "UPDATE", "DELETE")
+}
+
+def _migration_change_log(c):
+    # AUTOINCREMENT: a seq is never handed out twice, even after compaction empties the log
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS change_log(
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,  -- 'upsert' or 'delete'
+            record TEXT,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+        )
+    """)
+    for trigger in CHANGE_TRIGGERS.values():
+        c.execute(trigger)
+    # change_log_horizon is the lowest seq a client can resume from
+    c.execute("INSERT OR REPLACE INTO settings(key, value) VALUES ('change_log_horizon', '0')")
+    if any(c.execute(f"SELECT EXISTS(SELECT 1 FROM {table})").fetchone()[0] for table in CHANGE_FEED_TABLES):
+        _restart_change_log(c)
+
+def _restart_change_log(c):
+    '''Treat every row now in the tracked tables as written before the change log (sqlite3 connection).
+
+    For loads that bypass the triggers: the log is emptied and a client at any earlier
+    seq gets resync_required, then resumes from the new latest_seq.
+    '''
+    latest = c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    horizon = (latest[0] if latest else 0) + 1
+    if latest:
+        c.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'change_log'", (horizon,))
+    else:
+        c.execute("INSERT INTO sqlite_sequence(name, seq) VALUES ('change_log', ?)", (horizon,))
+    c.execute("DELETE FROM change_log")
+    c.execute("UPDATE settings SET value = ? WHERE key = 'change_log_horizon'", (str(horizon),))
+
+MIGRATIONS = [
+    (1, "base schema", _migration_base_schema),
+    (2, "date and category access path indexes", _migration_access_path_indexes),
+    (3, "full-text search index", _migration_full_text_search),
+    (4, "daily and monthly expense rollups", _migration_rollups),
+    (5, "canonical dates and indexed week keys", _migration_sargable_dates),
+    (6, "recurring expense occurrences", _migration_recurring_occurrences),
+    (7, "integer minor-unit amounts", _migration_integer_amounts),
+    (8, "archive partition catalog", _migration_archive_catalog),
+    (9, "incremental auto-vacuum", _migration_incremental_vacuum),
+    (10, "change log", _migration_change_log),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate(c):
+    '''Apply pending migrations to an open sqlite3 connection. Returns the versions applied.
+
+    A step may return a statement that cannot run in a transaction (VACUUM); it runs
+    right after the step commits.
+    '''
+    current = c.execute("PRAGMA user_version").fetchone()[0]
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            # Another process may have applied it while we waited for the write lock
+            current = c.execute("PRAGMA user_version").fetchone()[0]
+            if version <= current:
+                c.execute("ROLLBACK")
+                continue
+            after = step(c)
+            c.execute(f"PRAGMA user_version = {version}")
+            c.execute("COMMIT")
+        except Exception as e:
+            c.execute("ROLLBACK")
+            raise RuntimeError(f"Migration {version} ({description}) failed: {e}") from e
+        applied.append(version)
+        if after:
+            try:
+                c.execute(after)
+            except Exception as e:
+                # The schema step is committed; the database works, only less compactly
+                _log(f"Migration {version} ({description}): {after} failed: {e}")
+    if applied:
+        # Refresh planner statistics so the new indexes are picked up
+        c.execute("ANALYZE")
+    return applied
+
+# Database files init_db() brought up to date in this process (get_pool() runs it on first use)
+_initialized_paths = set()
+
+def init_db(path=None):  # Keep as sync for initialization
+    '''Switch path (default DB_PATH) to WAL and apply pending migrations. Cheap when the schema is current.'''
+    path = path or DB_PATH
     try:
         # Use synchronous sqlite3 just for initialization
         import sqlite3
-        with sqlite3.connect(DB_PATH) as c:
-            c.execute("PRAGMA journal_mode=WAL")
-            c.execute("""
-                CREATE TABLE IF NOT EXISTS expenses(
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    category TEXT NOT NULL,
-                    subcategory TEXT DEFAULT '',
-                    note TEXT DEFAULT ''
-                )
-            """)
-            
-            # Create budgets table
-            c.execute("""
-                CREATE TABLE IF NOT EXISTS budgets(
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    period TEXT NOT NULL,  -- 'monthly', 'weekly', 'yearly'
-                    start_date TEXT NOT NULL,
-                    end_date TEXT,
-                    created_date TEXT NOT NULL,
-                    is_active INTEGER DEFAULT 1
-                )
-            """)
-            
-            # Create recurring_expenses table for tracking subscriptions/recurring payments
-            c.execute("""
-                CREATE TABLE IF NOT EXISTS recurring_expenses(
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    category TEXT NOT NULL,
-                    subcategory TEXT DEFAULT '',
-                    frequency TEXT NOT NULL,  -- 'weekly', 'monthly', 'yearly'
-                    next_due_date TEXT NOT NULL,
-                    is_active INTEGER DEFAULT 1,
-                    created_date TEXT NOT NULL,
-                    note TEXT DEFAULT ''
-                )
-            """)
-            
-            # Test write access
-            c.execute("INSERT OR IGNORE INTO expenses(date, amount, category) VALUES ('2000-01-01', 0, 'test')")
-            c.execute("DELETE FROM expenses WHERE category = 'test'")
-            print("Database initialized successfully with write access")
+        c = sqlite3.connect(path, isolation_level=None)
+        try:
+            if c.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                c.execute("PRAGMA journal_mode=WAL")
+            latest = MIGRATIONS[-1][0]
+            applied = []
+            if c.execute("PRAGMA user_version").fetchone()[0] < latest:
+                applied = migrate(c)
+            if applied:
+                _log(f"Applied schema migrations to {path}: {applied}")
+        finally:
+            c.close()
     except Exception as e:
-        print(f"Database initialization error: {e}")
+        _log(f"Database initialization error ({path}): {e}")
         raise
+    _initialized_paths.add(path)
+    return applied
+
+def _validate_date(value, field="date"):
+    '''Return value as a canonical YYYY-MM-DD string, or raise ValueError.
+    
+    Dates are stored as text and queried with plain range comparisons, so anything
+    that is not a real calendar date in this exact shape would sort incorrectly.
+    '''
+    import re
+    text = str(value).strip() if value is not None else ""
+    if re.fullmatch(r"\d{4}-\d{1,2}-\d{1,2}", text):
+        try:
+            return datetime.strptime(text, "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid {field} {value!r}: expected a calendar date as YYYY-MM-DD")
+
+# Money. Tools take and return amounts in major units (e.g. 12.34) and store integer
+# minor units (1234 at a scale of 100), so sums and comparisons in SQL are exact
+def _to_minor(value, scale, field="amount"):
+    '''Return a major-unit amount as integer minor units (half away from zero), or raise ValueError.'''
+    from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * scale
+    try:
+        # str() keeps the decimal a float was written as: 1.005 -> 101, not 100
+        minor = (Decimal(str(value).strip()) * scale).quantize(Decimal(1), ROUND_HALF_UP)
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError(f"Invalid {field} {value!r}")
+    if not minor.is_finite():
+        raise ValueError(f"Invalid {field} {value!r}")
+    return int(minor)
+
+def _from_minor(value, scale):
+    '''Return integer minor units (or a minor-unit average) in major units; None stays None.'''
+    return None if value is None else value / scale
+
+# Result keys that hold money, converted by _money_fields
+MONEY_FIELDS = frozenset((
+    "amount", "total_amount", "min_amount", "max_amount", "avg_amount", "average_amount",
+    "budget_amount", "spent_amount", "remaining_amount",
+))
+
+def _money_fields(row, scale):
+    '''Convert the money fields of a result dict to major units in place and return it.'''
+    for key in MONEY_FIELDS.intersection(row):
+        row[key] = _from_minor(row[key], scale)
+    return row
 
-# Initialize database synchronously at module load
-init_db()
+async def _amount_scale():
+    '''Minor units per major unit of the current tenant's database.'''
+    return (await get_pool()).scale
+
+# Response formats of the list tools: "records" is a list of dicts, "columnar" names
+# the columns once and sends each row as a plain list
+RESPONSE_FORMATS = ("records", "columnar")
+
+def _check_format(format):
+    if format not in RESPONSE_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(RESPONSE_FORMATS)}")
+
+def _records(cols, rows, scale):
+    return [_money_fields(dict(zip(cols, r)), scale) for r in rows]
+
+def _columnar(cols, rows, scale):
+    '''Rows as {"columns": [...], "rows": [[...], ...]}, money in major units, without a dict per row.'''
+    if not rows:
+        return {"columns": list(cols), "rows": []}
+    # Transposed so the money columns convert in one pass each and the rest are never touched
+    columns = list(zip(*rows))
+    for i, name in enumerate(cols):
+        if name in MONEY_FIELDS:
+            columns[i] = [None if v is None else v / scale for v in columns[i]]
+    return {"columns": list(cols), "rows": list(map(list, zip(*columns)))}
+
+# Category taxonomy
+DEFAULT_CATEGORIES = {
+    "categories": [
+        "Food & Dining",
+        "Transportation",
+        "Shopping",
+        "Entertainment",
+        "Bills & Utilities",
+        "Healthcare",
+        "Travel",
+        "Education",
+        "Business",
+        "Other"
+    ]
+}
+
+def _taxonomy_key(value):
+    '''Lookup key for a category name: case, spacing and punctuation are ignored.'''
+    import re
+    return re.sub(r"[^0-9a-z]+", "_", str(value).lower()).strip("_")
+
+class CategoryIndex:
+    '''In-memory index of categories.json, reloaded when the file's mtime changes.
+
+    Accepts either {category: [subcategory, ...]} or {"categories": [category, ...]};
+    the second form does not restrict subcategories.
+    '''
+
+    def __init__(self, path=CATEGORIES_PATH):
+        self.path = path
+        self.text = None
+        self.error = None
+        self.categories = {}
+        self.subcategories = {}
+        self._mtime = False
+
+    def refresh(self):
+        '''Reload the taxonomy if the file changed since the last call. Returns self.'''
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return self
+        try:
+            if mtime is None:
+                text = json.dumps(DEFAULT_CATEGORIES, indent=2)
+            else:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            self._build(json.loads(text))
+            self.text = text
+            self.error = None
+        except (OSError, ValueError) as e:
+            # Keep serving the last good taxonomy; an edit in progress is retried next time
+            self.error = f"Could not load categories: {str(e)}"
+            if self.text is None:
+                self._build(DEFAULT_CATEGORIES)
+                self.text = json.dumps(DEFAULT_CATEGORIES, indent=2)
+            return self
+        self._mtime = mtime
+        return self
+
+    def _build(self, data):
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        categories, subcategories = {}, {}
+        if isinstance(data.get("categories"), list):
+            for name in data["categories"]:
+                categories[_taxonomy_key(name)] = name
+                subcategories[name] = None
+        else:
+            for name, subs in data.items():
+                categories[_taxonomy_key(name)] = name
+                subcategories[name] = {_taxonomy_key(sub): sub for sub in subs or []}
+        self.categories, self.subcategories = categories, subcategories
+
+    @staticmethod
+    def suggest(value, choices, n=3):
+        '''Closest known names to an unknown value, best first.'''
+        import difflib
+        keys = difflib.get_close_matches(_taxonomy_key(value), list(choices), n=n, cutoff=0.6)
+        return [choices[key] for key in keys]
+
+    def resolve(self, category, subcategory=None, mode=None):
+        '''Return (category, subcategory) in their canonical spelling, or raise ValueError.'''
+        mode = mode or CATEGORY_VALIDATION
+        if mode == "off":
+            return category, subcategory
+        canonical = self.categories.get(_taxonomy_key(category))
+        if canonical is None:
+            if mode != "strict":
+                return category, subcategory
+            hint = self.suggest(category, self.categories)
+            raise ValueError(f"Unknown category {category!r}"
+                             + (f"; did you mean {', '.join(map(repr, hint))}?" if hint else ""))
+        known = self.subcategories.get(canonical)
+        if not subcategory or known is None:
+            return canonical, subcategory
+        canonical_sub = known.get(_taxonomy_key(subcategory))
+        if canonical_sub is None:
+            if mode != "strict":
+                return canonical, subcategory
+            hint = self.suggest(subcategory, known)
+            raise ValueError(f"Unknown subcategory {subcategory!r} for {canonical!r}"
+                             + (f"; did you mean {', '.join(map(repr, hint))}?" if hint else ""))
+        return canonical, canonical_sub
+
+_category_index = CategoryIndex()
+
+@mcp.tool()
+async def suggest_category(category, subcategory=None):
+    '''Match a category (and optionally subcategory) against the taxonomy, with close suggestions when unknown.'''
+    taxonomy = _category_index.refresh()
+    canonical = taxonomy.categories.get(_taxonomy_key(category))
+    result = {
+        "status": "success",
+        "category": canonical,
+        "category_suggestions": [] if canonical else taxonomy.suggest(category, taxonomy.categories),
+    }
+    if subcategory is not None and canonical:
+        known = taxonomy.subcategories.get(canonical)
+        if known is None:
+            result["subcategory"] = subcategory
+        else:
+            result["subcategory"] = known.get(_taxonomy_key(subcategory))
+            result["subcategory_suggestions"] = [] if result["subcategory"] else taxonomy.suggest(subcategory, known)
+    return result
 
 @mcp.tool()
 async def add_expense(date, amount, category, subcategory="", note=""):  # Changed: added async
     '''Add a new expense entry to the database.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:  # Changed: added async
-            cur = await c.execute(  # Changed: added await
-                "INSERT INTO expenses(date, amount, category, subcategory, note) VALUES (?,?,?,?,?)",
-                (date, amount, category, subcategory, note)
-            )
-            expense_id = cur.lastrowid
-            await c.commit()  # Changed: added await
-            return {"status": "success", "id": expense_id, "message": "Expense added successfully"}
+        date = _validate_date(date)
+        amount = _to_minor(amount, await _amount_scale())
+        category, subcategory = _category_index.refresh().resolve(category, subcategory)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    async def insert(c):
+        cur = await c.execute(  # Changed: added await
+            "INSERT INTO expenses(date, amount, category, subcategory, note) VALUES (?,?,?,?,?)",
+            (date, amount, category, subcategory, note)
+        )
+        return cur.lastrowid
+    
+    try:
+        # Committed together with any other writes queued at the same moment
+        expense_id = await submit_write(insert)
+        return {"status": "success", "id": expense_id, "message": "Expense added successfully"}
     except Exception as e:  # Changed: simplified exception handling
         if "readonly" in str(e).lower():
             return {"status": "error", "message": "Database is in read-only mode. Check file permissions."}
         return {"status": "error", "message": f"Database error: {str(e)}"}
     
+# Keyset pagination. A cursor is the sort key of the last row of the previous page,
+# so every page is an index seek instead of an OFFSET walk over the skipped rows.
+def _page_size(limit):
+    if limit is None:
+        return PAGE_SIZE_DEFAULT
+    limit = int(limit)
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, PAGE_SIZE_MAX)
+
+def _encode_cursor(kind, *key):
+    import base64
+    payload = json.dumps([kind, *key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor, kind):
+    '''Return the sort key stored in a cursor, or raise ValueError.'''
+    import base64
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, list) or not payload or payload[0] != kind:
+        raise ValueError(f"Cursor does not belong to a {kind}-ordered listing")
+    return payload[1:]
+
 @mcp.tool()
-async def list_expenses(start_date, end_date):  # Changed: added async
-    '''List expense entries within an inclusive date range.'''
+async def list_expenses(start_date, end_date, limit=None, cursor=None, format="records"):  # Changed: added async
+    '''List expense entries within an inclusive date range, newest first.
+
+    Returns at most limit rows; pass the returned next_cursor back to get the next page.
+    format="columnar" returns expenses as {"columns": [...], "rows": [[...], ...]}.
+    '''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:  # Changed: added async
-            cur = await c.execute(  # Changed: added await
-                """
-                SELECT id, date, amount, category, subcategory, note
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-                ORDER BY date DESC, id DESC
-                """,
-                (start_date, end_date)
-            )
+        _check_format(format)
+        page_size = _page_size(limit)
+        select = """
+            SELECT id, date, amount, category, subcategory, note
+            FROM {schema}.expenses
+        """
+        if cursor:
+            # The row value is the only upper bound, so SQLite seeks straight to it
+            # in idx_expenses_date_id (a separate date <= ? would win the seek instead)
+            after = tuple(_decode_cursor(cursor, "date"))
+            select += " WHERE date >= ? AND (date, id) < (?, ?)"
+            params = [start_date, *min(after, (end_date, 2**63 - 1))]
+        else:
+            select += " WHERE date BETWEEN ? AND ?"
+            params = [start_date, end_date]
+        
+        scale = await _amount_scale()
+        async with federated_connection(start_date, end_date) as (c, schemas):
+            # Each partition is read in index order and merged, so the page still stops early
+            query, params = _federate(select, params, schemas)
+            query += " ORDER BY date DESC, id DESC LIMIT ?"
+            params.append(page_size + 1)
+            cur = await c.execute(query, params)  # Changed: added await
             cols = [d[0] for d in cur.description]
-            return [dict(zip(cols, r)) for r in await cur.fetchall()]  # Changed: added await
+            rows = await cur.fetchall()  # Changed: added await
+        
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = _encode_cursor("date", rows[-1][1], rows[-1][0])
+        expenses = _columnar(cols, rows, scale) if format == "columnar" else _records(cols, rows, scale)
+        return {"status": "success", "expenses": expenses, "count": len(rows), "next_cursor": next_cursor}
     except Exception as e:
         return {"status": "error", "message": f"Error listing expenses: {str(e)}"}
 
 @mcp.tool()
-async def summarize(start_date, end_date, category=None):  # Changed: added async
-    '''Summarize expenses by category within an inclusive date range.'''
+async def get_changes_since(seq=0, limit=None):
+    '''List inserts, updates and deletes of expenses, budgets and recurring expenses after seq, oldest first.
+
+    Each change is an upsert carrying the row or a delete carrying only the id; pass the
+    returned next_seq back to continue. resync_required means changes after seq are no
+    longer kept: reload with list_expenses and friends, then resume from latest_seq as
+    read before reloading.
+    '''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:  # Changed: added async
-            query = """
-                SELECT category, SUM(amount) AS total_amount, COUNT(*) as count
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-            """
-            params = [start_date, end_date]
+        seq = int(seq or 0)
+        page_size = _page_size(limit)
+        scale = await _amount_scale()
+        async with read_connection(snapshot=True) as c:
+            cur = await c.execute("""
+                SELECT
+                    (SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'change_log_horizon'),
+                    (SELECT seq FROM sqlite_sequence WHERE name = 'change_log')
+            """)
+            horizon, latest_seq = await cur.fetchone()
+            horizon, latest_seq = horizon or 0, latest_seq or 0
+            if not horizon <= seq <= latest_seq:
+                # Behind the compacted part of the log, or a seq this database never handed out
+                return {"status": "success", "resync_required": True, "changes": [], "count": 0,
+                        "next_seq": seq, "latest_seq": latest_seq, "horizon": horizon, "has_more": False}
+            cur = await c.execute("""
+                SELECT seq, table_name, row_id, op, record, changed_at
+                FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?
+            """, (seq, page_size + 1))
+            rows = await cur.fetchall()
+        has_more = len(rows) > page_size
+        changes = []
+        for change_seq, table, row_id, op, record, changed_at in rows[:page_size]:
+            changes.append({
+                "seq": change_seq, "table": table, "op": op, "id": row_id, "changed_at": changed_at,
+                "record": None if record is None else _money_fields(json.loads(record), scale),
+            })
+        return {"status": "success", "resync_required": False, "changes": changes, "count": len(changes),
+                "next_seq": changes[-1]["seq"] if changes else seq, "latest_seq": latest_seq,
+                "horizon": horizon, "has_more": has_more}
+    except Exception as e:
+        return {"status": "error", "message": f"Error getting changes: {str(e)}"}
 
-            if category:
-                query += " AND category = ?"
-                params.append(category)
+# Rollup readers
+def _month_start(d):
+    return d.replace(day=1)
 
-            query += " GROUP BY category ORDER BY total_amount DESC"
+def _next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
 
-            cur = await c.execute(query, params)  # Changed: added await
+def _split_range(start_date, end_date):
+    '''Split an inclusive date range into whole months plus the ragged days at either end.
+    
+    Returns (day_ranges, month_range): the whole months are read from the monthly
+    rollup and only the edge days from the daily rollup.
+    '''
+    try:
+        start = datetime.strptime(str(start_date), "%Y-%m-%d").date()
+        end = datetime.strptime(str(end_date), "%Y-%m-%d").date()
+    except ValueError:
+        # Not plain dates: keep the original string comparison on the daily rollup
+        return [(start_date, end_date)], None
+    if start > end:
+        return [], None
+    first_month = start if start.day == 1 else _next_month(start)
+    after_end = end + timedelta(days=1)
+    months_end = after_end if after_end.day == 1 else _month_start(end)
+    if first_month >= months_end:
+        return [(start.isoformat(), end.isoformat())], None
+    day_ranges = []
+    if start < first_month:
+        day_ranges.append((start.isoformat(), (first_month - timedelta(days=1)).isoformat()))
+    if months_end <= end:
+        day_ranges.append((months_end.isoformat(), end.isoformat()))
+    month_range = (first_month.strftime("%Y-%m"), (months_end - timedelta(days=1)).strftime("%Y-%m"))
+    return day_ranges, month_range
+
+def _rollup_source(start_date, end_date, category=None, schemas=("main",)):
+    '''Subquery over the rollups covering an inclusive date range.
+    
+    Yields (month, category, txn_count, total_amount, min_amount, max_amount) rows,
+    read from the rollups of each schema (see federated_connection).
+    '''
+    day_ranges, month_range = _split_range(start_date, end_date)
+    category_filter = " AND category = ?" if category else ""
+    category_params = [category] if category else []
+    parts = []
+    params = []
+    if month_range:
+        parts.append(f"""
+            SELECT month, category, txn_count, total_amount, min_amount, max_amount
+            FROM {{schema}}.expense_monthly_rollup
+            WHERE month BETWEEN ? AND ?{category_filter}
+        """)
+        params.extend(list(month_range) + category_params)
+    for low, high in day_ranges:
+        parts.append(f"""
+            SELECT substr(day, 1, 7) AS month, category, txn_count, total_amount, min_amount, max_amount
+            FROM {{schema}}.expense_daily_rollup
+            WHERE day BETWEEN ? AND ?{category_filter}
+        """)
+        params.extend([low, high] + category_params)
+    if not parts:
+        return """(
+            SELECT month, category, txn_count, total_amount, min_amount, max_amount
+            FROM expense_monthly_rollup WHERE 0
+        )""", []
+    source, params = _federate(" UNION ALL ".join(parts), params, schemas)
+    return "(" + source + ")", params
+
+@mcp.tool()
+@cached_tool
+async def summarize(start_date, end_date, category=None):  # Changed: added async
+    '''Summarize expenses by category within an inclusive date range.'''
+    try:
+        scale = await _amount_scale()
+        async with federated_connection(start_date, end_date) as (c, schemas):
+            source, params = _rollup_source(start_date, end_date, category, schemas)
+            cur = await c.execute(f"""
+                SELECT category, SUM(total_amount) AS total_amount, SUM(txn_count) as count
+                FROM {source}
+                GROUP BY category ORDER BY total_amount DESC
+            """, params)
             cols = [d[0] for d in cur.description]
-            return [dict(zip(cols, r)) for r in await cur.fetchall()]  # Changed: added await
+            return [_money_fields(dict(zip(cols, r)), scale) for r in await cur.fetchall()]
     except Exception as e:
         return {"status": "error", "message": f"Error summarizing expenses: {str(e)}"}
 
 @mcp.tool()
 async def delete_expense(expense_id):
     '''Delete an expense entry by ID.'''
+    async def delete(c):
+        cur = await c.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+        return cur.rowcount
+    
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            cur = await c.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
-            expense = await cur.fetchone()
-            
-            if not expense:
-                return {"status": "error", "message": f"Expense with ID {expense_id} not found"}
-            
-            await c.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
-            await c.commit()
-            return {"status": "success", "message": f"Expense {expense_id} deleted successfully"}
+        if not await submit_write(delete):
+            return {"status": "error", "message": f"Expense with ID {expense_id} not found"}
+        return {"status": "success", "message": f"Expense {expense_id} deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting expense: {str(e)}"}
 
 @mcp.tool()
 async def update_expense(expense_id, date=None, amount=None, category=None, subcategory=None, note=None):
     '''Update an existing expense entry. Only provided fields will be updated.'''
+    if all(v is None for v in (date, amount, category, subcategory, note)):
+        return {"status": "error", "message": "No fields provided to update"}
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            # First check if expense exists
-            cur = await c.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
-            existing = await cur.fetchone()
-            
-            if not existing:
-                return {"status": "error", "message": f"Expense with ID {expense_id} not found"}
-            
-            # Build update query dynamically
-            updates = []
-            params = []
-            
-            if date is not None:
-                updates.append("date = ?")
-                params.append(date)
-            if amount is not None:
-                updates.append("amount = ?")
-                params.append(amount)
-            if category is not None:
-                updates.append("category = ?")
-                params.append(category)
-            if subcategory is not None:
-                updates.append("subcategory = ?")
-                params.append(subcategory)
-            if note is not None:
-                updates.append("note = ?")
-                params.append(note)
-            
-            if not updates:
-                return {"status": "error", "message": "No fields provided to update"}
-            
-            query = f"UPDATE expenses SET {', '.join(updates)} WHERE id = ?"
-            params.append(expense_id)
-            
-            await c.execute(query, params)
-            await c.commit()
-            
-            # Return updated expense
-            cur = await c.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
-            updated = await cur.fetchone()
-            cols = [d[0] for d in cur.description]
-            return {"status": "success", "expense": dict(zip(cols, updated))}
+        scale = await _amount_scale()
+        if amount is not None:
+            amount = _to_minor(amount, scale)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    
+    async def update(c):
+        nonlocal category, subcategory
+        # First check if expense exists
+        cur = await c.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
+        existing = await cur.fetchone()
+        
+        if not existing:
+            return None
+        
+        # Build update query dynamically
+        updates = []
+        params = []
+        
+        if date is not None:
+            updates.append("date = ?")
+            params.append(_validate_date(date))
+        if amount is not None:
+            updates.append("amount = ?")
+            params.append(amount)
+        if category is not None or subcategory is not None:
+            taxonomy = _category_index.refresh()
+            pair = (existing[3] if category is None else category, existing[4] if subcategory is None else subcategory)
+            # Check the resulting pair, so a new category is not left with a stale subcategory;
+            # a legacy category missing from the taxonomy is only checked when it is replaced
+            if category is not None or _taxonomy_key(existing[3]) in taxonomy.categories:
+                pair = taxonomy.resolve(*pair)
+            category, subcategory = pair
+            updates.append("category = ?")
+            params.append(category)
+            updates.append("subcategory = ?")
+            params.append(subcategory)
+        if note is not None:
+            updates.append("note = ?")
+            params.append(note)
+        
+        query = f"UPDATE expenses SET {', '.join(updates)} WHERE id = ?"
+        params.append(expense_id)
+        
+        await c.execute(query, params)
+        
+        # Return updated expense (as it will be committed with the batch)
+        cur = await c.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
+        updated = await cur.fetchone()
+        cols = [d[0] for d in cur.description]
+        return _money_fields(dict(zip(cols, updated)), scale)
+    
+    try:
+        expense = await submit_write(update)
+        if expense is None:
+            return {"status": "error", "message": f"Expense with ID {expense_id} not found"}
+        return {"status": "success", "expense": expense}
     except Exception as e:
         return {"status": "error", "message": f"Error updating expense: {str(e)}"}
 
@@ -202,7 +2210,8 @@ async def update_expense(expense_id, date=None, amount=None, category=None, subc
 async def get_expense_by_id(expense_id):
     '''Get a specific expense by its ID.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        scale = await _amount_scale()
+        async with read_connection() as c:
             cur = await c.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
             expense = await cur.fetchone()
             
@@ -210,101 +2219,194 @@ async def get_expense_by_id(expense_id):
                 return {"status": "error", "message": f"Expense with ID {expense_id} not found"}
             
             cols = [d[0] for d in cur.description]
-            return {"status": "success", "expense": dict(zip(cols, expense))}
+            return {"status": "success", "expense": _money_fields(dict(zip(cols, expense)), scale)}
     except Exception as e:
         return {"status": "error", "message": f"Error retrieving expense: {str(e)}"}
 
+def _fts_query(keyword):
+    '''Turn free text into an FTS5 query: every word must match, as a prefix.'''
+    import re
+    terms = re.findall(r"\w+", str(keyword))
+    return " ".join(f'"{term}"*' for term in terms)
+
+SEARCH_COLUMNS = ("id", "date", "amount", "category", "subcategory", "note")
+
 @mcp.tool()
-async def search_expenses(keyword, start_date=None, end_date=None):
-    '''Search expenses by keyword in category, subcategory, or note fields.'''
+async def search_expenses(keyword, start_date=None, end_date=None, limit=None, cursor=None, order_by="relevance",
+                          format="records"):
+    '''Search expenses by keyword in category, subcategory, or note fields.
+    
+    Every word of the keyword must match the start of a word in one of those fields.
+    order_by can be "relevance" (best matches first) or "date" (newest first).
+    Returns at most limit rows; pass the returned next_cursor back to get the next page.
+    format="columnar" returns results as {"columns": [...], "rows": [[...], ...]}.
+    '''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            query = """
-                SELECT id, date, amount, category, subcategory, note
-                FROM expenses
-                WHERE (category LIKE ? OR subcategory LIKE ? OR note LIKE ?)
-            """
-            params = [f"%{keyword}%", f"%{keyword}%", f"%{keyword}%"]
-            
-            if start_date and end_date:
-                query += " AND date BETWEEN ? AND ?"
-                params.extend([start_date, end_date])
-            elif start_date:
-                query += " AND date >= ?"
-                params.append(start_date)
-            elif end_date:
-                query += " AND date <= ?"
-                params.append(end_date)
-            
-            query += " ORDER BY date DESC, id DESC"
-            
+        _check_format(format)
+        match = _fts_query(keyword)
+        if not match:
+            return {"status": "error", "message": "Keyword must contain at least one letter or digit"}
+        if order_by not in ("relevance", "date"):
+            return {"status": "error", "message": 'order_by must be "relevance" or "date"'}
+        page_size = _page_size(limit)
+        after = _decode_cursor(cursor, order_by) if cursor else None
+        scale = await _amount_scale()
+        
+        date_filter = ""
+        date_params = []
+        if start_date and end_date:
+            date_filter = "date BETWEEN ? AND ?"
+            date_params = [start_date, end_date]
+        elif start_date:
+            date_filter = "date >= ?"
+            date_params = [start_date]
+        elif end_date:
+            date_filter = "date <= ?"
+            date_params = [end_date]
+        
+        async def search_schemas(c, schemas):
+            # Each archive partition has its own full-text index; the matches of every
+            # schema are merged by the ORDER BY of the compound query
+            parts = []
+            params = []
+            for schema in schemas:
+                if schema != "main":
+                    cur = await c.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'expenses_fts'")
+                    if not await cur.fetchone():
+                        # Partitions written before archives carried an index cannot be searched
+                        unindexed.add(int(schema[len("archive_"):]))
+                        continue
+                part = f"""
+                    SELECT e.id AS id, e.date AS date, e.amount AS amount, e.category AS category,
+                           e.subcategory AS subcategory, e.note AS note, f.rank AS rank
+                    FROM {schema}.expenses_fts AS f
+                    JOIN {schema}.expenses e ON e.id = f.rowid
+                    WHERE f.expenses_fts MATCH ?
+                """
+                part_params = [match]
+                if date_filter:
+                    # Bound the FTS doclist walk to the id span of the date range (cheap via
+                    # idx_expenses_date_id) instead of matching the whole history first
+                    cur = await c.execute(f"SELECT MIN(id), MAX(id) FROM {schema}.expenses WHERE {date_filter}",
+                                          date_params)
+                    low_id, high_id = await cur.fetchone()
+                    if low_id is None:
+                        continue
+                    part += f" AND f.rowid BETWEEN ? AND ? AND e.{date_filter}"
+                    part_params.extend([low_id, high_id] + date_params)
+                if after and order_by == "relevance":
+                    part += " AND (f.rank > ? OR (f.rank = ? AND (e.date, e.id) < (?, ?)))"
+                    part_params.extend([after[0]] + after)
+                elif after:
+                    part += " AND (e.date, e.id) < (?, ?)"
+                    part_params.extend(after)
+                parts.append(part)
+                params.extend(part_params)
+            if not parts:
+                return []
+            query = " UNION ALL ".join(parts)
+            if order_by == "relevance":
+                query += " ORDER BY rank, date DESC, id DESC"
+            else:
+                query += " ORDER BY date DESC, id DESC"
+            query += " LIMIT ?"
+            params.append(page_size + 1)
             cur = await c.execute(query, params)
-            cols = [d[0] for d in cur.description]
-            results = [dict(zip(cols, r)) for r in await cur.fetchall()]
-            
-            return {"status": "success", "results": results, "count": len(results)}
+            return await cur.fetchall()
+        
+        first, last = start_date or "0000-01-01", end_date or "9999-12-31"
+        while True:
+            async with read_connection() as c:
+                cur = await c.execute(ARCHIVE_PARTITIONS_QUERY, (first, last))
+                catalog = await cur.fetchall()
+            # A search without dates can span more archived years than one connection can
+            # attach: search them ARCHIVE_MAX_ATTACHED years at a time (the live database
+            # with the newest), each batch keeping its best page, and merge those pages
+            years = [year for year, _ in catalog]
+            batches = [years[i:i + ARCHIVE_MAX_ATTACHED] for i in range(0, len(years), ARCHIVE_MAX_ATTACHED)]
+            rows = []
+            unindexed = set()
+            for i, batch in enumerate(batches or [[]]):
+                window = (first, last) if not batch else (f"{batch[-1]:04d}-01-01", f"{batch[0]:04d}-12-31")
+                async with federated_connection(*window) as (c, schemas):
+                    cur = await c.execute(ARCHIVE_PARTITIONS_QUERY, (first, last))
+                    if await cur.fetchall() != catalog:
+                        # A year was archived between batches; its rows may have moved
+                        # from a batch already read into one still to come
+                        break
+                    rows.extend(await search_schemas(c, schemas if i == 0 else schemas[1:]))
+            else:
+                break
+        rows.sort(key=lambda r: (r[1], r[0]), reverse=True)
+        if order_by == "relevance":
+            rows.sort(key=lambda r: r[-1])
+        
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            expense_id, date, *_, rank = rows[-1]
+            key = (date, expense_id) if order_by == "date" else (rank, date, expense_id)
+            next_cursor = _encode_cursor(order_by, *key)
+        # The rank column only feeds the cursor
+        rows = [r[:-1] for r in rows]
+        results = _columnar(SEARCH_COLUMNS, rows, scale) if format == "columnar" else _records(SEARCH_COLUMNS, rows, scale)
+        result = {"status": "success", "results": results, "count": len(rows), "next_cursor": next_cursor}
+        if unindexed:
+            result["warning"] = f"Archived years {sorted(unindexed)} have no full-text index and were not searched"
+        return result
     except Exception as e:
         return {"status": "error", "message": f"Error searching expenses: {str(e)}"}
 
 @mcp.tool()
+@cached_tool
 async def get_monthly_summary(year, month=None):
     '''Get monthly summary of expenses. If month is not provided, returns summary for all months in the year.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        scale = await _amount_scale()
+        first, last = (f"{year}-{month:02d}",) * 2 if month else (f"{year}-01", f"{year}-12")
+        async with federated_connection(f"{first}-01", f"{last}-31") as (c, schemas):
+            # A month of an archived year may also have rows added to the live database later
+            source, params = _federate("""
+                SELECT month, category, txn_count, total_amount
+                FROM {schema}.expense_monthly_rollup
+                WHERE month BETWEEN ? AND ?
+            """, (first, last), schemas)
             if month:
-                # Specific month summary
-                start_date = f"{year}-{month:02d}-01"
-                if month == 12:
-                    end_date = f"{year+1}-01-01"
-                else:
-                    end_date = f"{year}-{month+1:02d}-01"
-                
-                cur = await c.execute("""
+                # Specific month summary, straight from the monthly rollup
+                cur = await c.execute(f"""
                     SELECT 
                         category,
-                        SUM(amount) as total_amount,
-                        COUNT(*) as transaction_count,
-                        AVG(amount) as avg_amount
-                    FROM expenses
-                    WHERE date >= ? AND date < ?
+                        SUM(total_amount) as total_amount,
+                        SUM(txn_count) as transaction_count,
+                        SUM(total_amount) * 1.0 / SUM(txn_count) as avg_amount
+                    FROM ({source})
                     GROUP BY category
                     ORDER BY total_amount DESC
-                """, (start_date, end_date))
+                """, params)
                 
                 cols = [d[0] for d in cur.description]
                 category_summary = [dict(zip(cols, r)) for r in await cur.fetchall()]
-                
-                # Get total for the month
-                cur = await c.execute("""
-                    SELECT 
-                        SUM(amount) as total,
-                        COUNT(*) as total_transactions
-                    FROM expenses
-                    WHERE date >= ? AND date < ?
-                """, (start_date, end_date))
-                
-                total_data = await cur.fetchone()
+                total_amount = sum(item["total_amount"] for item in category_summary)
                 
                 return {
                     "status": "success",
                     "year": year,
                     "month": month,
-                    "total_amount": total_data[0] or 0,
-                    "total_transactions": total_data[1] or 0,
-                    "categories": category_summary
+                    "total_amount": _from_minor(total_amount, scale),
+                    "total_transactions": sum(item["transaction_count"] for item in category_summary),
+                    "categories": [_money_fields(item, scale) for item in category_summary]
                 }
             else:
                 # Yearly summary by month
-                cur = await c.execute("""
+                cur = await c.execute(f"""
                     SELECT 
-                        strftime('%m', date) as month,
-                        SUM(amount) as total_amount,
-                        COUNT(*) as transaction_count
-                    FROM expenses
-                    WHERE strftime('%Y', date) = ?
-                    GROUP BY strftime('%m', date)
+                        substr(month, 6, 2) as month,
+                        SUM(total_amount) as total_amount,
+                        SUM(txn_count) as transaction_count
+                    FROM ({source})
+                    GROUP BY month
                     ORDER BY month
-                """, (str(year),))
+                """, params)
                 
                 cols = [d[0] for d in cur.description]
                 monthly_data = [dict(zip(cols, r)) for r in await cur.fetchall()]
@@ -315,6 +2417,7 @@ async def get_monthly_summary(year, month=None):
                 
                 for item in monthly_data:
                     item['month_name'] = month_names[int(item['month']) - 1]
+                    _money_fields(item, scale)
                 
                 return {
                     "status": "success",
@@ -326,151 +2429,452 @@ async def get_monthly_summary(year, month=None):
         return {"status": "error", "message": f"Error getting monthly summary: {str(e)}"}
 
 @mcp.tool()
-async def get_top_expenses(start_date, end_date, limit=10):
-    '''Get the top N highest expenses within a date range.'''
+@cached_tool
+async def get_top_expenses(start_date, end_date, limit=10, format="records"):
+    '''Get the top N highest expenses within a date range. format="columnar" returns columns and row lists.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            cur = await c.execute("""
+        _check_format(format)
+        scale = await _amount_scale()
+        async with federated_connection(start_date, end_date) as (c, schemas):
+            query, params = _federate("""
                 SELECT id, date, amount, category, subcategory, note
-                FROM expenses
+                FROM {schema}.expenses
                 WHERE date BETWEEN ? AND ?
-                ORDER BY amount DESC
-                LIMIT ?
-            """, (start_date, end_date, limit))
+            """, (start_date, end_date), schemas)
+            cur = await c.execute(f"SELECT * FROM ({query}) ORDER BY amount DESC LIMIT ?", params + [limit])
             
             cols = [d[0] for d in cur.description]
-            results = [dict(zip(cols, r)) for r in await cur.fetchall()]
+            rows = await cur.fetchall()
+            results = _columnar(cols, rows, scale) if format == "columnar" else _records(cols, rows, scale)
             
-            return {"status": "success", "top_expenses": results, "count": len(results)}
+            return {"status": "success", "top_expenses": results, "count": len(rows)}
     except Exception as e:
         return {"status": "error", "message": f"Error getting top expenses: {str(e)}"}
 
+# Statistics
+class QuantileSketch:
+    '''Mergeable quantile sketch with bounded relative error (DDSketch-style).
+
+    Values are counted in logarithmic buckets, so memory depends on the spread of the
+    amounts rather than on how many there are, and every reported quantile is within
+    relative_accuracy of a real value at that rank.
+    '''
+
+    def __init__(self, relative_accuracy=STATS_SKETCH_ACCURACY):
+        import math
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value):
+        self.extend((value,))
+
+    def extend(self, values):
+        import math
+        from collections import Counter
+        log, ceil, scale = math.log, math.ceil, 1 / self._log_gamma
+        for store, keys in (
+            (self.positive, Counter(ceil(log(v) * scale) for v in values if v > 0)),
+            (self.negative, Counter(ceil(log(-v) * scale) for v in values if v < 0)),
+        ):
+            for key, count in keys.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += sum(1 for v in values if v == 0)
+        self.count += len(values)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+def _exact_quantile(ordered, q):
+    '''Linear interpolation between the closest ranks of a sorted list.'''
+    if not ordered:
+        return None
+    position = q * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class _StatsAccumulator:
+    '''Running count/sum/min/max, plus the values or a sketch when percentiles are wanted.'''
+
+    def __init__(self, method):
+        self.method = method
+        self.count = 0
+        self.total = 0
+        self.min_amount = None
+        self.max_amount = None
+        self.values = [] if method == "exact" else None
+        self.sketch = QuantileSketch() if method == "sketch" else None
+
+    def extend(self, amounts):
+        self.add_group(len(amounts), sum(amounts), min(amounts), max(amounts))
+        if self.values is not None:
+            self.values.extend(amounts)
+        elif self.sketch is not None:
+            self.sketch.extend(amounts)
+
+    def add_group(self, count, total, min_amount, max_amount):
+        self.count += count
+        self.total += total
+        self.min_amount = min_amount if self.min_amount is None else min(self.min_amount, min_amount)
+        self.max_amount = max_amount if self.max_amount is None else max(self.max_amount, max_amount)
+
+    def percentiles(self, points, scale):
+        if self.values is not None:
+            self.values.sort()
+            quantile = lambda q: _exact_quantile(self.values, q)
+        else:
+            quantile = self.sketch.quantile
+        return {f"p{point:g}": _from_minor(quantile(point / 100), scale) for point in points}
+
 @mcp.tool()
-async def get_expense_statistics(start_date, end_date):
-    '''Get comprehensive statistics for expenses within a date range.'''
+async def get_expense_statistics(start_date, end_date, percentiles=(50, 90, 99), percentile_method=None):
+    '''Get comprehensive statistics for expenses within a date range.
+    
+    percentile_method is "exact", "sketch" (approximate, bounded memory) or "none";
+    percentiles lists the points (0-100) reported overall and per category.
+    '''
+    method = percentile_method or STATS_PERCENTILE_METHOD
+    if method not in ("exact", "sketch", "none"):
+        return {"status": "error", "message": 'percentile_method must be "exact", "sketch", or "none"'}
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            # Basic statistics
-            cur = await c.execute("""
-                SELECT 
-                    COUNT(*) as total_transactions,
-                    SUM(amount) as total_amount,
-                    AVG(amount) as average_amount,
-                    MIN(amount) as min_amount,
-                    MAX(amount) as max_amount
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-            """, (start_date, end_date))
-            
-            basic_stats = await cur.fetchone()
-            
-            # Category breakdown
-            cur = await c.execute("""
-                SELECT 
-                    category,
-                    COUNT(*) as count,
-                    SUM(amount) as total,
-                    AVG(amount) as average
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-                GROUP BY category
-                ORDER BY total DESC
-            """, (start_date, end_date))
-            
-            category_cols = [d[0] for d in cur.description]
-            category_stats = [dict(zip(category_cols, r)) for r in await cur.fetchall()]
-            
-            # Daily average
-            cur = await c.execute("""
-                SELECT COUNT(DISTINCT date) as unique_days
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-            """, (start_date, end_date))
-            
-            unique_days = (await cur.fetchone())[0]
-            daily_average = (basic_stats[1] or 0) / max(unique_days, 1)
-            
-            return {
-                "status": "success",
-                "period": {"start_date": start_date, "end_date": end_date},
-                "basic_statistics": {
-                    "total_transactions": basic_stats[0] or 0,
-                    "total_amount": basic_stats[1] or 0,
-                    "average_amount": basic_stats[2] or 0,
-                    "min_amount": basic_stats[3] or 0,
-                    "max_amount": basic_stats[4] or 0,
-                    "daily_average": daily_average
-                },
-                "category_breakdown": category_stats
-            }
+        points = [float(point) for point in (percentiles or [])]
+        if any(not 0 <= point <= 100 for point in points):
+            raise ValueError
+    except (TypeError, ValueError):
+        return {"status": "error", "message": "percentiles must be numbers between 0 and 100"}
+    if not points:
+        method = "none"
+    try:
+        scale = await _amount_scale()
+        overall = _StatsAccumulator(method)
+        by_category = {}
+        async with federated_connection(start_date, end_date) as (c, schemas):
+            if method == "none":
+                # Aggregates only: one grouped query over the rollups (monthly for whole months).
+                # Days are made distinct within each schema first; a day with rows both in its
+                # archive partition and in the live database is still counted once
+                source, params = _rollup_source(start_date, end_date, schemas=schemas)
+                days, day_params = _federate("""
+                    SELECT DISTINCT day
+                    FROM {schema}.expense_daily_rollup
+                    WHERE day BETWEEN ? AND ?
+                """, (start_date, end_date), schemas)
+                cur = await c.execute(f"""
+                    SELECT category, SUM(txn_count), SUM(total_amount), MIN(min_amount), MAX(max_amount),
+                           (SELECT COUNT(DISTINCT day) FROM ({days}))
+                    FROM {source}
+                    GROUP BY category
+                """, day_params + params)
+                day_count = 0
+                for category, *group, day_count in await cur.fetchall():
+                    by_category[category] = _StatsAccumulator(method)
+                    by_category[category].add_group(*group)
+                    overall.add_group(*group)
+            else:
+                # Percentiles need every amount: one pass over the covering (date, category, amount) index
+                cur = await c.execute(*_federate("""
+                    SELECT date, category, amount
+                    FROM {schema}.expenses
+                    WHERE date BETWEEN ? AND ?
+                """, (start_date, end_date), schemas))
+                days = set()
+                while True:
+                    rows = await cur.fetchmany(2000)
+                    if not rows:
+                        break
+                    days.update(row[0] for row in rows)
+                    # Amounts are handed over a chunk at a time, split by category
+                    chunk = {}
+                    for day, category, amount in rows:
+                        chunk.setdefault(category, []).append(amount)
+                    overall.extend([row[2] for row in rows])
+                    for category, amounts in chunk.items():
+                        if category not in by_category:
+                            by_category[category] = _StatsAccumulator(method)
+                        by_category[category].extend(amounts)
+                day_count = len(days)
+        
+        category_stats = []
+        for category, stats in by_category.items():
+            entry = {"category": category, "count": stats.count, "total": _from_minor(stats.total, scale),
+                     "average": _from_minor(stats.total / stats.count, scale)}
+            if method != "none":
+                entry["percentiles"] = stats.percentiles(points, scale)
+            category_stats.append(entry)
+        category_stats.sort(key=lambda entry: entry["total"], reverse=True)
+        
+        basic_statistics = {
+            "total_transactions": overall.count,
+            "total_amount": _from_minor(overall.total, scale),
+            "average_amount": _from_minor(overall.total / overall.count if overall.count else 0, scale),
+            "min_amount": _from_minor(overall.min_amount or 0, scale),
+            "max_amount": _from_minor(overall.max_amount or 0, scale),
+            "daily_average": _from_minor(overall.total / max(day_count, 1), scale)
+        }
+        if method != "none":
+            basic_statistics["percentiles"] = overall.percentiles(points, scale)
+        
+        return {
+            "status": "success",
+            "period": {"start_date": start_date, "end_date": end_date},
+            "percentile_method": method,
+            "basic_statistics": basic_statistics,
+            "category_breakdown": category_stats
+        }
     except Exception as e:
         return {"status": "error", "message": f"Error getting statistics: {str(e)}"}
 
+# Bulk ingestion pipeline
+EXPENSE_INSERT = "INSERT INTO expenses(date, amount, category, subcategory, note) VALUES (?,?,?,?,?)"
+
+def _confined_path(directory, relative, field, purpose):
+    '''Return relative resolved inside directory, or raise ValueError.
+
+    Absolute paths, ~ and .. (also through symlinks) must not lead out of the directory.
+    '''
+    relative = str(relative)
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, relative))
+    if os.path.isabs(relative) or relative.startswith("~") or os.path.commonpath([root, path]) != root \
+            or path == root:
+        raise ValueError(f"{field} must be a file name relative to the {purpose} directory, got {relative!r}")
+    return path
+
+def _normalize_expense(expense, taxonomy, scale, echo=True):
+    '''Validate one incoming expense and return it as an INSERT parameter tuple.
+
+    With echo=False errors name the invalid field but never repeat its value, so
+    rejected rows of a server-side file do not disclose the file's contents.
+    '''
+    if not isinstance(expense, dict):
+        raise ValueError("expected an object with date, amount and category")
+    field = "date"
+    try:
+        date = _validate_date(expense.get('date'))
+        field = "amount"
+        amount = _to_minor(expense.get('amount'), scale)
+        field = "category"
+        category = str(expense.get('category') or '').strip()
+        if not category:
+            raise ValueError("category is required")
+        category, subcategory = taxonomy.resolve(category, str(expense.get('subcategory') or ''))
+    except ValueError as e:
+        if echo:
+            raise
+        raise ValueError(f"invalid or missing {field}") from None
+    return (
+        date,
+        amount,
+        category,
+        subcategory,
+        str(expense.get('note') or ''),
+    )
+
+def _iter_expense_file(handle, file_format):
+    '''Yield (row_number, record) from an open CSV or NDJSON file, one line at a time.'''
+    if file_format == "csv":
+        import csv
+        for row_number, record in enumerate(csv.DictReader(handle), 1):
+            yield row_number, record
+        return
+    row_number = 0
+    for line in handle:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, e
+
+def _prepare_batch(records, size, taxonomy, scale, echo=True):
+    '''Pull up to size records and validate them (see _normalize_expense for echo).
+
+    Returns (rows, errors, exhausted) where rows holds (row_number, params) tuples.
+    '''
+    rows, errors = [], []
+    taken = 0
+    exhausted = False
+    for row_number, record in records:
+        taken += 1
+        try:
+            if isinstance(record, Exception):
+                raise ValueError(f"Invalid JSON: {record}")
+            rows.append((row_number, _normalize_expense(record, taxonomy, scale, echo)))
+        except ValueError as e:
+            errors.append((row_number, str(e)))
+        if taken >= size:
+            break
+    else:
+        exhausted = True
+    # Inserting in (date, category, subcategory) order keeps index and rollup
+    # updates within the chunk on neighbouring pages
+    rows.sort(key=lambda row: (row[1][0], row[1][2], row[1][3]))
+    return rows, errors, exhausted
+
+async def _write_expense_chunk(rows):
+    '''Insert one validated chunk in a single transaction.
+
+    The chunk goes through executemany; if SQLite rejects any row, the chunk is
+    retried row by row under savepoints so only the offending rows are dropped.
+    Returns (inserted_count, errors).
+    '''
+    async with write_connection() as c:
+        await c.execute("BEGIN IMMEDIATE")
+        try:
+            await c.executemany(EXPENSE_INSERT, [params for _, params in rows])
+            await c.commit()
+            return len(rows), []
+        except Exception:
+            await c.rollback()
+
+        inserted, errors = 0, []
+        await c.execute("BEGIN IMMEDIATE")
+        for row_number, params in rows:
+            await c.execute("SAVEPOINT bulk_row")
+            try:
+                await c.execute(EXPENSE_INSERT, params)
+                inserted += 1
+            except Exception as e:
+                await c.execute("ROLLBACK TO bulk_row")
+                errors.append((row_number, str(e)))
+            await c.execute("RELEASE bulk_row")
+        await c.commit()
+        return inserted, errors
+
 @mcp.tool()
-async def bulk_add_expenses(expenses):
-    '''Add multiple expenses at once. Expects a list of expense dictionaries.'''
+async def bulk_add_expenses(expenses=None, file_path=None, file_format=None, chunk_size=None, max_errors=100):
+    '''Add many expenses at once, from a list of expense dictionaries or a CSV/NDJSON file in the import directory.'''
+    if (expenses is None) == (file_path is None):
+        return {"status": "error", "message": "Provide either expenses or file_path"}
+    size = max(1, int(chunk_size or BULK_CHUNK_SIZE))
+    handle = None
+    success_count = 0
     try:
-        success_count = 0
+        if file_path is not None:
+            file_format = (file_format or os.path.splitext(file_path)[1].lstrip(".")).lower()
+            if file_format in ("jsonl", "json"):
+                file_format = "ndjson"
+            if file_format not in ("csv", "ndjson"):
+                return {"status": "error", "message": f"Unsupported file format {file_format!r}; use csv or ndjson"}
+            try:
+                path = _confined_path(IMPORT_DIR, file_path, "file_path", "import")
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
+            if not os.path.isfile(path):
+                return {"status": "error", "message": f"File not found in the import directory: {file_path}"}
+            handle = open(path, newline="", encoding="utf-8-sig")
+            records = _iter_expense_file(handle, file_format)
+        else:
+            records = enumerate(expenses, 1)
+
+        started = time.perf_counter()
+        scale = await _amount_scale()
+        total_count = 0
+        error_count = 0
         errors = []
-        
-        async with aiosqlite.connect(DB_PATH) as c:
-            for i, expense in enumerate(expenses):
-                try:
-                    await c.execute(
-                        "INSERT INTO expenses(date, amount, category, subcategory, note) VALUES (?,?,?,?,?)",
-                        (
-                            expense.get('date'),
-                            expense.get('amount'),
-                            expense.get('category'),
-                            expense.get('subcategory', ''),
-                            expense.get('note', '')
-                        )
-                    )
-                    success_count += 1
-                except Exception as e:
-                    errors.append(f"Row {i+1}: {str(e)}")
-            
-            await c.commit()
-        
+        exhausted = False
+        while not exhausted:
+            # Reading and validating happens off the event loop and outside the writer lock
+            taxonomy = _category_index.refresh()
+            rows, failed, exhausted = await asyncio.to_thread(_prepare_batch, records, size, taxonomy, scale,
+                                                              handle is None)
+            total_count += len(rows) + len(failed)
+            if rows:
+                inserted, rejected = await _write_expense_chunk(rows)
+                success_count += inserted
+                failed.extend(rejected)
+            error_count += len(failed)
+            for row_number, message in sorted(failed):
+                if len(errors) < max_errors:
+                    errors.append(f"Row {row_number}: {message}")
+        elapsed = time.perf_counter() - started
+
         return {
-            "status": "success" if not errors else "partial_success",
+            "status": "success" if not error_count else "partial_success",
             "added_count": success_count,
-            "total_count": len(expenses),
-            "errors": errors
+            "total_count": total_count,
+            "error_count": error_count,
+            "errors": errors,
+            "errors_truncated": error_count > len(errors),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(success_count / elapsed, 1) if elapsed else 0.0,
         }
     except Exception as e:
-        return {"status": "error", "message": f"Error in bulk add: {str(e)}"}
+        # Chunks written before the failure stay committed
+        return {"status": "error", "message": f"Error in bulk add: {str(e)}", "added_count": success_count}
+    finally:
+        if handle is not None:
+            handle.close()
 
 @mcp.tool()
+@cached_tool
 async def get_category_trends(category, start_date, end_date, group_by="month"):
     '''Get spending trends for a specific category over time. group_by can be "day", "week", or "month".'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        scale = await _amount_scale()
+        async with federated_connection(start_date, end_date) as (c, schemas):
             if group_by == "day":
-                date_format = "%Y-%m-%d"
-                group_format = "date"
+                source, params = _federate("""
+                    SELECT day AS period, SUM(txn_count) AS txn_count, SUM(total_amount) AS total_amount
+                    FROM {schema}.expense_daily_rollup
+                    WHERE category = ? AND day BETWEEN ? AND ?
+                    GROUP BY day
+                """, (category, start_date, end_date), schemas)
             elif group_by == "week":
-                date_format = "%Y-W%W"
-                group_format = "strftime('%Y-W%W', date)"
+                # Range on the indexed year_week key (same %W numbering as SQLite) so
+                # rows come back already grouped; the day range trims partial weeks
+                first_week, last_week = (
+                    datetime.strptime(d, "%Y-%m-%d").strftime("%Y-W%W")
+                    for d in (_validate_date(start_date, "start_date"), _validate_date(end_date, "end_date"))
+                )
+                source, params = _federate("""
+                    SELECT year_week AS period, SUM(txn_count) AS txn_count, SUM(total_amount) AS total_amount
+                    FROM {schema}.expense_daily_rollup
+                    WHERE category = ? AND year_week BETWEEN ? AND ? AND day BETWEEN ? AND ?
+                    GROUP BY year_week
+                """, (category, first_week, last_week, start_date, end_date), schemas)
             else:  # month
-                date_format = "%Y-%m"
-                group_format = "strftime('%Y-%m', date)"
-            
+                source, params = _rollup_source(start_date, end_date, category, schemas)
+                source = f"SELECT month AS period, txn_count, total_amount FROM {source}"
+            # Periods are grouped within each schema, then merged: a week or month of an
+            # archived year may also have rows added to the live database later
             query = f"""
                 SELECT 
-                    {group_format} as period,
-                    SUM(amount) as total_amount,
-                    COUNT(*) as transaction_count,
-                    AVG(amount) as avg_amount
-                FROM expenses
-                WHERE category = ? AND date BETWEEN ? AND ?
-                GROUP BY {group_format}
+                    period,
+                    SUM(total_amount) as total_amount,
+                    SUM(txn_count) as transaction_count,
+                    SUM(total_amount) * 1.0 / SUM(txn_count) as avg_amount
+                FROM ({source})
+                GROUP BY period
                 ORDER BY period
             """
             
-            cur = await c.execute(query, (category, start_date, end_date))
+            cur = await c.execute(query, params)
             cols = [d[0] for d in cur.description]
-            trends = [dict(zip(cols, r)) for r in await cur.fetchall()]
+            trends = [_money_fields(dict(zip(cols, r)), scale) for r in await cur.fetchall()]
             
             return {
                 "status": "success",
@@ -482,20 +2886,367 @@ async def get_category_trends(category, start_date, end_date, group_by="month"):
     except Exception as e:
         return {"status": "error", "message": f"Error getting category trends: {str(e)}"}
 
+# Dense trend matrices grow with periods x categories; longer ranges need a coarser group_by
+TREND_MAX_PERIODS = 1000
+TREND_MAX_FORECAST = 24
+
+def _trend_grid(start_date, end_date, group_by):
+    '''Dense periods covering an inclusive date range.
+
+    Returns (count, key, index_of, label): index_of maps every value the rollup column
+    key takes in the range to its period index, and label(i) names period i,
+    including periods after the range for forecasts.
+    '''
+    from datetime import date
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if group_by == "month":
+        base = start.year * 12 + start.month - 1
+        count = end.year * 12 + end.month - base
+        label = lambda i: f"{(base + i) // 12:04d}-{(base + i) % 12 + 1:02d}"
+        return count, "month", {label(i): i for i in range(count)}, label
+    first, last = start.toordinal(), end.toordinal()
+    if group_by == "week":
+        # Monday-based weeks labelled like SQLite's %W by their first day in the range;
+        # unlike %W, a week spanning New Year stays one period
+        base = first - start.weekday()
+        count = (last - base) // 7 + 1
+        label = lambda i: date.fromordinal(max(base + 7 * i, first)).strftime("%Y-W%W")
+        index_of = {date.fromordinal(day).isoformat(): (day - base) // 7 for day in range(first, last + 1)}
+        return count, "day", index_of, label
+    label = lambda i: date.fromordinal(first + i).isoformat()
+    return last - first + 1, "day", {label(i): i for i in range(last - first + 1)}, label
+
+@mcp.tool()
+@cached_tool
+async def get_multi_category_trends(start_date, end_date, categories=None, group_by="month", window=3,
+                                    forecast_periods=3):
+    '''Spending of many categories per period in one call, as dense matrices with moving averages and a linear forecast.'''
+    try:
+        start_date = _validate_date(start_date, "start_date")
+        end_date = _validate_date(end_date, "end_date")
+        if start_date > end_date:
+            raise ValueError("start_date must not be after end_date")
+        if group_by not in ("day", "week", "month"):
+            raise ValueError('group_by must be "day", "week", or "month"')
+        window = int(window)
+        forecast_periods = int(forecast_periods)
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        if not 0 <= forecast_periods <= TREND_MAX_FORECAST:
+            raise ValueError(f"forecast_periods must be between 0 and {TREND_MAX_FORECAST}")
+        if isinstance(categories, str):
+            categories = [categories]
+        categories = list(dict.fromkeys(categories or []))
+        n_periods, key, index_of, label = _trend_grid(start_date, end_date, group_by)
+        if n_periods > TREND_MAX_PERIODS:
+            raise ValueError(f"{n_periods} {group_by} periods exceed the limit of {TREND_MAX_PERIODS};"
+                             f" use a coarser group_by or a shorter range")
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        from array import array
+        category_filter = ""
+        if categories:
+            category_filter = f" AND category IN ({','.join('?' * len(categories))})"
+        scale = await _amount_scale()
+        async with federated_connection(start_date, end_date) as (c, schemas):
+            if group_by == "month":
+                source, params = _rollup_source(start_date, end_date, schemas=schemas)
+                source += f" WHERE 1{category_filter}"
+                params += categories
+            else:
+                source, params = _federate(f"""
+                    SELECT day, category, txn_count, total_amount
+                    FROM {{schema}}.expense_daily_rollup
+                    WHERE day BETWEEN ? AND ?{category_filter}
+                """, [start_date, end_date] + categories, schemas)
+                source = f"({source})"
+            cur = await c.execute(f"""
+                SELECT {key}, category, SUM(total_amount), SUM(txn_count)
+                FROM {source}
+                GROUP BY {key}, category
+            """, params)
+            rows = await cur.fetchall()
+
+        # Columnar buffers: period index, category code, amount (minor units), transaction count
+        codes = {category: k for k, category in enumerate(categories)}
+        periods = array("l", [index_of[row[0]] for row in rows])
+        columns = array("H", [codes.setdefault(row[1], len(codes)) for row in rows])
+        amounts = array("q", [row[2] for row in rows])
+        counts = array("q", [row[3] for row in rows])
+
+        width = len(codes)
+        total = array("q", bytes(8 * n_periods * width))
+        txns = array("q", bytes(8 * n_periods * width))
+        for p, k, amount, n in zip(periods, columns, amounts, counts):
+            total[p * width + k] += amount
+            txns[p * width + k] += n
+
+        # Trailing moving average and least-squares sums per category, one pass over the matrix
+        moving = array("d", bytes(8 * n_periods * width))
+        running = array("d", bytes(8 * width))
+        sum_y = array("d", bytes(8 * width))
+        sum_ty = array("d", bytes(8 * width))
+        for p in range(n_periods):
+            row = p * width
+            span = min(p + 1, window)
+            for k in range(width):
+                y = total[row + k]
+                running[k] += y
+                if p >= window:
+                    running[k] -= total[row - window * width + k]
+                moving[row + k] = running[k] / span
+                sum_y[k] += y
+                sum_ty[k] += p * y
+        sum_t = n_periods * (n_periods - 1) / 2
+        sum_tt = (n_periods - 1) * n_periods * (2 * n_periods - 1) / 6
+        denominator = n_periods * sum_tt - sum_t * sum_t
+        slopes = [(n_periods * sum_ty[k] - sum_t * sum_y[k]) / denominator if denominator else 0.0
+                  for k in range(width)]
+        intercepts = [(sum_y[k] - slopes[k] * sum_t) / n_periods for k in range(width)]
+
+        # Requested categories keep their order; discovered ones follow by total spend
+        names = sorted(codes, key=codes.get)
+        order = list(range(len(categories)))
+        order += sorted(range(len(order), width), key=lambda k: (-sum_y[k], names[k]))
+        # Exact sums convert as they are; averages and forecasts are rounded to the minor unit
+        digits = len(str(scale)) - 1
+        major = lambda value: round(value / scale, digits)
+        matrix = lambda flat: [[major(flat[p * width + k]) for k in order] for p in range(n_periods)]
+        future = range(n_periods, n_periods + forecast_periods)
+
+        return {
+            "status": "success",
+            "period": {"start_date": start_date, "end_date": end_date},
+            "group_by": group_by,
+            "window": window,
+            "categories": [names[k] for k in order],
+            "periods": [label(p) for p in range(n_periods)],
+            "amounts": matrix(total),
+            "transaction_counts": [[txns[p * width + k] for k in order] for p in range(n_periods)],
+            "moving_average": matrix(moving),
+            "category_totals": [major(sum_y[k]) for k in order],
+            "period_totals": [major(sum(total[p * width:(p + 1) * width])) for p in range(n_periods)],
+            "forecast": {
+                "periods": [label(p) for p in future],
+                "amounts": [[major(max(0.0, intercepts[k] + slopes[k] * p)) for k in order] for p in future],
+                "slope_per_period": [round(slopes[k] / scale, 4) for k in order],
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error getting multi-category trends: {str(e)}"}
+
+@mcp.tool()
+async def rebuild_rollups():
+    '''Recompute the daily and monthly rollups from the raw expenses (repairs drifted aggregates).'''
+    try:
+        async with write_connection() as c:
+            for statement in ROLLUP_REBUILD:
+                await c.execute(statement)
+            await c.commit()
+            
+            cur = await c.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM expense_daily_rollup),
+                    (SELECT COUNT(*) FROM expense_monthly_rollup)
+            """)
+            daily_rows, monthly_rows = await cur.fetchone()
+            return {
+                "status": "success",
+                "daily_rollup_rows": daily_rows,
+                "monthly_rollup_rows": monthly_rows,
+                "message": "Rollups rebuilt from expenses"
+            }
+    except Exception as e:
+        return {"status": "error", "message": f"Error rebuilding rollups: {str(e)}"}
+
+# Archive partitions
+ARCHIVE_TABLES = ("expenses", "expense_daily_rollup", "expense_monthly_rollup", "settings")
+
+# Rows of one year in each archived table: (table, key column, low bound format, high bound format)
+ARCHIVE_YEAR_RANGES = (
+    ("expenses", "date", "{year}-01-01", "{next}-01-01"),
+    ("expense_daily_rollup", "day", "{year}-01-01", "{next}-01-01"),
+    ("expense_monthly_rollup", "month", "{year}-01", "{next}-01"),
+)
+
+@mcp.tool()
+async def archive_year(year):
+    '''Move the expenses and rollups of a closed year into a read-only archive partition.
+
+    The date-range tools and search_expenses keep reading the year through the
+    partition; tools that look up, change or delete single expenses by id see only the
+    live database.
+    '''
+    import re
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return {"status": "error", "message": f"Invalid year {year!r}"}
+    if year >= datetime.now().year:
+        return {"status": "error", "message": f"Only closed years can be archived; {year} is not over yet"}
+    bounds = {"year": f"{year:04d}", "next": f"{year + 1:04d}"}
+    started = time.perf_counter()
+    try:
+        pool = await get_pool()
+        # The writer is held throughout, so no expense of the year changes between copy and delete
+        async with write_connection(pool) as c:
+            cur = await c.execute("SELECT file FROM archive_partitions WHERE year = ?", (year,))
+            if await cur.fetchone():
+                return {"status": "error", "message": f"{year} is already archived"}
+            cur = await c.execute("SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM expenses WHERE date >= ? AND date < ?",
+                                  (f"{year:04d}-01-01", f"{year + 1:04d}-01-01"))
+            row_count, total_amount = await cur.fetchone()
+            if not row_count:
+                return {"status": "error", "message": f"No expenses dated in {year}"}
+
+            directory = _archive_dir(pool.path)
+            os.makedirs(directory, exist_ok=True)
+            file = f"expenses_{year:04d}.db"
+            path = os.path.join(directory, file)
+            # Left over by an archive that failed part way; never listed in the catalog
+            for stale in (path + ".part", path + ".part-journal", path):
+                if os.path.exists(stale):
+                    os.chmod(stale, 0o644)
+                    os.remove(stale)
+
+            # Copy the year into a new file with the live schema, indexes and statistics
+            await c.execute("ATTACH DATABASE ? AS archive", (path + ".part",))
+            try:
+                await c.execute("PRAGMA archive.journal_mode = DELETE")
+                placeholders = ",".join("?" * len(ARCHIVE_TABLES))
+                cur = await c.execute(f"""
+                    SELECT type, name, tbl_name, sql FROM main.sqlite_master
+                    WHERE tbl_name IN ({placeholders}) AND type IN ('table', 'index') AND sql IS NOT NULL
+                    ORDER BY type = 'index'
+                """, ARCHIVE_TABLES)
+                objects = await cur.fetchall()
+                for kind, name, table, sql in objects:
+                    if kind == "table":
+                        await c.execute(sql.replace("CREATE TABLE ", "CREATE TABLE archive.", 1))
+                ranges = {table: (column, low.format(**bounds), high.format(**bounds))
+                          for table, column, low, high in ARCHIVE_YEAR_RANGES}
+                for table in ARCHIVE_TABLES:
+                    # Stored columns only: generated columns are computed again in the copy
+                    cur = await c.execute(f"SELECT name FROM pragma_table_xinfo('{table}') WHERE hidden = 0")
+                    columns = ", ".join(name for (name,) in await cur.fetchall())
+                    query = f"INSERT INTO archive.{table}({columns}) SELECT {columns} FROM main.{table}"
+                    params = ()
+                    if table in ranges:
+                        column, low, high = ranges[table]
+                        query += f" WHERE {column} >= ? AND {column} < ?"
+                        params = (low, high)
+                    await c.execute(query, params)
+                for kind, name, table, sql in objects:
+                    if kind == "index":
+                        await c.execute(re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX archive.", sql))
+                # The partition gets its own full-text index, so search_expenses finds the year there
+                cur = await c.execute("SELECT sql FROM main.sqlite_master WHERE name = 'expenses_fts'")
+                fts, = await cur.fetchone()
+                await c.execute(fts.replace("CREATE VIRTUAL TABLE ", "CREATE VIRTUAL TABLE archive.", 1))
+                await c.execute("INSERT INTO archive.expenses_fts(expenses_fts) VALUES ('rebuild')")
+                await c.commit()
+                await c.execute("ANALYZE archive")
+                await c.execute(f"PRAGMA archive.user_version = {SCHEMA_VERSION}")
+                await c.commit()
+                cur = await c.execute("""
+                    SELECT
+                        (SELECT COUNT(*) FROM archive.expenses), (SELECT COALESCE(SUM(amount), 0) FROM archive.expenses),
+                        (SELECT COALESCE(SUM(txn_count), 0) FROM archive.expense_daily_rollup),
+                        (SELECT COALESCE(SUM(total_amount), 0) FROM archive.expense_daily_rollup)
+                """)
+                copied = tuple(await cur.fetchone())
+                if copied != (row_count, total_amount, row_count, total_amount):
+                    raise RuntimeError(f"archive copy does not match: expected {row_count} rows totalling "
+                                       f"{total_amount}, copied {copied}")
+            finally:
+                if c.in_transaction:
+                    await c.rollback()
+                await c.execute("DETACH DATABASE archive")
+            os.chmod(path + ".part", 0o444)
+            os.replace(path + ".part", path)
+
+            # Remove the year from the live database and list the partition, in one transaction.
+            # The rollup delete trigger is dropped meanwhile: the year's rollup rows go as a whole.
+            # So is the change log's: the rows still exist for readers, so they get no tombstones.
+            # The full-text delete trigger stays: the partition has an index of its own
+            try:
+                await c.execute("BEGIN IMMEDIATE")
+                await c.execute("DROP TRIGGER expenses_rollup_delete")
+                await c.execute("DROP TRIGGER expenses_change_delete")
+                for table, column, low, high in ARCHIVE_YEAR_RANGES:
+                    await c.execute(f"DELETE FROM {table} WHERE {column} >= ? AND {column} < ?",
+                                    (low.format(**bounds), high.format(**bounds)))
+                await c.execute(ROLLUP_TRIGGERS[1])
+                await c.execute(CHANGE_TRIGGERS["expenses_change_delete"])
+                await c.execute("""
+                    INSERT INTO archive_partitions(year, file, row_count, total_amount, archived_date)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (year, file, row_count, total_amount, datetime.now().isoformat()))
+                await c.commit()
+            except BaseException:
+                await c.rollback()
+                os.chmod(path, 0o644)
+                os.remove(path)
+                raise
+        return {
+            "status": "success",
+            "year": year,
+            "path": path,
+            "row_count": row_count,
+            "total_amount": _from_minor(total_amount, pool.scale),
+            "bytes": os.path.getsize(path),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "message": f"Archived {row_count} expenses from {year}"
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error archiving {year}: {str(e)}"}
+
+@mcp.tool()
+async def get_archived_years():
+    '''List the years moved to archive partitions, with their row counts and totals.'''
+    try:
+        pool = await get_pool()
+        async with read_connection() as c:
+            cur = await c.execute("""
+                SELECT year, file, row_count, total_amount, archived_date
+                FROM archive_partitions ORDER BY year
+            """)
+            cols = [d[0] for d in cur.description]
+            partitions = [_money_fields(dict(zip(cols, r)), pool.scale) for r in await cur.fetchall()]
+        directory = _archive_dir(pool.path)
+        for partition in partitions:
+            path = os.path.join(directory, partition.pop("file"))
+            partition["path"] = path
+            partition["bytes"] = os.path.getsize(path) if os.path.exists(path) else None
+        return {"status": "success", "archived_years": partitions, "count": len(partitions)}
+    except Exception as e:
+        return {"status": "error", "message": f"Error listing archived years: {str(e)}"}
+
 # Budget Management Tools
 @mcp.tool()
 async def create_budget(category, amount, period, start_date, end_date=None):
     '''Create a budget for a category. Period can be "monthly", "weekly", or "yearly".'''
+    if period not in ("weekly", "monthly", "yearly"):
+        return {"status": "error", "message": 'Period must be "weekly", "monthly", or "yearly"'}
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        start_date = _validate_date(start_date, "start_date")
+        if end_date is not None:
+            end_date = _validate_date(end_date, "end_date")
+        category, _ = _category_index.refresh().resolve(category)
+        amount_minor = _to_minor(amount, await _amount_scale())
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        async with write_connection() as c:
             created_date = datetime.now().isoformat()
             
-            await c.execute("""
+            cur = await c.execute("""
                 INSERT INTO budgets(category, amount, period, start_date, end_date, created_date)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (category, amount, period, start_date, end_date, created_date))
+            """, (category, amount_minor, period, start_date, end_date, created_date))
             
-            budget_id = c.lastrowid
+            budget_id = cur.lastrowid
             await c.commit()
             
             return {
@@ -510,7 +3261,8 @@ async def create_budget(category, amount, period, start_date, end_date=None):
 async def get_budgets(active_only=True):
     '''Get all budgets, optionally filter to active budgets only.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        scale = await _amount_scale()
+        async with read_connection() as c:
             query = "SELECT * FROM budgets"
             if active_only:
                 query += " WHERE is_active = 1"
@@ -518,62 +3270,152 @@ async def get_budgets(active_only=True):
             
             cur = await c.execute(query)
             cols = [d[0] for d in cur.description]
-            budgets = [dict(zip(cols, r)) for r in await cur.fetchall()]
+            budgets = [_money_fields(dict(zip(cols, r)), scale) for r in await cur.fetchall()]
             
             return {"status": "success", "budgets": budgets}
     except Exception as e:
         return {"status": "error", "message": f"Error getting budgets: {str(e)}"}
 
+# Every active budget and every evaluated window of it, summed from the daily rollup in
+# one statement. Windows are calendar periods (Monday-based weeks) containing :as_of,
+# stepped back :history times, or the explicit :range_start/:range_end for all budgets;
+# each is clipped to the budget's own start_date/end_date. {spending} is BUDGET_SPENDING_QUERY
+# over every schema read.
+BUDGET_STATUS_QUERY = """
+    WITH RECURSIVE offsets(k) AS (
+        SELECT 0 UNION ALL SELECT k + 1 FROM offsets WHERE k < :history
+    ),
+    periods AS (
+        SELECT b.id, b.category, b.amount, b.period, b.start_date, b.end_date, o.k,
+            CASE
+                WHEN :range_start IS NOT NULL THEN :range_start
+                WHEN b.period = 'weekly' THEN date(:as_of, '-6 days', 'weekday 1', printf('-%d days', 7 * o.k))
+                WHEN b.period = 'yearly' THEN date(:as_of, 'start of year', printf('-%d years', o.k))
+                ELSE date(:as_of, 'start of month', printf('-%d months', o.k))
+            END AS period_start
+        FROM budgets b CROSS JOIN offsets o
+        WHERE b.is_active = 1
+    ),
+    windows AS (
+        SELECT p.*,
+            MAX(p.period_start, p.start_date) AS window_start,
+            MIN(p.period_end, COALESCE(p.end_date, p.period_end)) AS window_end
+        FROM (
+            SELECT periods.*,
+                CASE
+                    WHEN :range_end IS NOT NULL THEN :range_end
+                    WHEN period = 'weekly' THEN date(period_start, '+6 days')
+                    WHEN period = 'yearly' THEN date(period_start, '+1 year', '-1 day')
+                    ELSE date(period_start, '+1 month', '-1 day')
+                END AS period_end
+            FROM periods
+        ) p
+    )
+    SELECT id, k, category, amount, period, window_start, window_end,
+           COALESCE(SUM(total_amount), 0) AS spent, COALESCE(SUM(txn_count), 0) AS txn_count
+    FROM ({spending})
+    GROUP BY id, k
+    ORDER BY id, k
+"""
+
+# Daily rollup rows of one schema inside each window, joined per schema so every
+# join can use idx_daily_rollup_category
+BUDGET_SPENDING_QUERY = """
+    SELECT w.id, w.k, w.category, w.amount, w.period, w.window_start, w.window_end, r.total_amount, r.txn_count
+    FROM windows w
+    LEFT JOIN {schema}.expense_daily_rollup r
+        ON r.category = w.category AND r.day BETWEEN w.window_start AND w.window_end
+"""
+
+def _budget_usage(budget_amount, spent):
+    percentage_used = (spent / budget_amount * 100) if budget_amount > 0 else 0
+    status = "under_budget"
+    if percentage_used >= 100:
+        status = "over_budget"
+    elif percentage_used >= 80:
+        status = "near_limit"
+    return round(percentage_used, 2), status
+
 @mcp.tool()
-async def check_budget_status(start_date, end_date):
-    '''Check budget vs actual spending for all active budgets in the given period.'''
+async def check_budget_status(start_date=None, end_date=None, as_of=None, history_periods=0):
+    '''Check budget vs actual spending for all active budgets.
+    
+    By default each budget is evaluated over its own current period (week, month or year
+    containing as_of, today if omitted); history_periods adds that many previous periods.
+    Passing start_date and end_date evaluates every budget over that range instead.
+    '''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            # Get active budgets
-            cur = await c.execute("SELECT * FROM budgets WHERE is_active = 1")
-            budgets = await cur.fetchall()
-            budget_cols = [d[0] for d in cur.description]
-            
-            budget_status = []
-            
-            for budget_row in budgets:
-                budget = dict(zip(budget_cols, budget_row))
-                category = budget['category']
-                budget_amount = budget['amount']
-                
-                # Get actual spending for this category
-                cur = await c.execute("""
-                    SELECT COALESCE(SUM(amount), 0) as total_spent
-                    FROM expenses
-                    WHERE category = ? AND date BETWEEN ? AND ?
-                """, (category, start_date, end_date))
-                
-                total_spent = (await cur.fetchone())[0]
-                remaining = budget_amount - total_spent
-                percentage_used = (total_spent / budget_amount * 100) if budget_amount > 0 else 0
-                
-                status = "under_budget"
-                if percentage_used >= 100:
-                    status = "over_budget"
-                elif percentage_used >= 80:
-                    status = "near_limit"
-                
-                budget_status.append({
-                    "budget_id": budget['id'],
+        history = int(history_periods or 0)
+        if history < 0:
+            raise ValueError("history_periods must not be negative")
+        if (start_date is None) != (end_date is None):
+            raise ValueError("Provide both start_date and end_date, or neither")
+        if start_date is not None:
+            if history:
+                raise ValueError("history_periods cannot be combined with an explicit date range")
+            start_date = _validate_date(start_date, "start_date")
+            end_date = _validate_date(end_date, "end_date")
+        as_of = _validate_date(as_of, "as_of") if as_of is not None else datetime.now().date().isoformat()
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        scale = await _amount_scale()
+        if start_date is not None:
+            first_day, last_day = start_date, end_date
+        else:
+            # Every window lies between the start of the year before the oldest period
+            # (a week or month stepped back across New Year) and the end of the next year
+            year = int(as_of[:4])
+            first_day, last_day = f"{max(year - history - 1, 0):04d}-01-01", f"{year + 1:04d}-12-31"
+        async with federated_connection(first_day, last_day) as (c, schemas):
+            spending, _ = _federate(BUDGET_SPENDING_QUERY, (), schemas)
+            cur = await c.execute(BUDGET_STATUS_QUERY.format(spending=spending), {
+                "history": history,
+                "as_of": as_of,
+                "range_start": start_date,
+                "range_end": end_date,
+            })
+            rows = await cur.fetchall()
+        
+        budget_status = []
+        for budget_id, k, category, budget_amount, period, window_start, window_end, spent, txn_count in rows:
+            window = {"start_date": window_start, "end_date": window_end}
+            in_effect = window_start <= window_end
+            if k == 0:
+                percentage_used, status = _budget_usage(budget_amount, spent)
+                entry = {
+                    "budget_id": budget_id,
                     "category": category,
-                    "budget_amount": budget_amount,
-                    "spent_amount": total_spent,
-                    "remaining_amount": remaining,
-                    "percentage_used": round(percentage_used, 2),
+                    "budget_amount": _from_minor(budget_amount, scale),
+                    "spent_amount": _from_minor(spent, scale),
+                    "remaining_amount": _from_minor(budget_amount - spent, scale),
+                    "percentage_used": percentage_used,
+                    # Periods the budget does not cover (not started yet or already ended)
+                    "status": status if in_effect else "inactive",
+                    "period": period,
+                    "window": window,
+                    "transaction_count": txn_count,
+                }
+                if history:
+                    entry["history"] = []
+                budget_status.append(entry)
+            elif in_effect:
+                percentage_used, status = _budget_usage(budget_amount, spent)
+                budget_status[-1]["history"].append({
+                    "window": window,
+                    "spent_amount": _from_minor(spent, scale),
+                    "remaining_amount": _from_minor(budget_amount - spent, scale),
+                    "percentage_used": percentage_used,
                     "status": status,
-                    "period": budget['period']
+                    "transaction_count": txn_count,
                 })
-            
-            return {
-                "status": "success",
-                "period": {"start_date": start_date, "end_date": end_date},
-                "budget_status": budget_status
-            }
+        
+        result = {"status": "success", "budget_status": budget_status}
+        if start_date is not None:
+            result["period"] = {"start_date": start_date, "end_date": end_date}
+        else:
+            result["as_of"] = as_of
+        return result
     except Exception as e:
         return {"status": "error", "message": f"Error checking budget status: {str(e)}"}
 
@@ -581,7 +3423,12 @@ async def check_budget_status(start_date, end_date):
 async def update_budget(budget_id, amount=None, is_active=None, end_date=None):
     '''Update an existing budget.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        if amount is not None:
+            amount = _to_minor(amount, await _amount_scale())
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        async with write_connection() as c:
             # Check if budget exists
             cur = await c.execute("SELECT * FROM budgets WHERE id = ?", (budget_id,))
             budget = await cur.fetchone()
@@ -601,7 +3448,7 @@ async def update_budget(budget_id, amount=None, is_active=None, end_date=None):
                 params.append(1 if is_active else 0)
             if end_date is not None:
                 updates.append("end_date = ?")
-                params.append(end_date)
+                params.append(_validate_date(end_date, "end_date"))
             
             if not updates:
                 return {"status": "error", "message": "No fields provided to update"}
@@ -620,14 +3467,22 @@ async def update_budget(budget_id, amount=None, is_active=None, end_date=None):
 @mcp.tool()
 async def add_recurring_expense(name, amount, category, frequency, next_due_date, subcategory="", note=""):
     '''Add a recurring expense (like subscriptions). Frequency can be "weekly", "monthly", "yearly".'''
+    if frequency not in RECURRING_FREQUENCIES:
+        return {"status": "error", "message": 'Frequency must be "weekly", "monthly", or "yearly"'}
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        next_due_date = _validate_date(next_due_date, "next_due_date")
+        category, subcategory = _category_index.refresh().resolve(category, subcategory)
+        amount = _to_minor(amount, await _amount_scale())
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        async with write_connection() as c:
             created_date = datetime.now().isoformat()
             
             cur = await c.execute("""
-                INSERT INTO recurring_expenses(name, amount, category, subcategory, frequency, next_due_date, created_date, note)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (name, amount, category, subcategory, frequency, next_due_date, created_date, note))
+                INSERT INTO recurring_expenses(name, amount, category, subcategory, frequency, next_due_date, created_date, note, anchor_day)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (name, amount, category, subcategory, frequency, next_due_date, created_date, note, int(next_due_date[8:10])))
             
             recurring_id = cur.lastrowid
             await c.commit()
@@ -644,7 +3499,8 @@ async def add_recurring_expense(name, amount, category, frequency, next_due_date
 async def get_recurring_expenses(active_only=True):
     '''Get all recurring expenses.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        scale = await _amount_scale()
+        async with read_connection() as c:
             query = "SELECT * FROM recurring_expenses"
             if active_only:
                 query += " WHERE is_active = 1"
@@ -652,7 +3508,7 @@ async def get_recurring_expenses(active_only=True):
             
             cur = await c.execute(query)
             cols = [d[0] for d in cur.description]
-            recurring = [dict(zip(cols, r)) for r in await cur.fetchall()]
+            recurring = [_money_fields(dict(zip(cols, r)), scale) for r in await cur.fetchall()]
             
             return {"status": "success", "recurring_expenses": recurring}
     except Exception as e:
@@ -666,16 +3522,17 @@ async def get_due_recurring_expenses(days_ahead=7):
         
         today = datetime.now().date()
         cutoff_date = today + timedelta(days=days_ahead)
+        scale = await _amount_scale()
         
-        async with aiosqlite.connect(DB_PATH) as c:
+        async with read_connection() as c:
             cur = await c.execute("""
                 SELECT * FROM recurring_expenses
-                WHERE is_active = 1 AND date(next_due_date) <= ?
+                WHERE is_active = 1 AND next_due_date <= ?
                 ORDER BY next_due_date ASC
             """, (cutoff_date.isoformat(),))
             
             cols = [d[0] for d in cur.description]
-            due_expenses = [dict(zip(cols, r)) for r in await cur.fetchall()]
+            due_expenses = [_money_fields(dict(zip(cols, r)), scale) for r in await cur.fetchall()]
             
             return {
                 "status": "success",
@@ -686,6 +3543,32 @@ async def get_due_recurring_expenses(days_ahead=7):
     except Exception as e:
         return {"status": "error", "message": f"Error getting due recurring expenses: {str(e)}"}
 
+RECURRING_FREQUENCIES = ("weekly", "monthly", "yearly")
+
+def _add_months(d, months, anchor_day):
+    '''Shift a date by whole months, landing on anchor_day or the month's last day if shorter.'''
+    import calendar
+    index = d.year * 12 + d.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return d.replace(year=year, month=month, day=min(anchor_day, calendar.monthrange(year, month)[1]))
+
+def _next_due(current, frequency, anchor_day=None):
+    '''The due date following current for a weekly, monthly or yearly schedule.'''
+    if frequency == 'weekly':
+        return current + timedelta(weeks=1)
+    if frequency == 'monthly':
+        return _add_months(current, 1, anchor_day or current.day)
+    if frequency == 'yearly':
+        return _add_months(current, 12, anchor_day or current.day)
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+RECURRING_OCCURRENCE_INSERT = """
+    INSERT INTO expenses(date, amount, category, subcategory, note, recurring_id, occurrence_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(recurring_id, occurrence_date) WHERE recurring_id IS NOT NULL DO NOTHING
+"""
+
 @mcp.tool()
 async def process_recurring_expense(recurring_id, process_date=None):
     '''Process a recurring expense by adding it to expenses and updating the next due date.'''
@@ -694,8 +3577,11 @@ async def process_recurring_expense(recurring_id, process_date=None):
         
         if process_date is None:
             process_date = datetime.now().date().isoformat()
+        else:
+            process_date = _validate_date(process_date, "process_date")
         
-        async with aiosqlite.connect(DB_PATH) as c:
+        scale = await _amount_scale()
+        async with write_connection() as c:
             # Get the recurring expense
             cur = await c.execute("SELECT * FROM recurring_expenses WHERE id = ? AND is_active = 1", (recurring_id,))
             recurring = await cur.fetchone()
@@ -706,33 +3592,24 @@ async def process_recurring_expense(recurring_id, process_date=None):
             cols = [d[0] for d in cur.description]
             recurring_dict = dict(zip(cols, recurring))
             
-            # Add expense entry
-            await c.execute("""
-                INSERT INTO expenses(date, amount, category, subcategory, note)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
+            # Calculate next due date
+            current_due = datetime.fromisoformat(recurring_dict['next_due_date']).date()
+            try:
+                next_due = _next_due(current_due, recurring_dict['frequency'], recurring_dict['anchor_day'])
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
+            
+            # Add expense entry for the current occurrence (skipped if it was already materialised)
+            cur = await c.execute(RECURRING_OCCURRENCE_INSERT, (
                 process_date,
                 recurring_dict['amount'],
                 recurring_dict['category'],
                 recurring_dict['subcategory'],
-                f"Recurring: {recurring_dict['name']} - {recurring_dict['note']}"
+                f"Recurring: {recurring_dict['name']} - {recurring_dict['note']}",
+                recurring_id,
+                current_due.isoformat()
             ))
-            
-            # Calculate next due date
-            current_due = datetime.fromisoformat(recurring_dict['next_due_date']).date()
-            
-            if recurring_dict['frequency'] == 'weekly':
-                next_due = current_due + timedelta(weeks=1)
-            elif recurring_dict['frequency'] == 'monthly':
-                # Add one month (approximate)
-                if current_due.month == 12:
-                    next_due = current_due.replace(year=current_due.year + 1, month=1)
-                else:
-                    next_due = current_due.replace(month=current_due.month + 1)
-            elif recurring_dict['frequency'] == 'yearly':
-                next_due = current_due.replace(year=current_due.year + 1)
-            else:
-                return {"status": "error", "message": f"Unknown frequency: {recurring_dict['frequency']}"}
+            already_processed = cur.rowcount == 0
             
             # Update next due date
             await c.execute("""
@@ -745,80 +3622,559 @@ async def process_recurring_expense(recurring_id, process_date=None):
             
             return {
                 "status": "success",
-                "message": f"Processed recurring expense '{recurring_dict['name']}'",
-                "expense_added": {
+                "message": f"Processed recurring expense '{recurring_dict['name']}'"
+                           + (" (occurrence already recorded)" if already_processed else ""),
+                "expense_added": None if already_processed else {
                     "date": process_date,
-                    "amount": recurring_dict['amount'],
+                    "amount": _from_minor(recurring_dict['amount'], scale),
                     "category": recurring_dict['category']
                 },
+                "occurrence_date": current_due.isoformat(),
                 "next_due_date": next_due.isoformat()
             }
     except Exception as e:
         return {"status": "error", "message": f"Error processing recurring expense: {str(e)}"}
 
 @mcp.tool()
-async def export_expenses_csv(start_date, end_date):
-    '''Export expenses to CSV format for the given date range.'''
+async def process_due_recurring_expenses(as_of=None, max_occurrences=None):
+    '''Add every missed occurrence of all due recurring expenses up to as_of (default today), in one transaction.'''
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
+        as_of = _validate_date(as_of, "as_of") if as_of is not None else datetime.now().date().isoformat()
+        limit = max(1, int(max_occurrences or RECURRING_MAX_OCCURRENCES))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        cutoff = datetime.fromisoformat(as_of).date()
+        async with write_connection() as c:
+            await c.execute("BEGIN IMMEDIATE")
             cur = await c.execute("""
-                SELECT date, amount, category, subcategory, note
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-                ORDER BY date DESC
-            """, (start_date, end_date))
-            
-            expenses = await cur.fetchall()
-            
-            # Create CSV content
-            csv_lines = ["Date,Amount,Category,Subcategory,Note"]
-            for expense in expenses:
-                # Escape commas and quotes in text fields
-                row = []
-                for field in expense:
-                    if isinstance(field, str) and (',' in field or '"' in field):
-                        field = f'"{field.replace(chr(34), chr(34)+chr(34))}"'
-                    row.append(str(field))
-                csv_lines.append(','.join(row))
+                SELECT id, name, amount, category, subcategory, note, frequency, next_due_date, anchor_day
+                FROM recurring_expenses
+                WHERE is_active = 1 AND next_due_date <= ?
+                ORDER BY next_due_date ASC
+            """, (as_of,))
+            due = await cur.fetchall()
             
-            csv_content = '\n'.join(csv_lines)
+            occurrences = []
+            advanced = []
+            processed = []
+            errors = []
+            for recurring_id, name, amount, category, subcategory, note, frequency, next_due_date, anchor_day in due:
+                if frequency not in RECURRING_FREQUENCIES:
+                    errors.append(f"Recurring expense {recurring_id}: unknown frequency {frequency!r}")
+                    continue
+                occurrence = datetime.fromisoformat(next_due_date).date()
+                dates = []
+                while occurrence <= cutoff and len(dates) < limit:
+                    dates.append(occurrence.isoformat())
+                    occurrence = _next_due(occurrence, frequency, anchor_day)
+                note_text = f"Recurring: {name} - {note}"
+                occurrences.extend(
+                    (day, amount, category, subcategory, note_text, recurring_id, day) for day in dates
+                )
+                advanced.append((occurrence.isoformat(), recurring_id))
+                processed.append({
+                    "recurring_id": recurring_id,
+                    "name": name,
+                    "occurrences": len(dates),
+                    "first_occurrence": dates[0],
+                    "last_occurrence": dates[-1],
+                    "next_due_date": occurrence.isoformat(),
+                    # Hit max_occurrences; the next run continues from next_due_date
+                    "caught_up": occurrence > cutoff,
+                })
             
+            cur = await c.executemany(RECURRING_OCCURRENCE_INSERT, occurrences)
+            added_count = cur.rowcount
+            await c.executemany("UPDATE recurring_expenses SET next_due_date = ? WHERE id = ?", advanced)
+            await c.commit()
+        
+        return {
+            "status": "success" if not errors else "partial_success",
+            "as_of": as_of,
+            "recurring_processed": len(processed),
+            "added_count": added_count,
+            "skipped_existing": len(occurrences) - added_count,
+            "processed": processed,
+            "errors": errors
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error processing due recurring expenses: {str(e)}"}
+
+# Cheap check for a shard that is not open, so idle tenants are not opened every round
+RECURRING_DUE_QUERY = "SELECT 1 FROM recurring_expenses WHERE is_active = 1 AND next_due_date <= ? LIMIT 1"
+
+async def _recurring_due(path, as_of):
+    '''Whether the database at path has a recurring expense due by as_of, read without opening its shard.'''
+    import aiosqlite
+    from pathlib import Path
+    async with aiosqlite.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True) as c:
+        cur = await c.execute(RECURRING_DUE_QUERY, (as_of,))
+        return await cur.fetchone() is not None
+
+async def _process_recurring_tenant(tenant, as_of, semaphore):
+    '''Process the due recurring expenses of one tenant (None is DB_PATH) and log the outcome.'''
+    label = "Recurring expense scheduler" + (f" (tenant {tenant!r})" if tenant is not None else "")
+    async with semaphore:
+        if tenant is not None and tenant not in {name for name, _ in _tenant_shards.open_pools()}:
+            try:
+                if not await _recurring_due(_tenant_shards.path(tenant), as_of):
+                    return
+            except Exception as e:
+                _log(f"{label}: {e}")
+                return
+        token = _current_tenant.set(tenant)
+        try:
+            result = await process_due_recurring_expenses.fn(as_of)
+        except Exception as e:
+            # Opening the shard failed; the other tenants still run
+            result = {"status": "error", "message": str(e)}
+        finally:
+            _current_tenant.reset(token)
+    if result["status"] == "error":
+        _log(f"{label}: {result['message']}")
+    elif result["added_count"] or result["errors"]:
+        _log(f"{label}: added {result['added_count']} expense(s)"
+              + (f", {len(result['errors'])} error(s)" if result["errors"] else ""))
+
+async def _recurring_scheduler(interval):
+    '''Run process_due_recurring_expenses on the default database and every tenant shard every interval seconds.'''
+    semaphore = asyncio.Semaphore(max(1, TENANT_FANOUT_CONCURRENCY))
+    while True:
+        as_of = datetime.now().date().isoformat()
+        await asyncio.gather(*(_process_recurring_tenant(tenant, as_of, semaphore)
+                               for tenant in [None] + _tenant_shards.tenants()))
+        await asyncio.sleep(interval)
+
+# Database maintenance
+AUTO_VACUUM_MODES = ("none", "full", "incremental")
+
+class Maintenance:
+    '''WAL checkpoints, incremental vacuum and planner statistics for the open databases.
+
+    Each pass holds a database's writer, so it never runs alongside a write; readers
+    are not blocked. The result of the last pass over each database is kept for the
+    expense:///maintenance resource.
+    '''
+
+    def __init__(self):
+        self.passes = 0
+        self.deferred = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_run = None
+        self.databases = {}
+        self._analyzed = {}
+
+    async def run(self):
+        '''Run one pass over the shared database and every open tenant shard.
+
+        Returns True if a busy database got only a passive checkpoint.
+        '''
+        pools = [(None, _pool)] if _pool is not None else []
+        pools += _tenant_shards.open_pools()
+        deferred = False
+        for tenant, pool in pools:
+            try:
+                result = await self.run_pool(pool)
+            except Exception as e:
+                # Closed by an eviction or shutdown meanwhile, or a failed statement; next pass retries
+                self.errors += 1
+                self.last_error = f"{pool.path}: {e}"
+                _log(f"Database maintenance: {self.last_error}")
+                continue
+            result["tenant"] = tenant
+            self.databases[pool.path] = result
+            deferred |= result["deferred"]
+        self.passes += 1
+        self.deferred += deferred
+        self.last_run = datetime.now().isoformat(timespec="seconds")
+        return deferred
+
+    async def run_pool(self, pool):
+        started = time.perf_counter()
+        load = pool.load
+        busy = load > MAINTENANCE_BUSY_CONNECTIONS
+        wal_path = pool.path + "-wal"
+        wal_before = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        truncate = not busy and wal_before > MAINTENANCE_WAL_BYTES
+        result = {"path": pool.path, "at": datetime.now().isoformat(timespec="seconds"), "load": load,
+                  "deferred": busy, "wal_bytes_before": wal_before}
+        async with write_connection(pool) as c:
+            cur = await c.execute("PRAGMA auto_vacuum")
+            result["auto_vacuum"] = AUTO_VACUUM_MODES[(await cur.fetchone())[0]]
+            cur = await c.execute("PRAGMA freelist_count")
+            result["freelist_pages_before"] = result["freelist_pages_after"] = (await cur.fetchone())[0]
+            result["statistics"] = None
+            result["change_log_compacted"] = 0
+            if not busy:
+                # Before the vacuum, which then also releases the pages compaction freed
+                result["change_log_compacted"] = await self.compact_change_log(c)
+                if result["auto_vacuum"] == "incremental":
+                    # executescript steps the pragma to completion; execute() would free one page
+                    await c.executescript(f"PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_PAGES})")
+                    cur = await c.execute("PRAGMA freelist_count")
+                    result["freelist_pages_after"] = (await cur.fetchone())[0]
+                now = time.monotonic()
+                analyze = now - self._analyzed.get(pool.path, now) >= MAINTENANCE_ANALYZE_INTERVAL
+                self._analyzed.setdefault(pool.path, now)
+                # Bounded sampling keeps the statistics step short on large tables
+                await c.execute("PRAGMA analysis_limit = 1000")
+                try:
+                    await c.execute("ANALYZE" if analyze else "PRAGMA optimize")
+                finally:
+                    await c.execute("PRAGMA analysis_limit = 0")
+                if analyze:
+                    self._analyzed[pool.path] = now
+                result["statistics"] = "analyze" if analyze else "optimize"
+            if truncate:
+                # Never wait for readers here: with one still on an old snapshot, the
+                # checkpoint reports busy and the next pass tries again
+                cur = await c.execute("PRAGMA busy_timeout")
+                timeout = (await cur.fetchone())[0]
+                await c.execute("PRAGMA busy_timeout = 0")
+                try:
+                    cur = await c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    checkpoint = await cur.fetchone()
+                finally:
+                    await c.execute(f"PRAGMA busy_timeout = {timeout}")
+            else:
+                cur = await c.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                checkpoint = await cur.fetchone()
+        blocked, log_frames, checkpointed = checkpoint
+        result["checkpoint"] = {"mode": "truncate" if truncate else "passive", "busy": bool(blocked),
+                                "log_frames": log_frames, "checkpointed_frames": checkpointed}
+        result["wal_bytes_after"] = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    async def compact_change_log(self, c):
+        '''Drop the oldest change_log entries past the retention window; return how many.'''
+        # Entries are scanned from the oldest, a bounded batch at a time, so each pass stays short
+        cur = await c.execute("""
+            SELECT MAX(seq) FROM (SELECT seq, changed_at FROM change_log ORDER BY seq LIMIT ?)
+            WHERE changed_at < strftime('%Y-%m-%dT%H:%M:%fZ', 'now', ?)
+        """, (CHANGE_LOG_COMPACT_ROWS, f"-{CHANGE_LOG_RETENTION_DAYS * 86400} seconds"))
+        horizon = (await cur.fetchone())[0]
+        if horizon is None:
+            return 0
+        cur = await c.execute("DELETE FROM change_log WHERE seq <= ?", (horizon,))
+        await c.execute("UPDATE settings SET value = ? WHERE key = 'change_log_horizon'", (str(horizon),))
+        await c.commit()
+        return cur.rowcount
+
+    def stats(self):
+        return {
+            "interval_seconds": MAINTENANCE_INTERVAL,
+            "wal_truncate_bytes": MAINTENANCE_WAL_BYTES,
+            "vacuum_pages_per_pass": MAINTENANCE_VACUUM_PAGES,
+            "analyze_interval_seconds": MAINTENANCE_ANALYZE_INTERVAL,
+            "busy_connections": MAINTENANCE_BUSY_CONNECTIONS,
+            "change_log_retention_days": CHANGE_LOG_RETENTION_DAYS,
+            "passes": self.passes,
+            "deferred_passes": self.deferred,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_run": self.last_run,
+            "databases": list(self.databases.values()),
+        }
+
+
+_maintenance = Maintenance()
+
+async def _maintenance_loop(interval):
+    '''Run a maintenance pass every interval seconds until cancelled.
+
+    A pass that found a database busy is retried after 1, 2, 4... seconds, up to interval.
+    '''
+    retry = 1.0
+    while True:
+        if await _maintenance.run():
+            await asyncio.sleep(min(retry, interval))
+            retry *= 2
+        else:
+            retry = 1.0
+            await asyncio.sleep(interval)
+
+# Streaming export
+EXPORT_COLUMNS = ("date", "amount", "category", "subcategory", "note")
+EXPORT_CSV_HEADER = ("Date", "Amount", "Category", "Subcategory", "Note")
+
+class _HashingWriter:
+    '''Binary file wrapper that tracks the SHA-256 and size of everything written.'''
+
+    def __init__(self, raw):
+        import hashlib
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes_written += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+def _encode_export_rows(rows, file_format, header=False, scale=1):
+    '''Serialize one chunk of export rows as CSV or NDJSON text, amounts in major units.'''
+    import io
+    buffer = io.StringIO()
+    # Columns past EXPORT_COLUMNS only order the query
+    rows = [(row[0], _from_minor(row[1], scale)) + tuple(row[2:len(EXPORT_COLUMNS)]) for row in rows]
+    if file_format == "csv":
+        import csv
+        writer = csv.writer(buffer, lineterminator="\n")
+        if header:
+            writer.writerow(EXPORT_CSV_HEADER)
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+            buffer.write("\n")
+    return buffer.getvalue()
+
+def _export_target(output_path, start_date, end_date, file_format, compress):
+    '''Resolve where a file export goes, inside EXPORT_DIR, or raise ValueError.'''
+    if not output_path:
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+        output_path = f"expenses_{start_date}_{end_date}_{stamp}.{file_format}" + (".gz" if compress else "")
+    path = _confined_path(EXPORT_DIR, output_path, "output_path", "export")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+@mcp.tool()
+async def export_expenses_csv(start_date, end_date, file_format="csv", to_file=False, output_path=None,
+                              compress=False, overwrite=False):
+    '''Export expenses for a date range as CSV or NDJSON, inline or streamed to a server-side file (optionally gzip).
+
+    Inline exports are limited to EXPENSE_EXPORT_INLINE_MAX_BYTES (8 MiB by default); larger
+    ranges return an error asking for to_file=True, which streams without a size limit.
+    '''
+    if file_format not in ("csv", "ndjson"):
+        return {"status": "error", "message": f"Unsupported format {file_format!r}; use csv or ndjson"}
+    select = """
+        SELECT date, amount, category, subcategory, note, id
+        FROM {schema}.expenses
+        WHERE date BETWEEN ? AND ?
+    """
+    to_file = to_file or bool(output_path) or compress
+    try:
+        scale = await _amount_scale()
+        if not to_file:
+            # Inline mode: the whole export is returned in the response, so it is held in
+            # memory and capped
+            record_count = 0
+            parts = [_encode_export_rows([], file_format, header=True)]
+            size = len(parts[0].encode("utf-8"))
+            async with federated_connection(start_date, end_date) as (c, schemas):
+                query, params = _federate(select, (start_date, end_date), schemas)
+                cur = await c.execute(query + " ORDER BY date DESC, id DESC", params)
+                while True:
+                    rows = await cur.fetchmany(EXPORT_FETCH_SIZE)
+                    if not rows:
+                        break
+                    record_count += len(rows)
+                    parts.append(_encode_export_rows(rows, file_format, scale=scale))
+                    size += len(parts[-1].encode("utf-8"))
+                    if size > EXPORT_INLINE_MAX_BYTES:
+                        return {
+                            "status": "error",
+                            "message": f"Inline export exceeds {EXPORT_INLINE_MAX_BYTES} bytes after "
+                                       f"{record_count} rows; use to_file=True to stream it to a file",
+                        }
             return {
                 "status": "success",
-                "csv_content": csv_content,
-                "record_count": len(expenses),
+                f"{file_format}_content": "".join(parts),
+                "record_count": record_count,
                 "date_range": {"start_date": start_date, "end_date": end_date}
             }
+
+        path = _export_target(output_path, start_date, end_date, file_format, compress)
+        if os.path.exists(path) and not overwrite:
+            return {"status": "error", "message": f"Export file already exists: {path}"}
+        # Written to a temporary name and renamed once complete, so readers never see a partial file
+        partial = path + ".part"
+        record_count = 0
+        raw = open(partial, "wb")
+        try:
+            sink = hashed = _HashingWriter(raw)
+            if compress:
+                import gzip
+                sink = gzip.GzipFile(filename=os.path.basename(path)[:-3] if path.endswith(".gz") else "",
+                                     mode="wb", fileobj=hashed, mtime=0)
+            await asyncio.to_thread(sink.write, _encode_export_rows([], file_format, header=True).encode("utf-8"))
+            async with federated_connection(start_date, end_date) as (c, schemas):
+                query, params = _federate(select, (start_date, end_date), schemas)
+                cur = await c.execute(query + " ORDER BY date DESC, id DESC", params)
+                while True:
+                    rows = await cur.fetchmany(EXPORT_FETCH_SIZE)
+                    if not rows:
+                        break
+                    record_count += len(rows)
+                    await asyncio.to_thread(sink.write, _encode_export_rows(rows, file_format, scale=scale).encode("utf-8"))
+            if sink is not hashed:
+                sink.close()
+            raw.close()
+            os.replace(partial, path)
+        except BaseException:
+            raw.close()
+            os.remove(partial)
+            raise
+
+        return {
+            "status": "success",
+            "path": path,
+            "format": file_format,
+            "compressed": bool(compress),
+            "record_count": record_count,
+            "bytes": hashed.bytes_written,
+            "sha256": hashed.sha256.hexdigest(),
+            "date_range": {"start_date": start_date, "end_date": end_date}
+        }
     except Exception as e:
-        return {"status": "error", "message": f"Error exporting to CSV: {str(e)}"}
+        return {"status": "error", "message": f"Error exporting expenses: {str(e)}"}
+
+# Cross-tenant administration
+TENANT_SUMMARY_QUERY = """
+    SELECT category, SUM(total_amount), SUM(txn_count)
+    FROM ({rollup})
+    GROUP BY category
+"""
+
+# Daily rollup rows of one schema of a shard, federated over its archive partitions
+TENANT_ROLLUP_QUERY = """
+    SELECT category, total_amount, txn_count
+    FROM {schema}.expense_daily_rollup
+    WHERE day BETWEEN ? AND ?
+"""
+
+# Shards migrated to integer amounts record their scale; older ones still hold major units
+TENANT_SHARD_SCALE_QUERY = "SELECT value FROM settings WHERE key = 'amount_scale'"
+
+@mcp.tool()
+async def admin_tenant_summary(start_date, end_date, admin_token, tenants=None, max_concurrency=None):
+    '''Admin: category totals of every tenant shard (or the given tenants) and across all of them.'''
+    import hmac
+    if not ADMIN_TOKEN or not hmac.compare_digest(str(admin_token).encode(), ADMIN_TOKEN.encode()):
+        return {"status": "error", "message": "admin_tenant_summary requires a valid admin_token"}
+    if _current_tenant.get() is not None:
+        return {"status": "error", "message": "admin_tenant_summary cannot be called on behalf of a tenant"}
+    try:
+        start_date = _validate_date(start_date, "start_date")
+        end_date = _validate_date(end_date, "end_date")
+        names = [_validate_tenant(t) for t in tenants] if tenants else _tenant_shards.tenants()
+        limit = int(max_concurrency or TENANT_FANOUT_CONCURRENCY)
+        if limit < 1:
+            raise ValueError("max_concurrency must be at least 1")
+    except (TypeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    from fractions import Fraction
+    semaphore = asyncio.Semaphore(limit)
+    minor_totals = {}
+    
+    async def summarize_shard(tenant):
+        import aiosqlite
+        from pathlib import Path
+        path = _tenant_shards.path(tenant)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"No database for tenant {tenant!r}")
+                # Short-lived read-only connection, so the fan-out does not churn the shard LRU
+                async with aiosqlite.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True) as raw:
+                    conn = _TimedConnection(raw)
+                    cur = await conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'settings'")
+                    scale = 1
+                    if await cur.fetchone():
+                        cur = await conn.execute(TENANT_SHARD_SCALE_QUERY)
+                        scale = int((await cur.fetchone())[0])
+                    schemas = ["main"]
+                    cur = await conn.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archive_partitions'")
+                    if await cur.fetchone():
+                        schemas = await _attach_partitions(conn, path, start_date, end_date, set())
+                    rollup, params = _federate(TENANT_ROLLUP_QUERY, (start_date, end_date), schemas)
+                    cur = await conn.execute(TENANT_SUMMARY_QUERY.format(rollup=rollup), params)
+                    rows = await cur.fetchall()
+            except Exception as e:
+                return {"tenant": tenant, "status": "error", "message": str(e)}
+            categories = [{"category": r[0], "total_amount": _from_minor(r[1], scale), "count": r[2]} for r in rows]
+            # Cross-tenant totals add exact fractions, since shards may use different scales
+            minor_totals[tenant] = [(r[0], Fraction(r[1], scale), r[2]) for r in rows]
+            return {
+                "tenant": tenant,
+                "status": "success",
+                "total_amount": _from_minor(sum(r[1] for r in rows), scale),
+                "count": sum(r[2] for r in rows),
+                "categories": categories,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+    
+    started = time.perf_counter()
+    shards = await asyncio.gather(*(summarize_shard(tenant) for tenant in names))
+    totals = {}
+    for rows in minor_totals.values():
+        for category, amount, count in rows:
+            total = totals.setdefault(category, {"category": category, "total_amount": Fraction(0), "count": 0})
+            total["total_amount"] += amount
+            total["count"] += count
+    grand_total = float(sum(t["total_amount"] for t in totals.values()))
+    for total in totals.values():
+        total["total_amount"] = float(total["total_amount"])
+    return {
+        "status": "success",
+        "date_range": {"start_date": start_date, "end_date": end_date},
+        "tenant_count": len(shards),
+        "failed_tenants": [shard["tenant"] for shard in shards if shard["status"] == "error"],
+        "total_amount": grand_total,
+        "count": sum(t["count"] for t in totals.values()),
+        "categories": sorted(totals.values(), key=lambda t: t["total_amount"], reverse=True),
+        "tenants": shards,
+        "max_concurrency": limit,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+if not ADMIN_TOKEN:
+    mcp.remove_tool("admin_tenant_summary")
 
 @mcp.resource("expense:///categories", mime_type="application/json")  # Changed: expense:// → expense:///
 def categories():
-    try:
-        # Provide default categories if file doesn't exist
-        default_categories = {
-            "categories": [
-                "Food & Dining",
-                "Transportation",
-                "Shopping",
-                "Entertainment",
-                "Bills & Utilities",
-                "Healthcare",
-                "Travel",
-                "Education",
-                "Business",
-                "Other"
-            ]
-        }
-        
-        try:
-            with open(CATEGORIES_PATH, "r", encoding="utf-8") as f:
-                return f.read()
-        except FileNotFoundError:
-            import json
-            return json.dumps(default_categories, indent=2)
-    except Exception as e:
-        return f'{{"error": "Could not load categories: {str(e)}"}}'
+    '''The category taxonomy, served from memory and reloaded when categories.json changes.'''
+    return _category_index.refresh().text
+
+@mcp.resource("expense:///pool", mime_type="application/json")
+def pool_stats():
+    '''Connection pool wait-time and utilization counters, plus write queue batching.'''
+    if _pool is None:
+        return json.dumps({"status": "closed", "tenants": _tenant_shards.stats()}, indent=2)
+    stats = _pool.stats()
+    stats["write_queue"] = _write_queue.stats() if _write_queue is not None else {"status": "idle"}
+    stats["tenants"] = _tenant_shards.stats()
+    return json.dumps(stats, indent=2)
+
+@mcp.resource("expense:///cache", mime_type="application/json")
+def cache_stats():
+    '''Result cache hit, miss, eviction and invalidation counters.'''
+    return json.dumps(_result_cache.stats(), indent=2)
+
+@mcp.resource("expense:///metrics", mime_type="application/json")
+def tool_metrics():
+    '''Per-tool latency, error and row counters, per-statement SQL time and the slow-query log.'''
+    return json.dumps(_metrics.snapshot(), indent=2)
+
+@mcp.resource("expense:///maintenance", mime_type="application/json")
+def maintenance_stats():
+    '''Last background maintenance pass over each open database: checkpoint, vacuum and statistics.'''
+    return json.dumps(_maintenance.stats(), indent=2)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def prometheus_metrics(request):
+    '''Prometheus scrape endpoint for the same counters (HTTP transport only).'''
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(_metrics.prometheus(), media_type="text/plain; version=0.0.4")
 
 # Start the server
 if __name__ == "__main__":